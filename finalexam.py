@@ -1,7 +1,15 @@
+import argparse
+import asyncio
+import heapq
+import os
 import random
 import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
 from enum import Enum
 
+from raft_storage import SegmentedLogStorage
+
 # --- 네트워크 분할 시뮬레이션용 전역 상태 ---
 NETWORK_STATUS = {}  # 예: {(1, 3): False, (3, 1): False, ...}
 
@@ -15,6 +23,258 @@ def set_network_partition(node_a, node_b, connected=True):
     NETWORK_STATUS[(node_b, node_a)] = connected
 
 
+# --- 전송 계층 (Transport) ---
+# 모든 전송 계층은 send(src_id, target_id, method, args, on_reply) 하나만 제공한다.
+# method 는 대상 노드의 RPC 핸들러 이름이고, 응답이 오면 on_reply(*result) 를 호출한다.
+# 응답이 오지 않으면(유실) on_reply 는 호출되지 않는다.
+class InProcessTransport:
+    """같은 프로세스의 노드 객체를 직접 호출하는 기본 전송 계층 (동기 응답)."""
+
+    def __init__(self, nodes):
+        self.nodes = {node.id: node for node in nodes}
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        target = self.nodes.get(target_id)
+        if target is not None:
+            on_reply(*getattr(target, method)(*args))
+
+
+class DisconnectedTransport:
+    """중단(crash)된 노드에 붙이는 전송 계층: 보내는 메시지를 모두 버린다."""
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        pass
+
+
+# --- 가상 시간 이산 사건 스케줄러 (Discrete-Event Simulation) ---
+class EventScheduler:
+    """
+    타이머/메시지 이벤트를 우선순위 큐(heap)로 관리하는 가상 시간 스케줄러.
+    시각은 다음 이벤트로 곧바로 건너뛰므로 몇 시간짜리 시뮬레이션도 CPU 속도로 끝나고,
+    같은 seed 로 실행하면 항상 같은 순서로 재현된다.
+    """
+
+    def __init__(self, seed=None, min_latency=0.001, max_latency=0.005):
+        self.current_time = 0.0
+        self.rng = random.Random(seed)
+        # 메시지 전달 지연 범위 (초)
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+
+        self._queue = []  # (시각, 순번, 콜백, 인자)
+        self._seq = 0  # 같은 시각의 이벤트 순서를 고정하기 위한 순번
+        self._timer_gen = {}  # 노드별 타이머 세대 (재설정 시 이전 타이머 무효화)
+        self._link_clock = {}  # 링크별 마지막 전달 시각 (FIFO 보장)
+        self.nodes = {}
+        self.events_processed = 0
+
+    def now(self):
+        return self.current_time
+
+    def call_at(self, when, callback, *args):
+        heapq.heappush(self._queue, (when, self._seq, callback, args))
+        self._seq += 1
+
+    def call_later(self, delay, callback, *args):
+        self.call_at(self.current_time + delay, callback, *args)
+
+    # --- 노드 등록 및 타이머 이벤트 ---
+    def add_node(self, node):
+        node.clock = self.now
+        node.scheduler = self
+        node.transport = self
+        self.nodes[node.id] = node
+        self.arm_timer(node)
+
+    def remove_node(self, node_id):
+        """
+        노드 프로세스 중단(crash)을 흉내 낸다. 타이머를 무효화하고, 이후 그 노드 객체가 보내는
+        메시지는 모두 버려진다. 전송 중이던 메시지가 같은 ID 로 재시작한 노드에 닿는 것은
+        실제 네트워크와 같다.
+        """
+        node = self.nodes.pop(node_id)
+        self._timer_gen[node_id] = self._timer_gen.get(node_id, 0) + 1
+        node.scheduler = None
+        node.transport = DisconnectedTransport()
+        return node
+
+    def arm_timer(self, node):
+        """노드의 다음 마감 시각(선출 타임아웃/하트비트)에 타이머 이벤트를 건다."""
+        gen = self._timer_gen.get(node.id, 0) + 1
+        self._timer_gen[node.id] = gen
+        self.call_at(node.next_deadline(), self._fire_timer, node, gen)
+
+    def _fire_timer(self, node, gen):
+        if self._timer_gen.get(node.id) != gen:
+            return  # 재설정되어 무효화된 타이머
+        node.check_status()
+        self.arm_timer(node)
+
+    # --- 메시지 이벤트 ---
+    def _transmit(self, src_id, target_id, callback, *args):
+        """링크 (src, target) 로 지연 후 전달한다. TCP 처럼 링크별 FIFO 순서를 지킨다."""
+        link = (src_id, target_id)
+        deliver_at = max(
+            self.current_time + self.rng.uniform(self.min_latency, self.max_latency),
+            self._link_clock.get(link, 0.0),
+        )
+        self._link_clock[link] = deliver_at
+        self.call_at(deliver_at, callback, *args)
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        """RPC 요청을 지연 후 전달하고, 응답도 지연 후 on_reply(*result) 로 돌려준다."""
+        self._transmit(
+            src_id, target_id, self._deliver, src_id, target_id, method, args, on_reply
+        )
+
+    def _deliver(self, src_id, target_id, method, args, on_reply):
+        # 전송 중에 네트워크가 끊기면 메시지는 유실된다
+        if not NETWORK_STATUS.get((src_id, target_id), True):
+            return
+        target = self.nodes.get(target_id)
+        if target is None:
+            return
+        result = getattr(target, method)(*args)
+        self._transmit(
+            target_id, src_id, self._deliver_reply, target_id, src_id, on_reply, result
+        )
+
+    def _deliver_reply(self, src_id, target_id, on_reply, result):
+        if not NETWORK_STATUS.get((src_id, target_id), True):
+            return
+        on_reply(*result)
+
+    # --- 실행 ---
+    def run_next(self, until=None):
+        """다음 이벤트 하나를 처리한다. until 이후의 이벤트만 남았으면 False."""
+        if not self._queue or (until is not None and self._queue[0][0] > until):
+            if until is not None:
+                self.current_time = max(self.current_time, until)
+            return False
+        when, _, callback, args = heapq.heappop(self._queue)
+        self.current_time = when
+        callback(*args)
+        self.events_processed += 1
+        return True
+
+    def run_until(self, until):
+        while self.run_next(until):
+            pass
+
+
+# --- asyncio 런타임: 노드별 타이머 태스크 + awaitable RPC ---
+class AsyncRuntime:
+    """
+    전역 폴링 대신 노드마다 선출 타이머와 하트비트 타이머를 asyncio 태스크로 돌린다.
+    각 태스크는 다음 마감 시각까지 잠들어 있다가 바로 깨어나므로, 장애 조치 지연은
+    설정된 타임아웃만으로 정해지고 유휴 클러스터는 CPU 를 거의 쓰지 않는다.
+    EventScheduler 와 같은 인터페이스(now, call_later, send, arm_timer)를 제공하므로
+    RaftNode 는 그대로 사용한다.
+    """
+
+    def __init__(self, seed=None, min_latency=0.001, max_latency=0.005):
+        self.loop = asyncio.get_running_loop()
+        self.rng = random.Random(seed)
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.nodes = {}
+        self.tasks = []
+        self._wake = {}  # 노드별 (선출, 하트비트) 타이머 재계산 이벤트
+        self._link_clock = {}
+
+    def now(self):
+        return self.loop.time()
+
+    def call_later(self, delay, callback, *args):
+        self.loop.call_later(delay, callback, *args)
+
+    # --- 노드 등록 및 타이머 태스크 ---
+    def add_node(self, node):
+        node.clock = self.now
+        node.scheduler = self
+        node.transport = self
+        self.nodes[node.id] = node
+        self._wake[node.id] = (asyncio.Event(), asyncio.Event())
+        self.tasks.append(asyncio.create_task(self._election_timer(node)))
+        self.tasks.append(asyncio.create_task(self._heartbeat_timer(node)))
+
+    def arm_timer(self, node):
+        # 상태가 바뀌어 마감 시각이 당겨졌으면 잠든 타이머 태스크를 깨운다
+        for event in self._wake[node.id]:
+            event.set()
+
+    async def _sleep_or_wake(self, event, delay):
+        event.clear()
+        try:
+            await asyncio.wait_for(event.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _election_timer(self, node):
+        wake = self._wake[node.id][0]
+        while True:
+            if node.state == State.LEADER:
+                # 리더인 동안에는 선출 타이머가 할 일이 없다
+                await self._sleep_or_wake(wake, node.election_timeout)
+                continue
+            delay = node.last_heartbeat + node.election_timeout - self.now()
+            if delay > 0:
+                await self._sleep_or_wake(wake, delay)
+                continue
+            node.on_election_timeout()
+
+    async def _heartbeat_timer(self, node):
+        wake = self._wake[node.id][1]
+        while True:
+            if node.state != State.LEADER:
+                await self._sleep_or_wake(wake, None)  # 리더가 되면 arm_timer 가 깨운다
+                continue
+            delay = node.next_deadline() - self.now()  # 하트비트 또는 CheckQuorum 마감
+            if delay > 0:
+                await self._sleep_or_wake(wake, delay)
+                continue
+            node.check_status()
+
+    # --- awaitable RPC ---
+    def call(self, src_id, target_id, method, args):
+        """target 에게 RPC 를 보내고, 응답 결과로 완료되는 awaitable(Future) 를 돌려준다."""
+        reply = self.loop.create_future()
+        self._transmit(src_id, target_id, self._deliver, src_id, target_id, method, args, reply)
+        return reply
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        reply = self.call(src_id, target_id, method, args)
+        reply.add_done_callback(lambda f: on_reply(*f.result()))
+
+    def _transmit(self, src_id, target_id, callback, *args):
+        # 링크별 FIFO 순서를 지키며 지연 후 전달
+        link = (src_id, target_id)
+        deliver_at = max(
+            self.now() + self.rng.uniform(self.min_latency, self.max_latency),
+            self._link_clock.get(link, 0.0),
+        )
+        self._link_clock[link] = deliver_at
+        self.loop.call_at(deliver_at, callback, *args)
+
+    def _deliver(self, src_id, target_id, method, args, reply):
+        if not NETWORK_STATUS.get((src_id, target_id), True):
+            return  # 메시지 유실 (reply 는 완료되지 않음)
+        target = self.nodes.get(target_id)
+        if target is None:
+            return
+        result = getattr(target, method)(*args)
+        self._transmit(target_id, src_id, self._deliver_reply, target_id, src_id, reply, result)
+
+    def _deliver_reply(self, src_id, target_id, reply, result):
+        if NETWORK_STATUS.get((src_id, target_id), True) and not reply.done():
+            reply.set_result(result)
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
 # --- 1. 노드 상태 정의 (Node States) ---
 class State(Enum):
     FOLLOWER = 1
@@ -22,9 +282,122 @@ class State(Enum):
     LEADER = 3
 
 
+NOOP_COMMAND = "NOOP"  # 리더 당선 직후 추가하는 빈 엔트리 (상태 머신에는 영향 없음)
+
+
+class NotLeaderError(Exception):
+    """리더가 아닌 노드에 제안했거나, 커밋 전에 리더 자리를 잃은 경우."""
+
+    def __init__(self, leader_id):
+        super().__init__(f"리더가 아닙니다 (알려진 리더: {leader_id})")
+        self.leader_id = leader_id
+
+
+# --- 상태 머신 (State Machine) ---
+class StateMachine(ABC):
+    """
+    RaftNode 가 커밋된 엔트리를 적용하는 상태 머신 인터페이스.
+    apply_batch 는 새로 커밋된 연속 구간 전체를 한 번에 받아 엔트리별 결과 리스트를 돌려준다.
+    메서드를 하나라도 구현하지 않은 하위 클래스는 인스턴스를 만들 때 TypeError 가 난다.
+    """
+
+    @abstractmethod
+    def apply_batch(self, first_index, entries):
+        ...
+
+    @abstractmethod
+    def query(self, key):
+        ...
+
+    @abstractmethod
+    def snapshot(self):
+        ...
+
+    @abstractmethod
+    def restore(self, data):
+        ...
+
+
+def parse_command(command):
+    """
+    커맨드 문자열을 (op, key, args) 로 한 번만 분해한다.
+    "SET k v", "GET k", "DEL k", "CAS k 기대값 새값" 과 데모용 "k=v"(SET) 를 지원한다.
+    """
+    if " " not in command:
+        key, sep, value = command.partition("=")
+        if sep:
+            return "SET", key, (value,)
+        return command.upper(), None, ()  # NOOP 등 인자 없는 커맨드
+    op, key, *args = command.split(" ")
+    return op.upper(), key, tuple(args)
+
+
+class KeyValueStateMachine(StateMachine):
+    """dict 기반 키-값 저장소 (set/get/delete/compare-and-swap)."""
+
+    def __init__(self):
+        self.data = {}
+        self.applied_count = 0
+        self.error_count = 0
+
+    def apply_batch(self, first_index, entries):
+        data = self.data
+        results = []
+        append = results.append
+        for command, _ in entries:
+            op, key, args = parse_command(command)
+            if op == "SET":
+                data[key] = args[0]
+                append(args[0])
+            elif op == "GET":
+                append(data.get(key))
+            elif op == "DEL":
+                append(data.pop(key, None) is not None)
+            elif op == "CAS":
+                # 현재 값이 기대값과 같을 때만 바꾼다 ("-" 는 키가 없음을 뜻함)
+                expected = None if args[0] == "-" else args[0]
+                swapped = data.get(key) == expected
+                if swapped:
+                    data[key] = args[1]
+                append(swapped)
+            elif op == "NOOP":
+                append(None)
+            else:
+                self.error_count += 1
+                append(None)
+        self.applied_count += len(entries)
+        return results
+
+    def query(self, key):
+        return self.data.get(key)
+
+    def snapshot(self):
+        return dict(self.data)
+
+    def restore(self, data):
+        self.data = dict(data)
+
+
 # --- 2. Raft 노드 클래스 ---
 class RaftNode:
-    def __init__(self, node_id, cluster_nodes):
+    def __init__(
+        self,
+        node_id,
+        cluster_nodes,
+        clock=None,
+        rng=None,
+        verbose=True,
+        max_batch_entries=1024,
+        max_inflight=4,
+        snapshot_threshold=10000,
+        storage=None,
+        lease_reads=False,
+        state_machine=None,
+        election_timeout_range=(5.0, 10.0),
+        heartbeat_interval=1.0,
+        pre_vote=True,
+        check_quorum=True,
+    ):
         self.id = node_id
         self.cluster_nodes = cluster_nodes  # 클러스터 내 모든 노드 ID 리스트
 
@@ -37,9 +410,28 @@ class RaftNode:
         self.leader_id = None
         self.votes_received = 0
 
+        # Pre-Vote: 임기를 올리기 전에 당선 가능성부터 확인해, 고립된 노드가 임기를 부풀리지 않게 한다
+        # CheckQuorum: 과반수와 연락이 끊긴 리더는 스스로 물러난다
+        self.pre_vote = pre_vote
+        self.check_quorum = check_quorum
+        self.prevotes_received = 0
+        self._prevote_round = 0
+        self.leader_since = 0.0
+        self.elections_started = 0  # 실제로 임기를 올린 선거 횟수
+
         # 로그 (각 항목: (command, term))
+        # 스냅샷 이후의 엔트리만 보관한다. 로그 인덱스 i 의 엔트리는 self.log[i - snapshot_index - 1]
         self.log = []
 
+        # 스냅샷 (로그 압축): snapshot_index 까지 적용된 상태와 그 마지막 엔트리의 term
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.snapshot_data = None
+        self.snapshot_threshold = snapshot_threshold  # 스냅샷 이후 로그가 이만큼 쌓이면 압축
+
+        # 커밋된 엔트리를 적용하는 상태 머신 (기본: 키-값 저장소)
+        self.state_machine = state_machine or KeyValueStateMachine()
+
         # 커밋/적용 인덱스 (Extra_1)
         self.commit_index = 0
         self.last_applied = 0
@@ -49,89 +441,301 @@ class RaftNode:
         self.next_index = {i: 1 for i in cluster_nodes}
         self.match_index = {i: 0 for i in cluster_nodes}
 
-        # 시간 관리
-        self.election_timeout = random.uniform(5.0, 10.0)  # 랜덤 선출 타임아웃
-        self.last_heartbeat = time.time()
+        # AppendEntries 배치/파이프라이닝 설정
+        # 한 번에 보내는 최대 엔트리 수와 팔로워별 동시 전송(in-flight) 요청 수
+        self.max_batch_entries = max_batch_entries
+        self.max_inflight = max_inflight
+        self.inflight = {i: 0 for i in cluster_nodes}
+        # 거절로 next_index 를 되돌릴 때마다 증가. 이전 세대 요청의 실패 응답은 무시한다.
+        self.append_epoch = {i: 0 for i in cluster_nodes}
+        self._replicating = set()  # _replicate_to 재진입 방지 (동기 RPC 모드)
+
+        # 클라이언트 제안 (propose): 다음 복제 라운드에 한 배치로 묶어 로그에 추가
+        self.pending_commands = []  # [(command, future)]
+        self.commit_futures = {}  # {로그 인덱스: future} 커밋(적용) 시 결과 전달
+        self.batch_delay = 0.0  # 가상 시간 모드에서 제안을 모으는 시간 (초)
+        self._flush_scheduled = False
+
+        # 선형적 읽기 (ReadIndex / 리더 리스)
+        # AppendEntries 마다 순번을 매기고, 팔로워별로 응답받은 가장 큰 순번과 그 전송 시각을 기록한다.
+        self.lease_reads = lease_reads
+        self.lease_ratio = 0.9  # 시계 오차를 감안해 최소 선출 타임아웃의 이 비율까지만 리스 인정
+        self.pending_reads = []  # [[future, key, 필요한 순번, read_index]]
+        self._append_seq = 0
+        self.acked_seq = {}
+        self.acked_sent_at = {}
+        self._read_flush_scheduled = False
+
+        # 시간 관리 (clock 을 주입하면 time.time() 대신 가상 시간을 사용)
+        self.clock = clock or time.time
+        self.rng = rng or random
+        self.election_timeout_min = election_timeout_range[0]
+        self.election_timeout = self.rng.uniform(*election_timeout_range)  # 랜덤 선출 타임아웃
+        self.heartbeat_interval = heartbeat_interval
+        self.last_heartbeat = self.clock()
+
+        self.verbose = verbose
 
         # RPC 시뮬레이션을 위해 전체 노드 리스트를 나중에 주입
         self.cluster_nodes_obj = None
+        # 가상 시간 스케줄러 (EventScheduler.add_node 가 주입)
+        self.scheduler = None
+        # RPC 전송 계층. 없으면 cluster_nodes_obj 로 InProcessTransport 를 만든다.
+        self.transport = None
+
+        # 지속 상태 저장소 (SegmentedLogStorage). 있으면 디스크에서 상태를 복구한다.
+        self.storage = storage
+        if storage is not None:
+            self._restore_from_storage()
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    # --- 지속 상태 저장/복구 ---
+    def _restore_from_storage(self):
+        term, voted_for, snapshot, entries = self.storage.load()
+        self.current_term = term
+        self.voted_for = voted_for
+        if snapshot is not None:
+            self.snapshot_index, self.snapshot_term, self.snapshot_data = snapshot
+            self.state_machine.restore(self.snapshot_data)
+            self.commit_index = self.last_applied = self.snapshot_index
+        self.log = entries
+        self._log(
+            f"[{self.id}] 저장소에서 복구: 임기 {term}, 스냅샷 {self.snapshot_index}, "
+            f"로그 {self.last_log_index()}"
+        )
+
+    def _save_hard_state(self):
+        if self.storage is not None:
+            self.storage.save_term_vote(self.current_term, self.voted_for)
+
+    def _save_entries(self, first_index, entries):
+        if self.storage is not None:
+            self.storage.append_entries(first_index, entries)
+
+    def _sync_storage(self):
+        # RPC 를 보내거나 응답하기 전에 지속 상태를 디스크에 확정한다 (group commit)
+        if self.storage is not None:
+            self.storage.sync()
 
     # --- 네트워크 상태 확인 (Extra_2) ---
     def is_reachable(self, target_id):
         # 네트워크 연결 상태 확인 (기본은 True)
         return NETWORK_STATUS.get((self.id, target_id), True)
 
+    # --- RPC 전송: 전송 계층(transport)에 위임 ---
+    def _send_rpc(self, target_id, method, args, on_reply):
+        if self.transport is None:
+            self.transport = InProcessTransport(self.cluster_nodes_obj)
+        self.transport.send(self.id, target_id, method, args, on_reply)
+
+    # --- 더 높은 임기를 본 경우 팔로워로 강등 ---
+    def _step_down(self, term):
+        # 같은 임기에서 물러나는 경우(CheckQuorum)에는 이번 임기의 투표 기록을 유지한다
+        if term > self.current_term:
+            self.current_term = term
+            self.voted_for = None
+        self.state = State.FOLLOWER
+        self.leader_id = None
+        self._save_hard_state()
+        self._fail_pending_proposals()
+        self._fail_pending_reads()
+
+    # --- 로그 인덱스 헬퍼 (스냅샷 오프셋 반영) ---
+    def last_log_index(self):
+        return self.snapshot_index + len(self.log)
+
+    def last_log_term(self):
+        return self.log[-1][1] if self.log else self.snapshot_term
+
+    def term_at(self, index):
+        # index 는 snapshot_index 이상이어야 한다 (그 이전은 이미 버려졌음)
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        return self.log[index - self.snapshot_index - 1][1]
+
     # --- 3. 리더 선출 시작 ---
+    def on_election_timeout(self):
+        if self.pre_vote:
+            self.start_pre_vote()
+        else:
+            self.start_election()
+
+    # --- 3-1. Pre-Vote: 임기를 올리지 않고 과반수의 지지를 먼저 확인 ---
+    def start_pre_vote(self):
+        self._log(f"\n[{self.id}] 선출 시간 초과. 임기 {self.current_term + 1}의 사전 투표를 요청합니다.")
+        self._prevote_round += 1
+        prevote_round = self._prevote_round
+        self.prevotes_received = 1
+        self.leader_id = None
+        self.last_heartbeat = self.clock()  # 실패하면 다음 타임아웃에 다시 시도
+
+        for node_id in self.cluster_nodes:
+            if node_id == self.id:
+                continue
+            self.request_pre_vote(node_id)
+
+        # 동기 전송이면 위 루프 안에서 이미 이겨 선거까지 끝났을 수 있다 (그때는 라운드가 바뀜).
+        # 아직 같은 라운드일 때만 확인한다 (노드가 하나뿐인 클러스터 등)
+        if prevote_round == self._prevote_round and self.state != State.LEADER:
+            self._check_pre_vote_won()
+
+    def request_pre_vote(self, target_id):
+        if not self.is_reachable(target_id):
+            return
+
+        prevote_round = self._prevote_round
+        sent_term = self.current_term
+        self._send_rpc(
+            target_id,
+            "_handle_pre_vote",
+            (
+                self.current_term + 1,
+                self.id,
+                self.last_log_index(),
+                self.last_log_term(),
+            ),
+            lambda vote_granted, term: self._on_pre_vote_reply(
+                prevote_round, sent_term, vote_granted, term
+            ),
+        )
+
+    def _on_pre_vote_reply(self, prevote_round, sent_term, vote_granted, term):
+        if term > self.current_term and not vote_granted:
+            # 뒤처진 쪽은 자신이므로 임기만 따라잡는다 (다른 노드를 방해하지 않음)
+            self._step_down(term)
+            return
+
+        # 그 사이 리더를 찾았거나 선거가 진행된 경우의 늦은 응답은 무시
+        if (
+            prevote_round != self._prevote_round
+            or sent_term != self.current_term
+            or self.state == State.LEADER
+            or self.leader_id is not None
+        ):
+            return
+
+        if vote_granted:
+            self.prevotes_received += 1
+            self._check_pre_vote_won()
+
+    def _check_pre_vote_won(self):
+        votes_needed = len(self.cluster_nodes) // 2 + 1
+        if self.prevotes_received >= votes_needed:
+            self._prevote_round += 1  # 같은 라운드의 남은 응답으로 다시 시작하지 않도록
+            self.prevotes_received = 0
+            self.start_election()
+
+    # --- 3-2. 실제 선거 (임기 증가) ---
     def start_election(self):
-        print(f"\n[{self.id}] 선출 시간 초과. 후보자로 전환합니다.")
+        self._log(f"\n[{self.id}] 후보자로 전환합니다.")
         self.state = State.CANDIDATE
         self.current_term += 1
+        self.elections_started += 1
         self.voted_for = self.id  # 자신에게 투표
         self.votes_received = 1
         self.leader_id = None
-        self.last_heartbeat = time.time()  # 타임아웃 재설정
+        self.last_heartbeat = self.clock()  # 타임아웃 재설정
+        self._save_hard_state()
+        self._sync_storage()
 
-        print(f"[{self.id}] 임기 {self.current_term}의 투표 요청을 보냅니다.")
+        self._log(f"[{self.id}] 임기 {self.current_term}의 투표 요청을 보냅니다.")
 
-        votes_needed = len(self.cluster_nodes) // 2 + 1
-
-        # 다른 노드들에게 투표 요청 RPC 시뮬레이션
+        # 다른 노드들에게 투표 요청 RPC (응답은 _on_vote_reply 에서 집계)
         for node_id in self.cluster_nodes:
             if node_id == self.id:
                 continue
+            self.request_vote(node_id)
 
-            vote_granted, term = self.request_vote(node_id)
-
-            if term > self.current_term:
-                # 더 큰 term 을 본 경우 바로 팔로워로 강등
-                self.current_term = term
-                self.state = State.FOLLOWER
-                self.voted_for = None
-                print(f"[{self.id}] 더 높은 임기 {term} 발견. 팔로워로 강등.")
-                return  # 선거 중단
-
-            if vote_granted and self.state == State.CANDIDATE:
-                self.votes_received += 1
-                print(
-                    f"[{self.id}] Node {node_id}로부터 투표 획득. "
-                    f"총 {self.votes_received}/{votes_needed}표."
-                )
+        # 단일 노드 클러스터는 자기 표만으로 당선
+        self._check_election_won()
+
+        if self.scheduler is None and self.state == State.CANDIDATE:
+            self._log(f"\n[{self.id}] 과반수 득표 실패. 다음 선거 대기.")
+            # 실제로는 랜덤 시간을 기다린 후 재선거 시작
+
+    def _heard_from_leader_recently(self):
+        if self.state == State.LEADER:
+            return self._lease_valid()
+        return (
+            self.state == State.FOLLOWER
+            and self.leader_id is not None
+            and self.clock() - self.last_heartbeat < self.election_timeout_min
+        )
+
+    # --- 4. RequestVote RPC (다른 노드에게 요청) ---
+    def request_vote(self, target_id):
+        # 네트워크 분할로 도달 불가하면 실패로 간주 (Extra_2)
+        if not self.is_reachable(target_id):
+            return
 
-        # 투표 결과 확인
+        election_term = self.current_term
+        self._send_rpc(
+            target_id,
+            "_handle_request_vote",
+            (
+                self.current_term,
+                self.id,
+                self.last_log_index(),
+                self.last_log_term(),
+            ),
+            lambda vote_granted, term: self._on_vote_reply(
+                target_id, election_term, vote_granted, term
+            ),
+        )
+
+    # --- 4-1. RequestVote 응답 처리 ---
+    def _on_vote_reply(self, node_id, election_term, vote_granted, term):
+        if term > self.current_term:
+            # 더 큰 term 을 본 경우 바로 팔로워로 강등
+            self._step_down(term)
+            self._log(f"[{self.id}] 더 높은 임기 {term} 발견. 팔로워로 강등.")
+            return
+
+        # 이미 끝난 선거에 대한 늦은 응답은 무시
+        if self.state != State.CANDIDATE or self.current_term != election_term:
+            return
+
+        if vote_granted:
+            self.votes_received += 1
+            self._log(
+                f"[{self.id}] Node {node_id}로부터 투표 획득. "
+                f"총 {self.votes_received}/{len(self.cluster_nodes) // 2 + 1}표."
+            )
+            self._check_election_won()
+
+    # --- 4-2. 투표 결과 확인 ---
+    def _check_election_won(self):
+        votes_needed = len(self.cluster_nodes) // 2 + 1
         if self.state == State.CANDIDATE and self.votes_received >= votes_needed:
             self.state = State.LEADER
             self.leader_id = self.id
+            self.leader_since = self.clock()
 
             # 리더가 되면 로그 복제를 위한 next_index/match_index 초기화 (Extra_1)
-            last_log_index = len(self.log)
+            last_log_index = self.last_log_index()
             self.next_index = {i: last_log_index + 1 for i in self.cluster_nodes}
             self.match_index = {i: 0 for i in self.cluster_nodes}
             self.match_index[self.id] = last_log_index
+            self.inflight = {i: 0 for i in self.cluster_nodes}
+            self.append_epoch = {i: 0 for i in self.cluster_nodes}
+            self.acked_seq = {i: 0 for i in self.cluster_nodes}
+            self.acked_sent_at = {i: float("-inf") for i in self.cluster_nodes}
+
+            # 현재 임기의 엔트리가 커밋되어야 commit_index 를 읽기 기준으로 쓸 수 있으므로
+            # 당선 직후 빈(no-op) 엔트리를 추가한다
+            self.log.append((NOOP_COMMAND, self.current_term))
+            self._save_entries(self.last_log_index(), self.log[-1:])
 
-            print(f"\n🎉🎉🎉 [{self.id}] 리더 당선! 임기 {self.current_term}. 🎉🎉🎉")
+            self._log(f"\n🎉🎉🎉 [{self.id}] 리더 당선! 임기 {self.current_term}. 🎉🎉🎉")
             # 리더 당선 후 바로 하트비트(= AppendEntries) 전송
+            self.last_heartbeat = self.clock()
             self.send_append_entries()
-        elif self.state == State.CANDIDATE:
-            print(f"\n[{self.id}] 과반수 득표 실패. 다음 선거 대기.")
-            # 실제로는 랜덤 시간을 기다린 후 재선거 시작
-
-    # --- 4. RequestVote RPC (다른 노드에게 요청) ---
-    def request_vote(self, target_id):
-        # 네트워크 분할로 도달 불가하면 실패로 간주 (Extra_2)
-        if not self.is_reachable(target_id):
-            return False, self.current_term
-
-        target_node = next(
-            (n for n in self.cluster_nodes_obj if n.id == target_id), None
-        )
-        if target_node:
-            return target_node._handle_request_vote(
-                self.current_term,
-                self.id,
-                len(self.log),
-                self.log[-1][1] if self.log else 0,
-            )
-        return False, self.current_term
+            # 선출 타임아웃 대신 하트비트 간격으로 타이머 재설정
+            if self.scheduler is not None:
+                self.scheduler.arm_timer(self)
 
     # --- 5. RequestVote 핸들러 (내부 로직) ---
     def _handle_request_vote(self, term, candidate_id, last_log_index, last_log_term):
@@ -139,99 +743,264 @@ class RaftNode:
         if term < self.current_term:
             return False, self.current_term  # 오래된 임기는 거부
 
+        # 현재 리더에게서 최소 선출 타임아웃 안에 소식을 들었다면 임기도 올리지 않고 거부한다.
+        # (리더 리스 동안 다른 리더가 뽑히지 않도록 보장)
+        # Pre-Vote/CheckQuorum/리스를 모두 끈 경우에는 원래 Raft 처럼 임기만 보고 판단한다
+        if (self.pre_vote or self.check_quorum or self.lease_reads) and self._heard_from_leader_recently():
+            return False, self.current_term
+
         if term > self.current_term:
-            self.current_term = term
-            self.state = State.FOLLOWER
-            self.voted_for = None
-            self.leader_id = None
-            print(f"[{self.id}] 더 높은 임기 {term} 수신. 팔로워로 강등.")
+            self._step_down(term)
+            self._log(f"[{self.id}] 더 높은 임기 {term} 수신. 팔로워로 강등.")
 
         vote_granted = False
 
         # 2. 투표 자격 확인
         can_vote = self.voted_for is None or self.voted_for == candidate_id
 
-        # 3. 후보자의 로그가 최소한 자신만큼 최신인지 검사 (간단 버전)
-        my_last_term = self.log[-1][1] if self.log else 0
-        my_last_index = len(self.log)
-
-        log_up_to_date = (last_log_term > my_last_term) or (
-            last_log_term == my_last_term and last_log_index >= my_last_index
-        )
-
-        if can_vote and log_up_to_date:
+        # 3. 후보자의 로그가 최소한 자신만큼 최신인지 검사
+        if can_vote and self._log_up_to_date(last_log_index, last_log_term):
             self.voted_for = candidate_id
-            self.last_heartbeat = time.time()  # 투표 후 타임아웃 재설정
+            self._save_hard_state()
+            self.last_heartbeat = self.clock()  # 투표 후 타임아웃 재설정
             vote_granted = True
-            print(f"[{self.id}] {candidate_id}에게 투표 승인 (Term {self.current_term}).")
+            self._log(f"[{self.id}] {candidate_id}에게 투표 승인 (Term {self.current_term}).")
 
+        self._sync_storage()
         return vote_granted, self.current_term
 
+    def _log_up_to_date(self, last_log_index, last_log_term):
+        my_last_term = self.last_log_term()
+        return (last_log_term > my_last_term) or (
+            last_log_term == my_last_term and last_log_index >= self.last_log_index()
+        )
+
+    # --- 5-1. Pre-Vote 핸들러: 상태(임기/투표)를 전혀 바꾸지 않는다 ---
+    def _handle_pre_vote(self, term, candidate_id, last_log_index, last_log_term):
+        # term 은 후보가 선거를 시작하면 갖게 될 임기 (현재 임기 + 1)
+        if term < self.current_term or self._heard_from_leader_recently():
+            return False, self.current_term
+        return self._log_up_to_date(last_log_index, last_log_term), self.current_term
+
     # --- 6. AppendEntries RPC (하트비트 / 로그 복제) 처리 (Extra_1) ---
+    # 반환값: (success, term, conflict_index, conflict_term)
+    # 실패 시 conflict_index/conflict_term 힌트로 리더가 한 임기씩 건너뛰어 되돌아갈 수 있다.
     def handle_append_entries(
         self, term, leader_id, prev_log_index, prev_log_term, entries, leader_commit
     ):
         # (1) 임기 확인
         if term < self.current_term:
-            return False, self.current_term
+            return False, self.current_term, None, None
 
         # 리더의 term 이 더 크거나 같으면 팔로워로 전환
         if term > self.current_term:
             self.current_term = term
             self.voted_for = None
-            print(f"[{self.id}] 더 높은 임기 {term} 수신. 임기 업데이트.")
+            self._save_hard_state()
+            self._log(f"[{self.id}] 더 높은 임기 {term} 수신. 임기 업데이트.")
 
         self.state = State.FOLLOWER
         self.leader_id = leader_id
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = self.clock()
 
         # (2) 로그 일관성 검사
-        if prev_log_index > len(self.log):
-            return False, self.current_term
+        if prev_log_index > self.last_log_index():
+            # 로그가 짧으면 내 로그의 끝 다음부터 보내달라고 알린다
+            self._sync_storage()
+            return False, self.current_term, self.last_log_index() + 1, None
+
+        if prev_log_index < self.snapshot_index:
+            # 스냅샷에 이미 포함된 (커밋된) 앞부분은 건너뛴다
+            skip = self.snapshot_index - prev_log_index
+            entries = entries[skip:]
+            prev_log_index = self.snapshot_index
+            prev_log_term = self.snapshot_term
 
         if prev_log_index > 0:
-            local_prev_term = self.log[prev_log_index - 1][1]
+            local_prev_term = self.term_at(prev_log_index)
             if local_prev_term != prev_log_term:
                 # prev_log_index 에 해당하는 term 이 다르면 불일치
-                return False, self.current_term
+                # 충돌한 term 이 시작되는 첫 인덱스를 힌트로 돌려준다
+                conflict_index = prev_log_index
+                while (
+                    conflict_index - 1 > self.snapshot_index
+                    and self.term_at(conflict_index - 1) == local_prev_term
+                ):
+                    conflict_index -= 1
+                self._sync_storage()
+                return False, self.current_term, conflict_index, local_prev_term
 
         # (3) 충돌 로그 삭제 및 새 엔트리 추가
-        if entries:
-            # prev_log_index 이후의 로그를 모두 지우고
-            if prev_log_index < len(self.log):
-                self.log = self.log[:prev_log_index]
-
-            # 새 엔트리 추가
-            self.log.extend(entries)
-            print(
-                f"[{self.id}] 로그 {len(entries)}개 복제 완료. "
-                f"현재 로그 길이: {len(self.log)}"
+        # 이미 가진 엔트리와 같으면 건너뛰고, term 이 다른 첫 위치부터만 지운다.
+        # (파이프라인으로 중복/지연 도착한 요청이 뒤쪽 로그를 지우지 않도록)
+        # 리스트를 새로 복사하지 않고 그 자리에서 잘라낸다.
+        for offset, entry in enumerate(entries):
+            index = prev_log_index + 1 + offset
+            if index <= self.last_log_index():
+                if self.term_at(index) == entry[1]:
+                    continue
+                del self.log[index - self.snapshot_index - 1:]
+            self.log.extend(entries[offset:])
+            self._save_entries(index, entries[offset:])
+            self._log(
+                f"[{self.id}] 로그 {len(entries) - offset}개 복제 완료. "
+                f"현재 로그 길이: {self.last_log_index()}"
             )
+            break
 
-        # (4) 커밋 인덱스 업데이트
+        # (4) 커밋 인덱스 업데이트 (이번 요청으로 확인된 마지막 엔트리까지만)
+        last_new_index = prev_log_index + len(entries)
         if leader_commit > self.commit_index:
-            self.commit_index = min(leader_commit, len(self.log))
+            self.commit_index = max(
+                self.commit_index, min(leader_commit, last_new_index)
+            )
             self._apply_logs()
 
-        return True, self.current_term
+        self._sync_storage()
+        return True, self.current_term, None, None
 
     # --- 6-1. 커밋된 로그를 상태 머신에 적용 ---
     def _apply_logs(self):
-        while self.commit_index > self.last_applied:
-            self.last_applied += 1
-            command, term = self.log[self.last_applied - 1]
-            # 실제 상태 머신 적용 로직 대신 출력만 수행
-            print(
-                f"[{self.id}] 로그 인덱스 {self.last_applied} 적용(커밋). "
-                f"command={command}, term={term}"
+        # 새로 커밋된 연속 구간 전체를 한 번에 상태 머신에 넘긴다
+        if self.commit_index <= self.last_applied:
+            return
+        first_index = self.last_applied + 1
+        start = first_index - self.snapshot_index - 1
+        entries = self.log[start:self.commit_index - self.snapshot_index]
+        results = self.state_machine.apply_batch(first_index, entries)
+        self.last_applied = self.commit_index
+
+        if self.commit_futures:
+            for index, result in enumerate(results, first_index):
+                future = self.commit_futures.pop(index, None)
+                if future is not None:
+                    future.set_result(result)
+
+        if self.verbose:
+            command, term = entries[-1]
+            self._log(
+                f"[{self.id}] 로그 인덱스 {first_index}~{self.last_applied} 적용(커밋) "
+                f"{len(entries)}개. 마지막 command={command}, term={term}"
             )
 
-    # --- 7. 리더의 AppendEntries 전송 (하트비트 + 로그 복제) ---
-    def send_append_entries(self):
+        if self.last_applied - self.snapshot_index >= self.snapshot_threshold:
+            self.take_snapshot()
+
+    # --- 6-2. 스냅샷 생성 (로그 압축) ---
+    def take_snapshot(self):
+        """적용이 끝난 last_applied 까지의 상태를 스냅샷으로 저장하고 그 앞의 로그를 버린다."""
+        if self.last_applied <= self.snapshot_index:
+            return
+        self.snapshot_term = self.term_at(self.last_applied)
+        self.snapshot_data = self.state_machine.snapshot()
+        if self.storage is not None:
+            self.storage.save_snapshot(self.last_applied, self.snapshot_term, self.snapshot_data)
+        del self.log[:self.last_applied - self.snapshot_index]
+        self._log(
+            f"[{self.id}] 스냅샷 생성: 인덱스 {self.snapshot_index + 1}~{self.last_applied} 압축."
+        )
+        self.snapshot_index = self.last_applied
+
+    # --- 6-3. InstallSnapshot RPC 처리 ---
+    def handle_install_snapshot(
+        self, term, leader_id, last_included_index, last_included_term, data
+    ):
+        if term < self.current_term:
+            return False, self.current_term
+
+        if term > self.current_term:
+            self.current_term = term
+            self.voted_for = None
+            self._save_hard_state()
+
+        self.state = State.FOLLOWER
+        self.leader_id = leader_id
+        self.last_heartbeat = self.clock()
+
+        # 이미 적용한 범위의 스냅샷이면 무시
+        if last_included_index <= self.last_applied:
+            self._sync_storage()
+            return True, self.current_term
+
+        if (
+            last_included_index <= self.last_log_index()
+            and self.term_at(last_included_index) == last_included_term
+        ):
+            # 스냅샷 뒤쪽의 로그는 유지
+            del self.log[:last_included_index - self.snapshot_index]
+        else:
+            self.log = []
+            if self.storage is not None:
+                self.storage.truncate(last_included_index + 1)
+
+        if self.storage is not None:
+            self.storage.save_snapshot(last_included_index, last_included_term, data)
+        self.snapshot_index = last_included_index
+        self.snapshot_term = last_included_term
+        # 스냅샷 형식은 상태 머신이 정한다. 복원한 뒤 상태 머신이 만든 사본을 보관해
+        # (프로세스 내 전송에서) 리더의 스냅샷 객체를 공유하지 않는다
+        self.state_machine.restore(data)
+        self.snapshot_data = self.state_machine.snapshot()
+        self.commit_index = max(self.commit_index, last_included_index)
+        self.last_applied = last_included_index
+        self._log(f"[{self.id}] 리더 {leader_id}의 스냅샷 설치 (인덱스 {last_included_index}).")
+        self._sync_storage()
+        return True, self.current_term
+
+    # --- 7. 클라이언트 제안 API ---
+    def propose(self, command):
+        """
+        command 를 로그에 넣도록 요청하고, 커밋되어 적용되면 상태 머신의 결과로 완료되는 Future 를 돌려준다.
+        리더가 아니면 NotLeaderError 로 완료된다. 모인 제안은 다음 복제 라운드에 한 배치로 보낸다.
+        """
+        future = Future()
         if self.state != State.LEADER:
+            future.set_exception(NotLeaderError(self.leader_id))
+            return future
+
+        self.pending_commands.append((command, future))
+        if self.scheduler is not None and not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.scheduler.call_later(self.batch_delay, self._flush_proposals)
+        return future
+
+    def _flush_proposals(self):
+        """대기 중인 제안을 모두 로그에 추가하고 한 번의 복제 라운드로 보낸다."""
+        self._flush_scheduled = False
+        if not self.pending_commands or self.state != State.LEADER:
             return
 
-        # 각 팔로워에게 자신의 로그를 전송
+        first_index = self.last_log_index() + 1
+        batch = [(command, self.current_term) for command, _ in self.pending_commands]
+        for offset, (_, future) in enumerate(self.pending_commands):
+            self.commit_futures[first_index + offset] = future
+        self.pending_commands = []
+
+        self.log.extend(batch)
+        self._save_entries(first_index, batch)
+        self._log(f"[{self.id}] 리더가 새 로그 {len(batch)}개 추가 (인덱스 {first_index}~)")
+        self.send_append_entries(heartbeat=False)
+
+    def _fail_pending_proposals(self):
+        # 리더 자리를 잃으면 결과를 알 수 없으므로 기다리던 제안을 실패 처리
+        error = NotLeaderError(self.leader_id)
+        for _, future in self.pending_commands:
+            future.set_exception(error)
+        for future in self.commit_futures.values():
+            future.set_exception(error)
+        self.pending_commands = []
+        self.commit_futures = {}
+
+    # --- 7-1. 리더의 AppendEntries 전송 (하트비트 + 로그 복제) ---
+    def send_append_entries(self, heartbeat=True):
+        if self.state != State.LEADER:
+            return
+
+        # 리더 자신의 엔트리도 디스크에 확정된 뒤에야 과반수 집계에 포함
+        self._sync_storage()
+        self.match_index[self.id] = self.last_log_index()
+
+        # 각 팔로워에게 자신의 로그를 전송 (응답은 _on_append_entries_reply 에서 처리)
         for node_id in self.cluster_nodes:
             if node_id == self.id:
                 continue
@@ -240,48 +1009,186 @@ class RaftNode:
             if not self.is_reachable(node_id):
                 continue
 
-            next_idx = self.next_index.get(node_id, 1)
-            prev_idx = next_idx - 1
+            # 지난 하트비트 이후에도 응답이 오지 않은 요청은 유실된 것으로 보고
+            # 마지막으로 확인된 위치부터 다시 보낸다
+            if heartbeat and self.inflight[node_id] > 0:
+                self._reset_replication(node_id, self.match_index[node_id] + 1)
 
-            prev_term = self.log[prev_idx - 1][1] if prev_idx > 0 else 0
-            entries_to_send = self.log[prev_idx:]
+            self._replicate_to(node_id, heartbeat=heartbeat)
+            if self.state != State.LEADER:
+                return
 
-            target_node = next(
-                (n for n in self.cluster_nodes_obj if n.id == node_id), None
-            )
-            if not target_node:
-                continue
+        # 전송 후 과반수 복제 여부 확인
+        self._check_commit_majority()
 
-            success, term = target_node.handle_append_entries(
+    # --- 7-2. 팔로워 한 명에게 배치 단위로 파이프라인 전송 ---
+    def _replicate_to(self, node_id, heartbeat=False):
+        """
+        next_index 부터 최대 max_batch_entries 개씩 잘라 응답을 기다리지 않고 보낸다.
+        동시에 max_inflight 개까지 전송하며, next_index 는 보낸 만큼 미리 전진시킨다.
+        heartbeat=True 이면 보낼 엔트리가 없어도 빈 AppendEntries 를 하나 보낸다.
+        """
+        if node_id in self._replicating:
+            return  # 동기 RPC 모드에서 응답 처리 중 재귀 호출 방지 (바깥 루프가 계속 전송)
+        self._replicating.add(node_id)
+        try:
+            sent = False
+            while (
+                self.state == State.LEADER
+                and self.inflight[node_id] < self.max_inflight
+            ):
+                prev_idx = self.next_index[node_id] - 1
+                if prev_idx >= self.last_log_index() and (sent or not heartbeat):
+                    break
+
+                if prev_idx < self.snapshot_index:
+                    # 필요한 로그가 이미 압축되었으면 스냅샷을 보낸다
+                    self._send_snapshot(node_id)
+                    break
+
+                prev_term = self.term_at(prev_idx) if prev_idx > 0 else 0
+                start = prev_idx - self.snapshot_index
+                entries_to_send = self.log[start:start + self.max_batch_entries]
+                sent_last_index = prev_idx + len(entries_to_send)
+
+                self.next_index[node_id] = sent_last_index + 1
+                self.inflight[node_id] += 1
+                sent = True
+
+                self._send_rpc(
+                    node_id,
+                    "handle_append_entries",
+                    (
+                        self.current_term,
+                        self.id,
+                        prev_idx,
+                        prev_term,
+                        entries_to_send,
+                        self.commit_index,
+                    ),
+                    self._make_append_reply_handler(
+                        node_id,
+                        self.current_term,
+                        sent_last_index,
+                        self.append_epoch[node_id],
+                    ),
+                )
+        finally:
+            self._replicating.discard(node_id)
+
+    def _send_snapshot(self, node_id):
+        self.next_index[node_id] = self.snapshot_index + 1
+        self.inflight[node_id] = self.max_inflight  # 스냅샷 응답 전까지 추가 전송 중단
+        sent_term = self.current_term
+        last_included_index = self.snapshot_index
+        epoch = self.append_epoch[node_id]
+        self._send_rpc(
+            node_id,
+            "handle_install_snapshot",
+            (
                 self.current_term,
                 self.id,
-                prev_idx,
-                prev_term,
-                entries_to_send,
-                self.commit_index,
+                self.snapshot_index,
+                self.snapshot_term,
+                self.snapshot_data,
+            ),
+            lambda success, term: self._on_install_snapshot_reply(
+                node_id, sent_term, last_included_index, epoch, success, term
+            ),
+        )
+
+    def _on_install_snapshot_reply(
+        self, node_id, sent_term, last_included_index, epoch, success, term
+    ):
+        if term > self.current_term:
+            self._step_down(term)
+            return
+        if (
+            self.state != State.LEADER
+            or self.current_term != sent_term
+            or epoch != self.append_epoch[node_id]
+        ):
+            return
+        self.inflight[node_id] = 0
+        if success:
+            self.match_index[node_id] = max(self.match_index[node_id], last_included_index)
+            self.next_index[node_id] = self.match_index[node_id] + 1
+            self._check_commit_majority()
+        self._replicate_to(node_id)
+
+    def _reset_replication(self, node_id, next_index):
+        # 진행 중인 요청을 모두 버리고 next_index 부터 다시 시작
+        self.append_epoch[node_id] += 1
+        self.inflight[node_id] = 0
+        self.next_index[node_id] = max(next_index, self.match_index[node_id] + 1)
+
+    def _make_append_reply_handler(self, node_id, sent_term, sent_last_index, epoch):
+        # 요청마다 순번과 전송 시각을 붙여 ReadIndex/리스 확인에 사용
+        self._append_seq += 1
+        seq = self._append_seq
+        sent_at = self.clock()
+        return lambda success, term, conflict_index, conflict_term: (
+            self._on_append_entries_reply(
+                node_id, sent_term, sent_last_index, epoch, seq, sent_at,
+                success, term, conflict_index, conflict_term,
             )
+        )
 
-            if term > self.current_term:
-                # 더 큰 term 발견 시 즉시 팔로워로 강등
-                self.current_term = term
-                self.state = State.FOLLOWER
-                self.voted_for = None
-                self.leader_id = None
-                print(f"[{self.id}] AppendEntries 응답에서 더 높은 임기 {term} 발견. 팔로워로 강등.")
-                return
+    # --- 7-3. AppendEntries 응답 처리 ---
+    def _on_append_entries_reply(
+        self, node_id, sent_term, sent_last_index, epoch, seq, sent_at,
+        success, term, conflict_index, conflict_term,
+    ):
+        if term > self.current_term:
+            # 더 큰 term 발견 시 즉시 팔로워로 강등
+            self._step_down(term)
+            self._log(f"[{self.id}] AppendEntries 응답에서 더 높은 임기 {term} 발견. 팔로워로 강등.")
+            return
 
-            if success:
-                # 성공 시 next_index와 match_index 업데이트
-                self.next_index[node_id] = len(self.log) + 1
-                self.match_index[node_id] = len(self.log)
-            else:
-                # 실패 시 next_index를 줄여서 다시 시도
-                self.next_index[node_id] = max(1, self.next_index[node_id] - 1)
+        # 이전 임기에 보낸 요청에 대한 늦은 응답은 무시
+        if self.state != State.LEADER or self.current_term != sent_term:
+            return
 
-        # 전송 후 과반수 복제 여부 확인
-        self._check_commit_majority()
+        # 성공/실패와 무관하게 팔로워가 이 리더를 인정했다는 확인
+        self._note_ack(node_id, seq, sent_at)
+
+        # epoch 이 None 이면 읽기 확인용 하트비트 (in-flight 창과 무관)
+        current_epoch = epoch is not None and epoch == self.append_epoch[node_id]
+        if current_epoch:
+            self.inflight[node_id] -= 1
+
+        if success:
+            # 성공 시 match_index 업데이트 (next_index 는 전송 시 이미 전진)
+            if sent_last_index > self.match_index[node_id]:
+                self.match_index[node_id] = sent_last_index
+                self._check_commit_majority()
+            self.next_index[node_id] = max(
+                self.next_index[node_id], self.match_index[node_id] + 1
+            )
+        elif current_epoch and conflict_index is not None:
+            # 실패 시 충돌 힌트로 한 번에 되돌아가서 다시 시도
+            self._reset_replication(
+                node_id, self._next_index_from_hint(conflict_index, conflict_term)
+            )
+        else:
+            return
 
-    # --- 7-1. 과반수 복제 여부 확인 및 커밋 (Extra_1) ---
+        # 남은 엔트리가 있으면 계속 흘려보낸다
+        self._replicate_to(node_id)
+
+    def _next_index_from_hint(self, conflict_index, conflict_term):
+        if conflict_term is not None:
+            # 리더도 conflict_term 엔트리를 가지고 있으면 그 마지막 엔트리 다음부터
+            for index in range(self.last_log_index(), self.snapshot_index, -1):
+                entry_term = self.term_at(index)
+                if entry_term == conflict_term:
+                    return index + 1
+                if entry_term < conflict_term:
+                    break
+        # 아니면 팔로워가 알려준 충돌 term 의 시작 위치부터
+        return max(1, min(conflict_index, self.last_log_index() + 1))
+
+    # --- 7-4. 과반수 복제 여부 확인 및 커밋 (Extra_1) ---
     def _check_commit_majority(self):
         # 과반수 노드가 복제한 가장 높은 인덱스를 찾음
         matched = sorted(self.match_index.values(), reverse=True)
@@ -291,73 +1198,312 @@ class RaftNode:
         if (
             majority_match_index > self.commit_index
             and majority_match_index > 0
-            and self.log[majority_match_index - 1][1] == self.current_term
+            and self.term_at(majority_match_index) == self.current_term
         ):
             self.commit_index = majority_match_index
             self._apply_logs()
+            if self.pending_reads:
+                self._check_reads()
+
+    # --- 8. 선형적 읽기 (ReadIndex / 리더 리스) ---
+    def read(self, key):
+        """
+        로그에 아무것도 쓰지 않는 선형적 읽기. key 의 값으로 완료되는 Future 를 돌려준다.
+        ReadIndex: 현재 commit_index 를 기록하고, 그 뒤에 보낸 하트비트에 과반수가 응답해
+        리더임이 확인되면 그 인덱스까지 적용된 상태에서 읽는다 (한 번의 왕복).
+        lease_reads=True 이고 최근 과반수 하트비트로 얻은 리스가 유효하면 바로 읽는다.
+        """
+        future = Future()
+        if self.state != State.LEADER:
+            future.set_exception(NotLeaderError(self.leader_id))
+            return future
+
+        if self.lease_reads and self._committed_in_term() and self._lease_valid():
+            future.set_result(self.state_machine.query(key))
+            return future
+
+        read_index = self.commit_index if self._committed_in_term() else None
+        self.pending_reads.append([future, key, self._append_seq, read_index])
+
+        # 같은 시각에 들어온 읽기들은 하트비트 한 라운드로 함께 확인
+        if self.scheduler is None:
+            self._flush_reads()
+        elif not self._read_flush_scheduled:
+            self._read_flush_scheduled = True
+            self.scheduler.call_later(0.0, self._flush_reads)
+        return future
+
+    def _committed_in_term(self):
+        return self.commit_index > 0 and self.term_at(self.commit_index) == self.current_term
+
+    def _lease_start(self):
+        # 과반수(자신 포함)가 응답한 AppendEntries 중 가장 늦게 보낸 것의 전송 시각
+        now = self.clock()
+        sent_times = sorted(
+            (now if i == self.id else self.acked_sent_at.get(i, float("-inf"))
+             for i in self.cluster_nodes),
+            reverse=True,
+        )
+        return sent_times[len(self.cluster_nodes) // 2]
+
+    def _lease_valid(self):
+        # 리스 시작부터 최소 선출 타임아웃 동안은 다른 리더가 생길 수 없다
+        return self.clock() < self._lease_start() + self.election_timeout_min * self.lease_ratio
+
+    def _quorum_deadline(self):
+        # CheckQuorum: 이 시각까지 과반수의 응답이 없으면 리더에서 물러난다.
+        # 팔로워가 다른 후보에게 투표할 수 있게 되기 전에 물러나도록 리스와 같은 길이를 쓴다.
+        # 당선 직후에는 아직 응답이 없으므로 당선 시각부터 센다.
+        start = max(self._lease_start(), self.leader_since)
+        return start + self.election_timeout_min * self.lease_ratio
+
+    def _flush_reads(self):
+        """대기 중인 읽기를 위해 모든 팔로워에게 빈 하트비트를 한 번 보낸다."""
+        self._read_flush_scheduled = False
+        if self.state != State.LEADER or not self.pending_reads:
+            return
+        for node_id in self.cluster_nodes:
+            if node_id == self.id or not self.is_reachable(node_id):
+                continue
+            # prev_log_index=0 이면 일관성 검사가 항상 통과하므로 복제 상태와 무관하게 보낼 수 있다
+            self._send_rpc(
+                node_id,
+                "handle_append_entries",
+                (self.current_term, self.id, 0, 0, [], self.commit_index),
+                self._make_append_reply_handler(node_id, self.current_term, 0, None),
+            )
+            if self.state != State.LEADER:
+                return
+        self._check_reads()
+
+    def _note_ack(self, node_id, seq, sent_at):
+        if seq > self.acked_seq.get(node_id, 0):
+            self.acked_seq[node_id] = seq
+            self.acked_sent_at[node_id] = sent_at
+            if self.pending_reads:
+                self._check_reads()
+
+    def _check_reads(self):
+        if not self.pending_reads:
+            return
+        majority = len(self.cluster_nodes) // 2 + 1
+        ready = []
+        waiting = []
+        for read in self.pending_reads:
+            future, key, seq, read_index = read
+            if read_index is None and self._committed_in_term():
+                read[3] = read_index = self.commit_index
+            confirmed = 1 + sum(
+                1 for i in self.cluster_nodes
+                if i != self.id and self.acked_seq.get(i, 0) > seq
+            )
+            if read_index is not None and confirmed >= majority and self.last_applied >= read_index:
+                ready.append(read)
+            else:
+                waiting.append(read)
+        self.pending_reads = waiting
+        for future, key, _, _ in ready:
+            future.set_result(self.state_machine.query(key))
+
+    def _fail_pending_reads(self):
+        error = NotLeaderError(self.leader_id)
+        for future, _, _, _ in self.pending_reads:
+            future.set_exception(error)
+        self.pending_reads = []
+
+    # --- 9. 메인 루프에서 노드 상태 체크 ---
+    def next_deadline(self):
+        """다음에 check_status 가 할 일이 생기는 시각 (하트비트 또는 선출 타임아웃)."""
+        if self.state == State.LEADER:
+            heartbeat_at = self.last_heartbeat + self.heartbeat_interval
+            if self.check_quorum:
+                return min(heartbeat_at, self._quorum_deadline())
+            return heartbeat_at
+        return self.last_heartbeat + self.election_timeout
 
-    # --- 8. 메인 루프에서 노드 상태 체크 ---
     def check_status(self):
-        now = time.time()
+        now = self.clock()
+        if now < self.next_deadline():
+            return
+
         if self.state in (State.FOLLOWER, State.CANDIDATE):
-            # 선출 타임아웃 확인
-            if now - self.last_heartbeat > self.election_timeout:
-                self.start_election()
+            # 선출 타임아웃 초과
+            self.on_election_timeout()
+
+        elif self.check_quorum and now >= self._quorum_deadline():
+            # 과반수와 연락이 끊긴 리더: 임기는 그대로 두고 팔로워로 물러난다
+            self._log(f"[{self.id}] 과반수와 연락 두절. 리더에서 물러납니다 (임기 {self.current_term}).")
+            self._step_down(self.current_term)
+            self.last_heartbeat = now
 
         elif self.state == State.LEADER:
             # 하트비트/로그 전송 간격 (예: 1초마다)
-            if now - self.last_heartbeat > 1.0:
-                # 간단한 데모를 위해 리더가 주기적으로 새로운 커맨드를 추가
-                command = f"set_x={int(now)}"
-                self.log.append((command, self.current_term))
-                print(f"[{self.id}] 리더가 새 로그 추가: {command}")
+            # 그동안 모인 제안이 있으면 함께 보낸다
+            self.last_heartbeat = now
+            if self.pending_commands:
+                self._flush_proposals()
+            self.send_append_entries()
 
-                self.send_append_entries()
-                self.last_heartbeat = now
+
+# --- 클라이언트 시뮬레이션 ---
+class ClientDriver:
+    """
+    현재 리더에게 주기적으로 커맨드를 제안하는 클라이언트.
+    tick 마다 commands_per_tick 개를 제안하고, 커밋까지 걸린 시간을 기록한다.
+    """
+
+    def __init__(self, nodes, clock=time.time, commands_per_tick=1):
+        self.nodes = nodes
+        self.clock = clock
+        self.commands_per_tick = commands_per_tick
+        self.proposed = 0
+        self.committed = 0
+        self.rejected = 0
+        self.commit_latencies = []
+        self.commit_times = []
+        self._sequence = 0
+
+    def tick(self):
+        leader = next((n for n in self.nodes if n.state == State.LEADER), None)
+        if leader is None:
+            return
+        now = self.clock()
+        for _ in range(self.commands_per_tick):
+            self._sequence += 1
+            if self.commands_per_tick == 1:
+                command = f"set_x={int(now)}"  # 간단한 데모용 커맨드
+            else:
+                command = f"k{self._sequence}={self._sequence}"
+            future = leader.propose(command)
+            self.proposed += 1
+            future.add_done_callback(lambda f, started=now: self._on_done(f, started))
+
+    def _on_done(self, future, started):
+        if future.exception() is not None:
+            self.rejected += 1
+            return
+        self.committed += 1
+        now = self.clock()
+        self.commit_latencies.append(now - started)
+        self.commit_times.append(now)
+
+    def attach(self, scheduler, interval):
+        """가상 시간 스케줄러에서 interval 마다 tick 을 실행한다."""
+        def run():
+            self.tick()
+            scheduler.call_later(interval, run)
+        scheduler.call_later(interval, run)
 
 
 # --- 시뮬레이션 유틸리티 함수 ---
-def run_simulation_step(duration, nodes, desc=None):
+def create_cluster(node_count, scheduler=None, data_dir=None, **node_kwargs):
+    """
+    노드 객체들을 만들고 서로 연결한다. scheduler 가 있으면 가상 시간으로 구동하고,
+    data_dir 이 있으면 노드별 하위 디렉터리에 지속 상태를 저장/복구한다.
+    """
+    cluster_ids = list(range(1, node_count + 1))
+    if scheduler is not None:
+        node_kwargs.setdefault("clock", scheduler.now)
+        node_kwargs.setdefault("rng", scheduler.rng)
+    nodes = []
+    for i in cluster_ids:
+        storage = None
+        if data_dir is not None:
+            storage = SegmentedLogStorage(os.path.join(data_dir, f"node-{i}"))
+        nodes.append(RaftNode(i, cluster_ids, storage=storage, **node_kwargs))
+
+    # 노드 객체 리스트를 각 노드 인스턴스에 저장 (RPC 시뮬레이션을 위해 필요)
+    transport = InProcessTransport(nodes)
+    for node in nodes:
+        node.cluster_nodes_obj = nodes
+        node.transport = transport
+    return nodes
+
+
+def check_single_leader(nodes):
+    leaders = [n.id for n in nodes if n.state == State.LEADER]
+    if len(leaders) > 1:
+        print(
+            "\n🚨🚨🚨 오류: 리더가 2명 이상입니다! "
+            f"(Safety Property 위반) leaders={leaders} 🚨🚨🚨"
+        )
+        return False
+    return True
+
+
+def check_synchronous_election(node_count=5):
+    """
+    동기 전송(InProcessTransport)에서 한 노드의 선거 타임아웃이 리더 한 명을 임기 1로 뽑는지 확인한다.
+    (사전 투표가 송신 루프 안에서 끝났을 때 선거를 한 번 더 시작하던 회귀 확인용)
+    """
+    nodes = create_cluster(node_count, verbose=False)
+    nodes[0].on_election_timeout()
+    leaders = [n for n in nodes if n.state == State.LEADER]
+    ok = (
+        len(leaders) == 1
+        and leaders[0].current_term == 1
+        and all(n.current_term == 1 for n in nodes)
+    )
+    states = ", ".join(f"{n.id}:{n.state.name}/임기 {n.current_term}" for n in nodes)
+    print(f"동기 선거 확인 ({node_count}개 노드): {'통과' if ok else '실패'} [{states}]")
+    assert ok, f"동기 선거 후 리더가 임기 1의 한 명이 아님: {states}"
+    return ok
+
+
+def run_simulation_step(duration, nodes, desc=None, scheduler=None, client=None):
     if desc:
         print(desc)
 
+    # 가상 시간: 다음 이벤트 시각으로 바로 건너뛰며 duration 만큼 진행
+    if scheduler is not None:
+        end_time = scheduler.now() + duration
+        while scheduler.run_next(end_time):
+            if not check_single_leader(nodes):
+                return False
+        return True
+
     start_time = time.time()
+    last_client_tick = 0.0
     while time.time() - start_time < duration:
         for node in nodes:
             node.check_status()
 
+        # 클라이언트는 1초마다 리더에게 커맨드를 제안
+        if client is not None and time.time() - last_client_tick >= 1.0:
+            client.tick()
+            last_client_tick = time.time()
+
         time.sleep(0.5)
 
-        leaders = [n.id for n in nodes if n.state == State.LEADER]
-        if len(leaders) > 1:
-            print(
-                "\n🚨🚨🚨 오류: 리더가 2명 이상입니다! "
-                f"(Safety Property 위반) leaders={leaders} 🚨🚨🚨"
-            )
-            return
+        if not check_single_leader(nodes):
+            return False
+    return True
 
 
 # --- 시뮬레이션 실행 (기본 + 네트워크 분할 테스트) ---
-if __name__ == "__main__":
-    NODE_COUNT = 5
-    CLUSTER_IDS = list(range(1, NODE_COUNT + 1))
+def run_partition_scenario(scheduler=None, verbose=True, phase_duration=10, data_dir=None):
+    nodes = create_cluster(5, scheduler, data_dir, verbose=verbose)
+    rng = scheduler.rng if scheduler is not None else random
 
-    # 노드 객체 생성
-    nodes = [RaftNode(i, CLUSTER_IDS) for i in CLUSTER_IDS]
-
-    # 노드 객체 리스트를 각 노드 인스턴스에 저장 (RPC 시뮬레이션을 위해 필요)
-    for node in nodes:
-        node.cluster_nodes_obj = nodes
+    # 1초마다 리더에게 커맨드를 하나씩 제안하는 클라이언트
+    client = ClientDriver(nodes, clock=nodes[0].clock)
+    if scheduler is not None:
+        client.attach(scheduler, 1.0)
 
     print("--- Raft 시뮬레이션 시작 (5개 노드) ---")
 
     # 초기 선거를 위한 랜덤 타이머 설정 (각 노드의 타이머는 다름)
     for node in nodes:
-        node.last_heartbeat -= random.uniform(0, 10)
+        node.last_heartbeat -= rng.uniform(0, 10)
         print(f"Node {node.id}: 초기 임기 {node.current_term}, 상태 {node.state.name}")
+        if scheduler is not None:
+            scheduler.add_node(node)
 
     # 1단계: 정상 상태에서 잠시 실행
-    run_simulation_step(10, nodes, "\n--- 1단계: 정상 상태 시뮬레이션 (10초) ---")
+    run_simulation_step(
+        phase_duration, nodes,
+        f"\n--- 1단계: 정상 상태 시뮬레이션 ({phase_duration}초) ---", scheduler, client,
+    )
 
     # 2단계: 네트워크 분할 시뮬레이션 (Extra_2_simulation)
     print("\n--- 시뮬레이션: 네트워크 분할 테스트 ---")
@@ -369,7 +1515,10 @@ if __name__ == "__main__":
 
     print("!!! 네트워크 분할: {1, 2} vs {3, 4, 5} !!!")
 
-    run_simulation_step(10, nodes, "\n--- 2단계: 분할된 상태로 10초 실행 ---")
+    run_simulation_step(
+        phase_duration, nodes,
+        f"\n--- 2단계: 분할된 상태로 {phase_duration}초 실행 ---", scheduler, client,
+    )
 
     # 3단계: 분할 복구
     for a in (1, 2):
@@ -378,11 +1527,328 @@ if __name__ == "__main__":
 
     print("!!! 네트워크 복구 !!!")
 
-    run_simulation_step(10, nodes, "\n--- 3단계: 복구 후 10초 실행 ---")
+    run_simulation_step(
+        phase_duration, nodes,
+        f"\n--- 3단계: 복구 후 {phase_duration}초 실행 ---", scheduler, client,
+    )
 
     print("\n--- 시뮬레이션 종료 ---")
     for node in nodes:
         print(
             f"Node {node.id}: 최종 상태 {node.state.name}, "
-            f"임기 {node.current_term}, 리더 ID {node.leader_id}"
+            f"임기 {node.current_term}, 리더 ID {node.leader_id}, "
+            f"커밋 인덱스 {node.commit_index}"
+        )
+    return nodes
+
+
+# --- 부하 테스트: 가상 시간에서 초당 커밋 수 측정 ---
+def run_load_test(rate=50000, duration=5.0, node_count=5, seed=None, tick=0.001):
+    """클라이언트가 초당 rate 개의 커맨드를 제안할 때 커밋 처리량과 지연을 측정한다."""
+    scheduler = EventScheduler(seed=seed)
+    nodes = create_cluster(node_count, scheduler, verbose=False)
+    for node in nodes:
+        scheduler.add_node(node)
+
+    # 리더가 뽑힐 때까지 진행
+    while not any(n.state == State.LEADER for n in nodes):
+        scheduler.run_next()
+
+    client = ClientDriver(
+        nodes, clock=scheduler.now, commands_per_tick=max(1, int(rate * tick))
+    )
+    client.attach(scheduler, tick)
+
+    started = time.time()
+    scheduler.run_until(scheduler.now() + duration)
+    elapsed = time.time() - started
+
+    latencies = sorted(client.commit_latencies)
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    applied = sum(n.state_machine.applied_count for n in nodes)
+    print(
+        f"--- 부하 테스트 ({node_count}개 노드, 제안 {rate}/초, 가상 {duration}초) ---\n"
+        f"제안 {client.proposed}, 커밋 {client.committed}, 거절 {client.rejected}\n"
+        f"커밋 처리량 {client.committed / duration:.0f}/초 (가상 시간), "
+        f"지연 p50 {p50 * 1000:.1f}ms / p99 {p99 * 1000:.1f}ms\n"
+        f"전체 노드 적용 {applied}개, 실제 {elapsed:.2f}초 "
+        f"(시뮬레이션 포함 {applied / elapsed:.0f} applied-ops/초)"
+    )
+    return client
+
+
+# --- 읽기 테스트: ReadIndex / 리스 읽기의 지연과 로그 증가량 ---
+def run_read_test(read_count=10000, lease=False, node_count=5, seed=None, interval=0.001):
+    scheduler = EventScheduler(seed=seed)
+    nodes = create_cluster(node_count, scheduler, verbose=False, lease_reads=lease)
+    for node in nodes:
+        scheduler.add_node(node)
+
+    while not any(n.state == State.LEADER for n in nodes):
+        scheduler.run_next()
+    leader = next(n for n in nodes if n.state == State.LEADER)
+    leader.propose("set_x=1")
+    scheduler.run_until(scheduler.now() + 2.0)
+
+    log_before = leader.last_log_index()
+    latencies = []
+    values = []
+
+    def issue():
+        started = scheduler.now()
+        future = leader.read("set_x")
+        future.add_done_callback(
+            lambda f: (latencies.append(scheduler.now() - started), values.append(f.result()))
+        )
+
+    for i in range(read_count):
+        scheduler.call_later(i * interval, issue)
+    scheduler.run_until(scheduler.now() + read_count * interval + 1.0)
+
+    latencies.sort()
+    mode = "리스" if lease else "ReadIndex"
+    print(
+        f"--- 읽기 테스트 ({mode}, {read_count}회) ---\n"
+        f"완료 {len(latencies)}, 값 {set(values)}, 로그 증가 {leader.last_log_index() - log_before}\n"
+        f"지연 p50 {latencies[len(latencies) // 2] * 1000:.2f}ms / "
+        f"max {latencies[-1] * 1000:.2f}ms"
+    )
+    return latencies
+
+
+# --- 분할 복구 테스트: Pre-Vote / CheckQuorum 효과 ---
+def run_partition_recovery_test(seeds=5, phase_duration=30.0, pre_vote=True, check_quorum=True):
+    """
+    {1, 2} / {3, 4, 5} 분할 전후의 선거 횟수, 복구 후 리더 교체 횟수, 커밋 공백(가장 긴 무커밋 구간)을 잰다.
+    Pre-Vote 와 CheckQuorum 이 켜져 있으면 복구 시점에는 선거도 리더 교체도 임기 변화도 없어야 하며,
+    그렇지 않으면 AssertionError 를 낸다.
+    """
+    results = []
+    for seed in range(seeds):
+        scheduler = EventScheduler(seed=seed)
+        nodes = create_cluster(
+            5, scheduler, verbose=False, pre_vote=pre_vote, check_quorum=check_quorum
+        )
+        for node in nodes:
+            scheduler.add_node(node)
+        client = ClientDriver(nodes, clock=scheduler.now)
+        client.attach(scheduler, 0.05)
+
+        scheduler.run_until(phase_duration)
+        partitioned_at = scheduler.now()
+        for a in (1, 2):
+            for b in (3, 4, 5):
+                set_network_partition(a, b, False)
+        scheduler.run_until(partitioned_at + phase_duration)
+
+        healed_at = scheduler.now()
+        elections_before_heal = sum(n.elections_started for n in nodes)
+        term_before_heal = max(n.current_term for n in nodes)
+        leader_before_heal = next(
+            (n.id for n in nodes if n.state == State.LEADER and n.id in (3, 4, 5)), None
+        )
+        for a in (1, 2):
+            for b in (3, 4, 5):
+                set_network_partition(a, b, True)
+
+        # 복구 후 리더가 바뀐 횟수를 하트비트 간격으로 관찰
+        leader_changes = 0
+        leader_id = leader_before_heal
+        end = healed_at + phase_duration
+        while scheduler.now() < end:
+            scheduler.run_until(scheduler.now() + 0.1)
+            current = next((n.id for n in nodes if n.state == State.LEADER), None)
+            if current != leader_id:
+                leader_changes += 1
+                leader_id = current
+
+        def longest_gap(start, stop):
+            times = [start] + [t for t in client.commit_times if start <= t <= stop] + [stop]
+            return max(b - a for a, b in zip(times, times[1:]))
+
+        results.append({
+            "seed": seed,
+            "elections_partition": elections_before_heal,
+            "elections_after_heal": sum(n.elections_started for n in nodes) - elections_before_heal,
+            "leader_changes_after_heal": leader_changes,
+            "gap_partition": longest_gap(partitioned_at, healed_at),
+            "gap_after_heal": longest_gap(healed_at, end),
+            "term_changes_after_heal": max(n.current_term for n in nodes) - term_before_heal,
+            "max_term": max(n.current_term for n in nodes),
+        })
+
+    mode = f"Pre-Vote {'켜짐' if pre_vote else '꺼짐'}, CheckQuorum {'켜짐' if check_quorum else '꺼짐'}"
+    print(f"--- 분할 복구 테스트 ({mode}, seed {seeds}개, 단계 {phase_duration}초) ---")
+    for r in results:
+        print(
+            f"seed {r['seed']}: 선거 {r['elections_partition']}회 (분할까지) / "
+            f"{r['elections_after_heal']}회 (복구 후), 복구 후 리더 교체 {r['leader_changes_after_heal']}회, "
+            f"커밋 공백 {r['gap_partition']:.2f}초 (분할 중) / {r['gap_after_heal']:.2f}초 (복구 후), "
+            f"복구 후 임기 변화 {r['term_changes_after_heal']}, 최종 임기 {r['max_term']}"
+        )
+    disrupted = [
+        r["seed"] for r in results
+        if r["elections_after_heal"] or r["leader_changes_after_heal"] or r["term_changes_after_heal"]
+    ]
+    print(f"복구 시 리더십 변화가 있었던 seed: {disrupted or '없음'}")
+    if pre_vote and check_quorum:
+        assert not disrupted, f"Pre-Vote/CheckQuorum 을 켰는데 복구 시 리더십이 바뀐 seed: {disrupted}"
+    return results
+
+
+# --- asyncio 런타임: 장애 조치 지연과 유휴 CPU 측정 ---
+async def run_async_failover_test(trials=5, node_count=5, election_timeout_range=(0.3, 0.6),
+                                  heartbeat_interval=0.05, idle_duration=2.0, seed=None):
+    """
+    리더를 네트워크에서 떼어낸 뒤 새 리더가 뽑힐 때까지의 시간을 잰다.
+    타이머가 마감 시각에 바로 깨어나므로 지연은 선출 타임아웃 범위 안에 들어와야 한다.
+    """
+    runtime = AsyncRuntime(seed=seed)
+    nodes = create_cluster(
+        node_count, runtime, verbose=False,
+        election_timeout_range=election_timeout_range, heartbeat_interval=heartbeat_interval,
+    )
+    for node in nodes:
+        runtime.add_node(node)
+
+    async def wait_for_leader(exclude=None):
+        while True:
+            leader = next(
+                (n for n in nodes if n.state == State.LEADER and n is not exclude), None
+            )
+            if leader is not None:
+                return leader
+            await asyncio.sleep(0.001)
+
+    # 유휴 상태의 CPU 사용량 (하트비트만 오가는 상태)
+    await wait_for_leader()
+    cpu_started = time.process_time()
+    await asyncio.sleep(idle_duration)
+    idle_cpu = (time.process_time() - cpu_started) / idle_duration
+
+    latencies = []
+    for _ in range(trials):
+        old_leader = await wait_for_leader()
+        for node in nodes:
+            if node is not old_leader:
+                set_network_partition(old_leader.id, node.id, False)
+        started = runtime.now()
+        await wait_for_leader(exclude=old_leader)
+        latencies.append(runtime.now() - started)
+
+        for node in nodes:
+            if node is not old_leader:
+                set_network_partition(old_leader.id, node.id, True)
+        await asyncio.sleep(heartbeat_interval * 4)
+
+    await runtime.close()
+    print(
+        f"--- asyncio 장애 조치 테스트 ({node_count}개 노드, 선출 타임아웃 "
+        f"{election_timeout_range[0]}~{election_timeout_range[1]}초, 하트비트 {heartbeat_interval}초) ---\n"
+        f"장애 조치 지연: 평균 {sum(latencies) / len(latencies) * 1000:.0f}ms, "
+        f"최소 {min(latencies) * 1000:.0f}ms, 최대 {max(latencies) * 1000:.0f}ms\n"
+        f"유휴 클러스터 CPU 사용률: {idle_cpu * 100:.1f}%"
+    )
+    return latencies, idle_cpu
+
+
+async def run_async_partition_scenario(verbose=True, phase_duration=10, seed=None):
+    """기본 분할 시나리오를 asyncio 런타임에서 실제 시간으로 실행한다."""
+    runtime = AsyncRuntime(seed=seed)
+    nodes = create_cluster(5, runtime, verbose=verbose)
+    client = ClientDriver(nodes, clock=runtime.now)
+    client.attach(runtime, 1.0)
+    for node in nodes:
+        runtime.add_node(node)
+
+    print("--- Raft 시뮬레이션 시작 (asyncio, 5개 노드) ---")
+    await asyncio.sleep(phase_duration)
+    for a in (1, 2):
+        for b in (3, 4, 5):
+            set_network_partition(a, b, False)
+    print("!!! 네트워크 분할: {1, 2} vs {3, 4, 5} !!!")
+    await asyncio.sleep(phase_duration)
+    for a in (1, 2):
+        for b in (3, 4, 5):
+            set_network_partition(a, b, True)
+    print("!!! 네트워크 복구 !!!")
+    await asyncio.sleep(phase_duration)
+    await runtime.close()
+
+    print("\n--- 시뮬레이션 종료 ---")
+    for node in nodes:
+        print(
+            f"Node {node.id}: 최종 상태 {node.state.name}, "
+            f"임기 {node.current_term}, 리더 ID {node.leader_id}, "
+            f"커밋 인덱스 {node.commit_index}"
+        )
+    return nodes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raft 시뮬레이션")
+    parser.add_argument(
+        "--virtual", action="store_true", help="가상 시간(이산 사건) 스케줄러로 실행"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="가상 시간 실행의 난수 seed")
+    parser.add_argument(
+        "--phase", type=float, default=10, help="각 단계의 (가상) 실행 시간 (초)"
+    )
+    parser.add_argument("--quiet", action="store_true", help="노드별 로그 출력 끄기")
+    parser.add_argument(
+        "--data-dir", default=None, help="노드별 지속 상태(WAL)를 저장할 디렉터리"
+    )
+    parser.add_argument(
+        "--load", type=int, default=None, metavar="RATE",
+        help="가상 시간 부하 테스트: 초당 RATE 개 커맨드 제안",
+    )
+    parser.add_argument(
+        "--reads", type=int, default=None, metavar="N",
+        help="가상 시간 읽기 테스트: N 번의 선형적 읽기 (--lease 로 리스 모드)",
+    )
+    parser.add_argument("--lease", action="store_true", help="리더 리스 읽기 사용")
+    parser.add_argument(
+        "--asyncio", action="store_true", help="asyncio 런타임(노드별 타이머 태스크)으로 실행"
+    )
+    parser.add_argument(
+        "--failover", type=int, default=None, metavar="N",
+        help="asyncio 런타임에서 N 번의 장애 조치 지연 측정",
+    )
+    parser.add_argument(
+        "--recovery", type=int, default=None, metavar="SEEDS",
+        help="분할 복구 테스트: Pre-Vote/CheckQuorum 켜고 끈 결과 비교",
+    )
+    args = parser.parse_args()
+
+    if args.recovery is not None:
+        check_synchronous_election()
+        run_partition_recovery_test(args.recovery, pre_vote=False, check_quorum=False)
+        run_partition_recovery_test(args.recovery)
+        raise SystemExit
+    if args.failover is not None:
+        asyncio.run(run_async_failover_test(args.failover, seed=args.seed))
+        raise SystemExit
+    if args.asyncio:
+        asyncio.run(
+            run_async_partition_scenario(not args.quiet, args.phase, seed=args.seed)
+        )
+        raise SystemExit
+
+    if args.load is not None:
+        run_load_test(args.load, duration=args.phase, seed=args.seed)
+        raise SystemExit
+    if args.reads is not None:
+        run_read_test(args.reads, lease=args.lease, seed=args.seed)
+        raise SystemExit
+
+    scheduler = EventScheduler(seed=args.seed) if args.virtual else None
+    started = time.time()
+    run_partition_scenario(
+        scheduler, verbose=not args.quiet, phase_duration=args.phase, data_dir=args.data_dir
+    )
+    if scheduler is not None:
+        print(
+            f"가상 시간 {scheduler.now():.1f}초, 이벤트 {scheduler.events_processed}개를 "
+            f"실제 {time.time() - started:.2f}초에 처리"
         )
@@ -1,162 +1,748 @@
+import argparse
 import random
-from typing import List, Dict, Optional, Tuple
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 가 없으면 원장은 순수 파이썬으로 순서대로 반영한다
+    np = None
 
 # === 1. PAXOS 구성 요소 정의 ===
 
+NOOP = "NOOP"  # 새 리더가 빈 슬롯을 채울 때 쓰는 아무 일도 하지 않는 거래
+BALLOT_STRIDE = 1024  # 제안 번호 = 라운드 * BALLOT_STRIDE + proposer_id (proposer_id 는 이보다 작아야 함)
+
+def make_request(command: str, client_id: str, seq: int) -> str:
+    """클라이언트 요청: 거래 뒤에 '@클라이언트:순번' 을 붙인다. 재시도는 같은 순번으로 보내 한 번만 반영되게 한다"""
+    return f"{command} @{client_id}:{seq}"
+
+# 해독된 거래 레코드의 op 코드
+OP_NOOP, OP_OPEN, OP_DEPOSIT, OP_WITHDRAW = range(4)
+OP_CODES = {"OPEN": OP_OPEN, "DEPOSIT": OP_DEPOSIT, "WITHDRAW": OP_WITHDRAW}
+
+class Ledger:
+    """
+    합의가 끝난 거래만 반영하는 Learner 쪽 계좌 원장.
+    결정된 거래 문자열을 쌓아 두었다가 batch_size 개가 모이거나 잔액을 읽을 때
+    한 번에 (op 코드, 계좌 번호, 금액) 레코드 배열로 해독하고, 배열 기반 계좌 테이블에 한꺼번에 반영한다.
+    금액은 여러 거래를 묶어 더해도 오차가 없도록 센트 단위 정수로 보관한다.
+    make_request 로 만든 요청은 클라이언트별 마지막 순번을 기억해, 재시도로 로그에 두 번 들어가도 한 번만 반영한다.
+    log 가 주어지면 거래마다 실행 결과를 남기기 위해 바로바로 순서대로 반영한다.
+    """
+    def __init__(self, batch_size: int = 4096, log: Optional[Callable[[str], None]] = None,
+                 vectorized: bool = True):
+        self.batch_size = batch_size
+        self.log = log
+        self.vectorized = vectorized and np is not None
+        self.account_ids: Dict[str, int] = {}  # 계좌 이름 -> 계좌 번호 (테이블 인덱스)
+        self.account_names: List[str] = []
+        self.balances = array("q")             # 계좌 번호별 잔액 (센트)
+        self.opened = bytearray()              # 계좌 번호별 개설 여부
+        self.record_keys: Dict[str, int] = {"": OP_NOOP}  # '동작 계좌' 접두어 -> 계좌 번호 * 4 + op 코드
+        self.last_request: Dict[str, int] = {}  # 클라이언트별 마지막으로 반영한 요청 순번
+        self.pending: List[str] = []           # 아직 반영하지 않은 결정된 거래
+
+    def _record_key(self, prefix: str) -> int:
+        """'동작 계좌' 접두어를 (계좌 번호 * 4 + op 코드) 로 바꾸고 캐시한다. 처음 보는 계좌는 테이블에 추가"""
+        action, _, account = prefix.partition(" ")
+        op = OP_CODES.get(action, OP_NOOP)
+        account_id = self.account_ids.get(account)
+        if account_id is None:
+            account_id = self.account_ids[account] = len(self.account_names)
+            self.account_names.append(account)
+            self.balances.append(0)
+            self.opened.append(0)
+        key = self.record_keys[prefix] = account_id * 4 + op
+        return key
+
+    def decode(self, commands: List[str]) -> Tuple[array, array, array]:
+        """거래 문자열들을 op 코드, 계좌 번호, 센트 금액 배열로 해독한다 (NOOP 은 op 코드 0)"""
+        parts = [command.rpartition(" ") for command in commands]
+        for i in [i for i, p in enumerate(parts) if p[2][:1] == "@"]:
+            # 클라이언트 요청: 이미 반영한 순번이면 NOOP 으로 바꾼다
+            client_id, _, seq = parts[i][2][1:].partition(":")
+            if int(seq) <= self.last_request.get(client_id, -1):
+                parts[i] = ("", "", "")
+            else:
+                self.last_request[client_id] = int(seq)
+                parts[i] = parts[i][0].rpartition(" ")
+        keys, miss = self.record_keys, self._record_key
+        records = [keys[p[0]] if p[0] in keys else miss(p[0]) for p in parts]
+        dollars = [float(p[2]) if p[0] else 0.0 for p in parts]
+        if self.vectorized:
+            records = np.array(records, dtype=np.int64)
+            ops = array("b", (records & 3).astype(np.int8).tobytes())
+            ids = array("i", (records >> 2).astype(np.intc).tobytes())
+            amounts = array("q", np.rint(np.array(dollars) * 100).astype(np.int64).tobytes())
+        else:
+            ops = array("b", [r & 3 for r in records])
+            ids = array("i", [r >> 2 for r in records])
+            amounts = array("q", [round(d * 100) for d in dollars])
+        return ops, ids, amounts
+
+    def append(self, command: str):
+        """결정된 거래 하나를 쌓고, 배치가 차면 반영한다"""
+        self.pending.append(command)
+        if self.log is not None or len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """쌓인 거래를 해독해 계좌 테이블에 반영한다"""
+        if not self.pending:
+            return
+        ops, ids, amounts = self.decode(self.pending)
+        self.pending = []
+        if self.vectorized and self.log is None:
+            self._apply_vectorized(ops, ids, amounts)
+        else:
+            self._apply_sequential(ops, ids, amounts)
+
+    def snapshot(self) -> Dict[str, float]:
+        """개설된 계좌의 잔액 (달러)"""
+        self.flush()
+        return {name: self.balances[i] / 100 for i, name in enumerate(self.account_names) if self.opened[i]}
+
+    def _apply_sequential(self, ops, ids, amounts):
+        balances, opened, log = self.balances, self.opened, self.log
+        for op, i, amount in zip(ops, ids, amounts):
+            if op == OP_OPEN:
+                if not opened[i]:
+                    opened[i] = 1
+                    balances[i] = amount
+                    if log:
+                        log(f"거래 실행: {self.account_names[i]} 계좌 개설 및 {amount / 100} 입금.")
+            elif op == OP_DEPOSIT:
+                if opened[i]:
+                    balances[i] += amount
+                    if log:
+                        log(f"거래 실행: {self.account_names[i]}에 {amount / 100} 입금.")
+            elif op == OP_WITHDRAW:
+                if opened[i] and balances[i] >= amount:
+                    balances[i] -= amount
+                    if log:
+                        log(f"거래 실행: {self.account_names[i]}에서 {amount / 100} 출금.")
+                elif opened[i]:
+                    # 잔액 부족은 합의 알고리즘의 Safety 문제가 아니므로, 여기서는 단순히 로그만 남김
+                    if log:
+                        log(f"거래 실패: {self.account_names[i]} 잔액 부족.")
+                elif log:
+                    log(f"거래 실패: {self.account_names[i]} 계좌 없음.")
+
+    def _apply_vectorized(self, ops, ids, amounts):
+        """
+        계좌가 다르면 거래 순서가 결과에 영향을 주지 않으므로 계좌별로 묶어 누적합으로 반영한다.
+        모든 출금이 성공한다고 가정한 누적 잔액이 한 번도 음수가 되지 않는 계좌는 그대로 맞고,
+        음수가 되는 계좌(잔액 부족 출금이 있는 계좌)만 그 계좌의 거래를 순서대로 다시 반영한다.
+        """
+        if not self.balances:  # 계좌가 하나도 없으면 배치는 NOOP 뿐이다
+            return
+        op = np.frombuffer(ops, dtype=np.int8)
+        acct = np.frombuffer(ids, dtype=np.intc)
+        amount = np.frombuffer(amounts, dtype=np.int64)
+        balance = np.frombuffer(self.balances, dtype=np.int64)
+        opened = np.frombuffer(self.opened, dtype=np.uint8)
+        count = len(op)
+        was_open = opened[acct].astype(bool)
+
+        # 배치 시작 때 닫혀 있던 계좌는 첫 OPEN 만 유효하고, 그 전의 입출금은 계좌 없음으로 실패한다
+        first_open = np.full(len(balance), count, dtype=np.int64)
+        opens = np.flatnonzero((op == OP_OPEN) & ~was_open)
+        np.minimum.at(first_open, acct[opens], opens)
+        new = np.flatnonzero(first_open < count)
+        balance[new] = amount[first_open[new]]
+        opened[new] = 1
+
+        moves = ((op == OP_DEPOSIT) | (op == OP_WITHDRAW)) & (was_open | (np.arange(count) > first_open[acct]))
+        rows = np.flatnonzero(moves)
+        if not len(rows):
+            return
+        rows = rows[np.argsort(acct[rows], kind="stable")]  # 계좌별로 묶되 계좌 안의 순서는 유지
+        a = acct[rows]
+        withdraw = op[rows] == OP_WITHDRAW
+        delta = np.where(withdraw, -amount[rows], amount[rows])
+
+        starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        ends = np.r_[starts[1:], len(a)] - 1
+        sizes = ends - starts + 1
+        running = np.cumsum(delta)
+        before = np.r_[0, running[ends[:-1]]]  # 이전 계좌들까지의 누적합
+        running += np.repeat(balance[a[starts]] - before, sizes)
+
+        group = np.repeat(np.arange(len(starts)), sizes)
+        failed = np.zeros(len(starts), dtype=bool)
+        failed[group[withdraw & (running < 0)]] = True
+        ok = ~failed
+        balance[a[starts[ok]]] = running[ends[ok]]
+        for g in np.flatnonzero(failed).tolist():
+            start, end = starts[g], ends[g] + 1
+            i = a[start]
+            current = int(balance[i])
+            for d in delta[start:end].tolist():
+                # 출금(d < 0)은 잔액이 충분할 때만 반영
+                if d >= 0 or current + d >= 0:
+                    current += d
+            balance[i] = current
+
 class Proposal:
     """PAXOS에서 합의를 위한 제안(Transaction)을 나타내는 클래스"""
     def __init__(self, proposal_id: int, value: str):
         self.proposal_id = proposal_id  # 제안 번호 (더 높은 번호가 우선)
         self.value = value              # 제안 값 (트랜잭션 명령)
-    
+
     def __repr__(self):
         return f"Proposal(id={self.proposal_id}, value='{self.value}')"
 
 class Acceptor:
-    """PAXOS의 Acceptor 역할을 시뮬레이션하는 클래스 (분산 스토리지 노드)"""
-    def __init__(self, node_id: int):
+    """
+    PAXOS의 Acceptor 역할을 시뮬레이션하는 클래스 (분산 스토리지 노드)
+    슬롯(거래 로그의 위치)마다 수락한 제안을 따로 보관한다 (Multi-Paxos).
+    약속(promised_id)은 prepare 에서 지정한 슬롯 이후의 모든 슬롯에 공통으로 적용된다.
+    """
+    def __init__(self, node_id: int, verbose: bool = True, latency: float = 0.0):
         self.node_id = node_id
+        self.verbose = verbose
+        self.latency = latency  # 요청마다 주입하는 응답 지연 (초): 느린 노드/네트워크 시뮬레이션
+        self._lock = threading.Lock()  # 여러 Proposer 스레드의 요청이 동시에 도착할 수 있다
         self.promised_id = -1          # 약속한 가장 높은 제안 번호 (Prepare Phase)
-        self.accepted_proposal: Optional[Proposal] = None  # 수락한 제안
-        self.current_balance: Dict[str, float] = {}       # 현재 계좌 잔액 상태
+        self.accepted: Dict[int, Proposal] = {}  # 슬롯별 수락한 제안
+        self.chosen: Dict[int, str] = {}         # 합의가 끝난 슬롯의 값 (복제된 거래 로그)
+        self.applied_slot = -1                   # 원장에 넘긴 마지막 슬롯
+        # 결정된 거래만 반영하는 계좌 원장
+        self.ledger = Ledger(log=(lambda message: print(f"    -> [A{node_id}] {message}")) if verbose else None)
 
     def __repr__(self):
         return f"Acceptor(ID={self.node_id}, Balance={self.current_balance})"
 
-    def prepare(self, proposer_id: int, proposal_id: int) -> Tuple[bool, Optional[Proposal]]:
-        """Phase 1a: Prepare 요청 처리"""
+    @property
+    def current_balance(self) -> Dict[str, float]:
+        """현재 계좌 잔액 상태 (아직 반영하지 않은 거래를 먼저 반영한다)"""
+        with self._lock:
+            return self.ledger.snapshot()
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def prepare(self, proposer_id: int, proposal_id: int,
+                from_slot: int = 0) -> Tuple[bool, Dict[int, Proposal], int]:
+        """
+        Phase 1a: from_slot 이후 모든 슬롯에 대한 Prepare 요청 처리.
+        응답에는 약속한 가장 높은 제안 번호를 함께 실어, 거부된 Proposer 가 그 번호를 건너뛰고
+        현재 리더(번호 % BALLOT_STRIDE)를 알 수 있게 한다.
+        """
+        self._delay()
+        with self._lock:
+            return self._prepare(proposer_id, proposal_id, from_slot)
+
+    def _prepare(self, proposer_id: int, proposal_id: int, from_slot: int) -> Tuple[bool, Dict[int, Proposal], int]:
         if proposal_id > self.promised_id:
-            # 더 높은 번호의 제안에 대해 약속하고 응답
+            # 더 높은 번호의 제안에 대해 약속하고, 그 슬롯들에서 이미 수락한 제안을 함께 응답
             self.promised_id = proposal_id
-            print(f"  [A{self.node_id}] P{proposer_id}의 Prepare({proposal_id}) 수락. 약속: {proposal_id}")
-            return True, self.accepted_proposal
+            self._log(f"  [A{self.node_id}] P{proposer_id}의 Prepare({proposal_id}, 슬롯 {from_slot}~) 수락. 약속: {proposal_id}")
+            return True, {s: p for s, p in self.accepted.items() if s >= from_slot}, self.promised_id
         else:
             # 이미 더 높은 번호에 약속했으므로 거부
-            print(f"  [A{self.node_id}] P{proposer_id}의 Prepare({proposal_id}) 거부. 이미 약속된 ID: {self.promised_id}")
-            return False, None
+            self._log(f"  [A{self.node_id}] P{proposer_id}의 Prepare({proposal_id}) 거부. 이미 약속된 ID: {self.promised_id}")
+            return False, {}, self.promised_id
+
+    def accept(self, proposer_id: int, slot: int, proposal: Proposal) -> Tuple[bool, int]:
+        """Phase 2a: 슬롯 하나에 대한 Accept 요청 처리 (수락만 하고, 실행은 합의가 끝난 뒤 learn 에서)"""
+        self._delay()
+        with self._lock:
+            return self._accept(proposer_id, slot, proposal)
 
-    def accept(self, proposer_id: int, proposal: Proposal) -> bool:
-        """Phase 2a: Accept 요청 처리"""
+    def _accept(self, proposer_id: int, slot: int, proposal: Proposal) -> Tuple[bool, int]:
         if proposal.proposal_id >= self.promised_id:
             # 약속한 번호보다 크거나 같으면 수락
             self.promised_id = proposal.proposal_id
-            self.accepted_proposal = proposal
-            self._execute_transaction(proposal.value)
-            print(f"  [A{self.node_id}] P{proposer_id}의 Accept({proposal.proposal_id}, '{proposal.value}') 수락.")
-            return True
+            self.accepted[slot] = proposal
+            self._log(f"  [A{self.node_id}] P{proposer_id}의 Accept({proposal.proposal_id}, 슬롯 {slot}, '{proposal.value}') 수락.")
+            return True, self.promised_id
         else:
             # 약속된 번호보다 낮으므로 거부
-            print(f"  [A{self{self.node_id}] P{proposer_id}의 Accept({proposal.proposal_id}, '{proposal.value}') 거부. 약속된 ID: {self.promised_id}")
-            return False
+            self._log(f"  [A{self.node_id}] P{proposer_id}의 Accept({proposal.proposal_id}, 슬롯 {slot}, '{proposal.value}') 거부. 약속된 ID: {self.promised_id}")
+            return False, self.promised_id
 
-    def _execute_transaction(self, command: str):
-        """실제 은행 거래 로직 (분산 스토리지 상태 변경)"""
-        parts = command.split()
-        action = parts[0]
-        account = parts[1]
-        
-        if action == "OPEN":
-            if account not in self.current_balance:
-                self.current_balance[account] = float(parts[2])
-                print(f"    -> [A{self.node_id}] 거래 실행: {account} 계좌 개설 및 {parts[2]} 입금.")
-        elif action == "DEPOSIT":
-            amount = float(parts[2])
-            if account in self.current_balance:
-                self.current_balance[account] += amount
-                print(f"    -> [A{self.node_id}] 거래 실행: {account}에 {amount} 입금.")
-        elif action == "WITHDRAW":
-            amount = float(parts[2])
-            if account in self.current_balance and self.current_balance[account] >= amount:
-                self.current_balance[account] -= amount
-                print(f"    -> [A{self.node_id}] 거래 실행: {account}에서 {amount} 출금.")
-            elif account in self.current_balance and self.current_balance[account] < amount:
-                print(f"    -> [A{self.node_id}] 거래 실패: {account} 잔액 부족.")
-                # 잔액 부족은 합의 알고리즘의 Safety 문제가 아니므로, 여기서는 단순히 로그만 남김
-            else:
-                print(f"    -> [A{self.node_id}] 거래 실패: {account} 계좌 없음.")
+    def learn(self, slot: int, value: str):
+        """합의된 값을 로그에 기록하고, 빈 슬롯 없이 이어진 만큼 순서대로 원장에 넘긴다"""
+        self._delay()
+        with self._lock:
+            self.chosen[slot] = value
+            while self.applied_slot + 1 in self.chosen:
+                self.applied_slot += 1
+                self.ledger.append(self.chosen[self.applied_slot])
 
 class Proposer:
-    """PAXOS의 Proposer 역할을 시뮬레이션하는 클래스"""
-    def __init__(self, proposer_id: int, acceptors: List[Acceptor]):
+    """
+    PAXOS의 Proposer 역할을 시뮬레이션하는 클래스 (거래마다 Phase 1 과 Phase 2 를 모두 실행)
+    parallel=True 이면 각 단계의 요청을 스레드 풀로 모든 Acceptor 에게 동시에 보내고,
+    정족수의 응답이 모이는 즉시 다음 단계로 넘어간다 (느린 Acceptor 를 기다리지 않음).
+    timeout 안에 응답하지 않는 Acceptor 는 응답이 없는 것으로 본다.
+
+    여러 Proposer 가 경쟁할 때 (dueling proposers):
+    - 거부 응답에 실린 제안 번호를 보고 다음 제안 번호를 그보다 높게 건너뛴다.
+    - 더 높은 번호에 밀려 실패하면 임의의 지수 백오프 후에 돌아온다 (backoff=True).
+    - peers (proposer_id -> Proposer) 가 주어지면, submit 은 알려진 리더에게 거래를 전달한다.
+    """
+    def __init__(self, proposer_id: int, acceptors: List[Acceptor], verbose: bool = True,
+                 parallel: bool = True, timeout: float = 1.0, backoff: bool = True,
+                 peers: Optional[Dict[int, "Proposer"]] = None,
+                 backoff_base: float = 0.001, backoff_max: float = 0.05):
+        assert 0 <= proposer_id < BALLOT_STRIDE
         self.proposer_id = proposer_id
         self.acceptors = acceptors
-        self.next_proposal_id = self.proposer_id  # 각 제안자의 고유 ID로 시작
+        self.verbose = verbose
+        self.timeout = timeout
+        # 늦은 응답(정족수 뒤에 도착)과 learn 이 스레드를 잡고 있을 수 있으므로 넉넉하게 둔다
+        self.executor = ThreadPoolExecutor(max_workers=8 * len(acceptors)) if parallel else None
+        self.next_round = 0      # 다음 제안 번호의 라운드 (제안 번호는 proposer_id 로 시작)
+        self.highest_seen = -1   # Acceptor 응답에서 본 가장 높은 약속 번호
+        self.preempted = False   # 마지막 실패가 더 높은 번호에 밀려서인지
+        self.leader_hint: Optional[int] = None  # 가장 높은 약속 번호를 가진 Proposer (현재 리더로 추정)
+        self.next_slot = 0       # 다음 거래를 넣을 로그 슬롯
+        self.round_trips = 0     # Acceptor 들과 주고받은 왕복 횟수 (한 단계 = 1)
+        self.messages = 0        # 보낸 요청 + 받은 응답 수
+        self.backoff = backoff
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failures = 0        # 연속으로 밀린 횟수 (백오프 지수)
+        self.forwarded = 0       # 리더에게 전달한 거래 수
+        self.peers = peers
+        if peers is not None:
+            peers[proposer_id] = self
+        self._lock = threading.Lock()  # 다른 Proposer 가 전달한 거래와 자신의 거래를 한 번에 하나씩 처리
 
-    def propose(self, transaction_command: str) -> bool:
-        """PAXOS 합의 과정 실행 (2 Phase Commit)"""
-        print(f"\n=== P{self.proposer_id}: '{transaction_command}' 거래 시작 ===")
-        
-        # 1. 제안 번호 생성 및 Prepare Phase
-        current_id = self.next_proposal_id
-        self.next_proposal_id += len(self.acceptors) # 다음 ID를 더 높게 설정
-        
-        print(f"  [P{self.proposer_id}] Phase 1: Prepare({current_id}) 요청.")
-
-        promises = 0
-        accepted_value: Optional[str] = transaction_command
-        highest_accepted_id = -1
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
 
-        # Acceptor들에게 Prepare 요청
-        for acceptor in self.acceptors:
-            if random.random() > 0.1: # 10% 확률로 노드 실패/응답 없음 가정
-                is_promised, previously_accepted = acceptor.prepare(self.proposer_id, current_id)
-                if is_promised:
-                    promises += 1
-                    if previously_accepted and previously_accepted.proposal_id > highest_accepted_id:
-                        # 더 높은 번호로 이미 합의된 값이 있으면 그 값을 사용해야 함 (PAXOS Safety 보장)
-                        highest_accepted_id = previously_accepted.proposal_id
-                        accepted_value = previously_accepted.value
-                
-        quorum = len(self.acceptors) // 2 + 1
-        
-        if promises < quorum:
-            print(f"  [P{self.proposer_id}] Prepare 실패. 응답 수: {promises}, 정족수: {quorum}. 재시도 필요.")
+    @property
+    def quorum(self) -> int:
+        return len(self.acceptors) // 2 + 1
+
+    def close(self):
+        """진행 중인 요청(늦은 응답, learn)이 끝날 때까지 기다리고 스레드 풀을 닫는다"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def _fan_out(self, call: Callable[[Acceptor], Any], handle: Callable[[Any], bool]) -> int:
+        """
+        call(acceptor) 요청을 Acceptor 들에게 보내고 handle(응답) 이 True 인 응답 수를 돌려준다.
+        병렬 모드에서는 정족수가 찬성하거나, 남은 응답이 모두 찬성해도 정족수에 못 미치면 바로 돌아온다.
+        """
+        self.messages += len(self.acceptors)
+        targets = [a for a in self.acceptors if random.random() > 0.1] # 10% 확률로 노드 실패/응답 없음 가정
+
+        if self.executor is None:
+            votes = 0
+            for acceptor in targets:
+                self.messages += 1
+                if handle(call(acceptor)):
+                    votes += 1
+            return votes
+
+        futures = [self.executor.submit(call, acceptor) for acceptor in targets]
+        votes = 0
+        pending = len(futures)
+        try:
+            # 응답은 도착한 순서대로 처리한다 (handle 은 이 스레드에서만 호출됨)
+            for future in as_completed(futures, timeout=self.timeout):
+                pending -= 1
+                self.messages += 1
+                if handle(future.result()):
+                    votes += 1
+                if votes >= self.quorum or votes + pending < self.quorum:
+                    break
+        except TimeoutError:
+            self._log(f"  [P{self.proposer_id}] {pending}개 Acceptor 응답 시간 초과.")
+        return votes
+
+    def _new_proposal_id(self) -> int:
+        # 지금까지 본 가장 높은 약속 번호보다 높은 자신의 번호로 건너뛴다
+        current_round = max(self.next_round, self.highest_seen // BALLOT_STRIDE + 1)
+        self.next_round = current_round + 1
+        return current_round * BALLOT_STRIDE + self.proposer_id
+
+    def _observe(self, promised_id: int, proposal_id: int):
+        """Acceptor 응답에 실린 약속 번호를 기록한다. 자신의 번호보다 높으면 밀린 것이다"""
+        if promised_id > self.highest_seen:
+            self.highest_seen = promised_id
+            self.leader_hint = promised_id % BALLOT_STRIDE
+        if promised_id > proposal_id:
+            self.preempted = True
+
+    def _backoff(self):
+        """밀려서 실패했으면 임의의 지수 백오프만큼 쉰다 (경쟁하는 Proposer 들이 번갈아 서로를 밀어내지 않도록)"""
+        if not (self.backoff and self.preempted):
+            return
+        self.failures += 1
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** self.failures))
+        self._log(f"  [P{self.proposer_id}] 더 높은 번호에 밀림. {delay * 1000:.1f}ms 후 재시도.")
+        time.sleep(delay)
+
+    def submit(self, transaction_command: str, forwarded: bool = False) -> bool:
+        """
+        클라이언트 요청 진입점. 다른 Proposer 가 리더로 알려져 있으면 그 리더에게 전달하고,
+        아니면 직접 제안한다. 전달받은 거래는 다시 전달하지 않는다 (리더가 바뀌었으면 실패로 돌려보내
+        전달한 쪽이 새 리더 힌트를 따라가게 한다).
+        """
+        leader = self.peers.get(self.leader_hint) if self.peers and self.leader_hint != self.proposer_id else None
+        if leader is not None:
+            if forwarded:
+                return False
+            self.forwarded += 1
+            self._log(f"  [P{self.proposer_id}] 리더 P{leader.proposer_id}에게 '{transaction_command}' 전달.")
+            if leader.submit(transaction_command, forwarded=True):
+                # 리더의 응답에는 다음 슬롯이 실려 온다 (나중에 리더가 되면 그 앞은 이미 결정된 슬롯)
+                self.next_slot = max(self.next_slot, leader.next_slot)
+                return True
+            self.leader_hint = leader.leader_hint
+            return False
+
+        with self._lock:
+            self.preempted = False
+            if self.propose(transaction_command):
+                self.failures = 0
+                return True
+            self._backoff()
             return False
 
-        # Phase 2: Accept Phase
-        # 만약 이전에 더 높은 ID로 수락된 값이 있다면, 그 값을 제안값으로 사용 (Safety)
-        proposal_value_to_use = accepted_value if accepted_value else transaction_command
-        current_proposal = Proposal(current_id, proposal_value_to_use)
-        
-        print(f"  [P{self.proposer_id}] Phase 2: Accept({current_id}, '{current_proposal.value}') 요청.")
+    def _prepare(self, proposal_id: int, from_slot: int) -> Optional[Dict[int, Proposal]]:
+        """
+        Phase 1: from_slot 이후 모든 슬롯에 대해 Prepare 를 보낸다.
+        정족수가 약속하면 슬롯별로 가장 높은 번호로 수락된 제안을, 못 받으면 None 을 돌려준다.
+        """
+        self.round_trips += 1
+        highest: Dict[int, Proposal] = {}
+
+        def handle(response: Tuple[bool, Dict[int, Proposal], int]) -> bool:
+            is_promised, previously_accepted, promised_id = response
+            self._observe(promised_id, proposal_id)
+            if is_promised:
+                for slot, proposal in previously_accepted.items():
+                    if slot not in highest or proposal.proposal_id > highest[slot].proposal_id:
+                        # 더 높은 번호로 이미 합의된 값이 있으면 그 값을 사용해야 함 (PAXOS Safety 보장)
+                        highest[slot] = proposal
+            return is_promised
+
+        # Acceptor들에게 Prepare 요청
+        promises = self._fan_out(lambda a: a.prepare(self.proposer_id, proposal_id, from_slot), handle)
+
+        if promises < self.quorum:
+            self._log(f"  [P{self.proposer_id}] Prepare 실패. 응답 수: {promises}, 정족수: {self.quorum}. 재시도 필요.")
+            return None
+        return highest
+
+    def _accept(self, slot: int, proposal: Proposal) -> bool:
+        """Phase 2: 슬롯 하나에 대한 Accept. 정족수가 수락하면 True"""
+        self.round_trips += 1
+
+        def handle(response: Tuple[bool, int]) -> bool:
+            is_accepted, promised_id = response
+            self._observe(promised_id, proposal.proposal_id)
+            return is_accepted
 
-        accepts = 0
-        
         # Acceptor들에게 Accept 요청
+        accepts = self._fan_out(lambda a: a.accept(self.proposer_id, slot, proposal), handle)
+
+        if accepts < self.quorum:
+            self._log(f"  [P{self.proposer_id}] Accept 실패. 응답 수: {accepts}, 정족수: {self.quorum}. 재시도 필요.")
+            return False
+        return True
+
+    def _learn(self, slot: int, value: str):
+        # 3. Learner Phase: 결정된 값을 모든 Acceptor 에게 알린다 (응답을 기다리지 않는 단방향 메시지)
+        self.messages += len(self.acceptors)
         for acceptor in self.acceptors:
-            if random.random() > 0.1: # 10% 확률로 노드 실패/응답 없음 가정
-                if acceptor.accept(self.proposer_id, current_proposal):
-                    accepts += 1
-        
-        if accepts < quorum:
-            print(f"  [P{self.proposer_id}] Accept 실패. 응답 수: {accepts}, 정족수: {quorum}. 재시도 필요.")
+            if self.executor is None:
+                acceptor.learn(slot, value)
+            else:
+                self.executor.submit(acceptor.learn, slot, value)
+
+    def propose(self, transaction_command: str) -> bool:
+        """PAXOS 합의 과정 실행 (2 Phase Commit)"""
+        self._log(f"\n=== P{self.proposer_id}: '{transaction_command}' 거래 시작 ===")
+
+        while True:
+            # 1. 제안 번호 생성 및 Prepare Phase
+            slot = self.next_slot
+            current_id = self._new_proposal_id()
+            self._log(f"  [P{self.proposer_id}] Phase 1: Prepare({current_id}) 요청. 슬롯 {slot}")
+            accepted = self._prepare(current_id, slot)
+            if accepted is None:
+                return False
+
+            # Phase 2: Accept Phase
+            # 만약 이전에 더 높은 ID로 수락된 값이 있다면, 그 값을 제안값으로 사용 (Safety)
+            previous = accepted.get(slot)
+            proposal_value_to_use = previous.value if previous else transaction_command
+            current_proposal = Proposal(current_id, proposal_value_to_use)
+            self._log(f"  [P{self.proposer_id}] Phase 2: Accept({current_id}, '{current_proposal.value}') 요청.")
+            if not self._accept(slot, current_proposal):
+                return False
+
+            self._log(f"  [P{self.proposer_id}] 합의 성공! 슬롯 {slot} 결정된 값: '{current_proposal.value}'")
+            self._learn(slot, current_proposal.value)
+            self.next_slot = slot + 1
+            if current_proposal.value == transaction_command:
+                return True
+            # 이 슬롯은 이전 값으로 채워졌으므로 다음 슬롯에서 다시 시도
+            self._log(f"  [P{self.proposer_id}] 슬롯 {slot}은 이전 제안으로 결정됨. 다음 슬롯에서 재시도.")
+
+class MultiPaxosLeader(Proposer):
+    """
+    안정된 리더 (Multi-Paxos). Phase 1 을 한 번 실행해 아직 결정되지 않은 모든 슬롯에 대한 약속을 받고,
+    이후 거래는 이어지는 슬롯에 Phase 2 (Accept) 만 보낸다 → 거래당 왕복이 2번에서 1번으로 준다.
+    Accept 가 실패하면 (더 높은 번호의 리더가 있거나 정족수 미달) 리더 자격을 내려놓고
+    다음 거래에서 Phase 1 부터 다시 시작한다.
+    """
+    def __init__(self, proposer_id: int, acceptors: List[Acceptor], verbose: bool = True, **kwargs):
+        super().__init__(proposer_id, acceptors, verbose, **kwargs)
+        self.leader_ballot: Optional[int] = None  # Phase 1 에서 약속받은 제안 번호
+        self.in_flight: Optional[Tuple[int, str]] = None  # Accept 가 실패한 (슬롯, 거래): 이미 결정됐을 수 있다
+        self.recovered: Dict[int, str] = {}  # 마지막 Phase 1 에서 마무리한 슬롯의 값
+
+    def become_leader(self) -> bool:
+        """Phase 1 을 next_slot 이후 모든 슬롯에 대해 한 번 실행하고, 이전 리더가 남긴 값을 마무리한다"""
+        ballot = self._new_proposal_id()
+        self._log(f"  [P{self.proposer_id}] Phase 1: Prepare({ballot}) 요청. 슬롯 {self.next_slot}~ 전체")
+        accepted = self._prepare(ballot, self.next_slot)
+        if accepted is None:
+            return False
+        self.leader_ballot = ballot
+
+        # 이전 리더가 수락시켰을 수 있는 값은 같은 슬롯에 다시 제안하고, 사이의 빈 슬롯은 NOOP 으로 채운다
+        last = max(accepted, default=self.next_slot - 1)
+        self.recovered = {}
+        for slot in range(self.next_slot, last + 1):
+            value = accepted[slot].value if slot in accepted else NOOP
+            if not self._accept(slot, Proposal(ballot, value)):
+                self.leader_ballot = None
+                return False
+            self._learn(slot, value)
+            self.recovered[slot] = value
+            self.next_slot = slot + 1
+        self._log(f"  [P{self.proposer_id}] 리더 선출 완료 (제안 번호 {ballot}). 다음 슬롯: {self.next_slot}")
+        return True
+
+    def propose(self, transaction_command: str) -> bool:
+        """리더이면 다음 슬롯에 Accept 만 보내고, 아니면 먼저 Phase 1 을 실행한다"""
+        self._log(f"\n=== P{self.proposer_id} (리더): '{transaction_command}' 거래 시작 ===")
+        if self.leader_ballot is None:
+            if not self.become_leader():
+                return False
+            if self.in_flight is not None:
+                # 실패했던 Accept 가 일부 Acceptor 에 남아 있었다면 Phase 1 에서 이미 결정됐다 (다시 넣지 않음)
+                slot, value = self.in_flight
+                self.in_flight = None
+                if value == transaction_command and self.recovered.get(slot) == value:
+                    self._log(f"  [P{self.proposer_id}] 슬롯 {slot}에 이미 결정된 거래. 다시 제안하지 않음.")
+                    return True
+
+        slot = self.next_slot
+        self._log(f"  [P{self.proposer_id}] Phase 2: Accept({self.leader_ballot}, 슬롯 {slot}, '{transaction_command}') 요청.")
+        if not self._accept(slot, Proposal(self.leader_ballot, transaction_command)):
+            # 같은 번호로 같은 슬롯에 다른 값을 보내면 안 되므로, 다시 Phase 1 으로 슬롯의 값을 확인한다
+            self.leader_ballot = None
+            self.in_flight = (slot, transaction_command)
             return False
-        
-        # 3. Learner Phase (여기서는 Proposer가 Learner 역할도 겸함)
-        print(f"  [P{self.proposer_id}] 합의 성공! 결정된 값: '{current_proposal.value}'")
+
+        self._log(f"  [P{self.proposer_id}] 합의 성공! 슬롯 {slot} 결정된 값: '{transaction_command}'")
+        self._learn(slot, transaction_command)
+        self.next_slot = slot + 1
         return True
 
-# === 2. 시뮬레이션 실행 ===
+# === 2. 벤치마크: 거래당 왕복 횟수 ===
+
+def run_round_trip_benchmark(transaction_count: int = 10000, acceptor_count: int = 3, seed: int = 0):
+    """같은 거래 목록을 기본 Paxos 와 Multi-Paxos 리더로 처리하며 거래당 왕복/메시지 수를 비교한다"""
+    print(f"--- PAXOS 왕복 횟수 벤치마크 ({acceptor_count}개 노드, 거래 {transaction_count}개) ---")
+    transactions = ["OPEN Louis 100.0"] + [
+        f"DEPOSIT Louis {i % 50}.0" if i % 2 else f"WITHDRAW Louis {i % 30}.0"
+        for i in range(1, transaction_count)
+    ]
+    for proposer_class in (Proposer, MultiPaxosLeader):
+        random.seed(seed)
+        acceptors = [Acceptor(i, verbose=False) for i in range(1, acceptor_count + 1)]
+        proposer = proposer_class(proposer_id=10, acceptors=acceptors, verbose=False, parallel=False)
+        committed = 0
+        for tx in transactions:
+            # 실패한 거래는 성공할 때까지 다시 제안한다
+            while not proposer.propose(tx):
+                pass
+            committed += 1
+        logs_agree = len({tuple(sorted(a.chosen.items())) for a in acceptors}) == 1
+        print(
+            f"{proposer_class.__name__:>16}: 거래당 왕복 {proposer.round_trips / committed:.2f}회, "
+            f"거래당 메시지 {proposer.messages / committed:.1f}개, 로그 길이 {len(acceptors[0].chosen)}, "
+            f"로그 일치: {logs_agree}, 잔액 {acceptors[0].current_balance}"
+        )
+
+def run_latency_benchmark(transaction_count: int = 200, latencies: Tuple[float, ...] = (0.001, 0.002, 0.004, 0.02, 0.05),
+                          seed: int = 0):
+    """Acceptor 마다 다른 지연을 주입하고 순차 전송과 병렬 전송의 거래당 지연 시간을 비교한다"""
+    ordered = sorted(latencies)
+    median = ordered[(len(ordered) - 1) // 2]
+    print(f"--- PAXOS 지연 시간 벤치마크 (Acceptor 지연 {[f'{l * 1000:g}ms' for l in latencies]}, "
+          f"중앙값 {median * 1000:g}ms, 거래 {transaction_count}개) ---")
+    transactions = ["OPEN Louis 100.0"] + [f"DEPOSIT Louis {i % 50}.0" for i in range(1, transaction_count)]
+    for proposer_class in (Proposer, MultiPaxosLeader):
+        for parallel in (False, True):
+            random.seed(seed)
+            acceptors = [Acceptor(i, verbose=False, latency=l) for i, l in enumerate(latencies, 1)]
+            proposer = proposer_class(proposer_id=10, acceptors=acceptors, verbose=False,
+                                      parallel=parallel, timeout=4 * max(latencies))
+            samples = []
+            for tx in transactions:
+                start = time.perf_counter()
+                while not proposer.propose(tx):
+                    pass
+                samples.append(time.perf_counter() - start)
+            proposer.close()
+            samples.sort()
+            p50 = samples[len(samples) // 2]
+            logs_agree = len({tuple(sorted(a.chosen.items())) for a in acceptors}) == 1
+            print(
+                f"{proposer_class.__name__:>16} {'병렬' if parallel else '순차'}: "
+                f"p50 {p50 * 1000:.1f}ms, p99 {samples[int(len(samples) * 0.99) - 1] * 1000:.1f}ms, "
+                f"왕복당 {p50 / (proposer.round_trips / len(transactions)) * 1000:.1f}ms, 로그 일치: {logs_agree}"
+            )
+
+def run_contention_benchmark(proposer_counts: Tuple[int, ...] = (1, 2, 4, 8), duration: float = 1.0,
+                             acceptor_count: int = 3, latency: float = 0.0005, seed: int = 0):
+    """
+    N 개의 Proposer 가 스레드마다 같은 Acceptor 들에게 동시에 거래를 제안할 때 초당 합의된 거래 수를 비교한다.
+    - 단순 경쟁: 백오프/리더 전달 없이 실패하면 바로 다시 제안 (서로를 계속 밀어냄)
+    - 백오프+리더 전달: 밀리면 임의의 지수 백오프, 알려진 리더에게 거래를 전달
+    각 클라이언트는 자기 계좌에만 1달러씩 입금하므로, 잔액 합계 = 성공 수 이면 재시도가 한 번씩만 반영된 것이다.
+    """
+    print(f"--- 경쟁 Proposer 벤치마크 (Acceptor {acceptor_count}개, 지연 {latency * 1000:g}ms, 각 {duration:g}초) ---")
+    for contention_control in (False, True):
+        label = "백오프+리더 전달" if contention_control else "단순 경쟁"
+        for count in proposer_counts:
+            random.seed(seed)
+            acceptors = [Acceptor(i, verbose=False, latency=latency) for i in range(1, acceptor_count + 1)]
+            peers: Dict[int, Proposer] = {}
+            proposers = [
+                MultiPaxosLeader(proposer_id=i, acceptors=acceptors, verbose=False,
+                                 backoff=contention_control, peers=peers if contention_control else None)
+                for i in range(1, count + 1)
+            ]
+            commits = [0] * count
+            deadline = time.perf_counter() + duration
+
+            def client(index: int):
+                proposer = proposers[index]
+                account = f"C{proposer.proposer_id}"
+                while not proposer.submit(make_request(f"OPEN {account} 0.0", account, 0)):
+                    pass
+                seq = 1
+                while time.perf_counter() < deadline:
+                    # 실패한 요청은 성공할 때까지 같은 순번으로 재시도한다 (이미 결정됐을 수 있음)
+                    while not proposer.submit(make_request(f"DEPOSIT {account} 1.0", account, seq)):
+                        pass
+                    commits[index] += 1
+                    seq += 1
+
+            threads = [threading.Thread(target=client, args=(i,)) for i in range(count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for proposer in proposers:
+                proposer.close()
+            committed = sum(commits)
+            balances = acceptors[0].current_balance
+            print(
+                f"{label:>10} N={count}: {committed / duration:7.0f} 거래/초, "
+                f"거래당 왕복 {sum(p.round_trips for p in proposers) / max(committed, 1):.2f}회, "
+                f"전달 {sum(p.forwarded for p in proposers)}, 잔액 합계 = 성공 수: {sum(balances.values()) == committed}"
+            )
+
+def run_replay_benchmark(transaction_count: int = 1_000_000, account_count: int = 1000, seed: int = 0):
+    """결정된 거래 로그를 원장에 다시 반영하는 시간을 순차 반영과 벡터화 반영으로 비교한다"""
+    rng = random.Random(seed)
+    actions = ["DEPOSIT", "WITHDRAW", "WITHDRAW", "OPEN"]
+    ledger_log = [
+        NOOP if rng.random() < 0.01 else
+        f"{rng.choice(actions)} U{rng.randrange(account_count + account_count // 10)} {rng.randrange(1, 20000) / 100}"
+        for _ in range(transaction_count)
+    ]
+    print(f"--- 원장 재생 벤치마크 (거래 {transaction_count}개, 계좌 {account_count}개, "
+          f"NumPy {'사용' if np is not None else '없음'}) ---")
+    results = []
+    for vectorized in (False, True):
+        if vectorized and np is None:
+            break
+        ledger = Ledger(vectorized=vectorized)
+        start = time.perf_counter()
+        for command in ledger_log:
+            ledger.append(command)
+        balances = ledger.snapshot()
+        elapsed = time.perf_counter() - start
+        results.append(balances)
+        print(f"{'벡터화' if vectorized else '순차':>6}: {elapsed:.2f}초 ({elapsed / transaction_count * 1e6:.2f}µs/거래), "
+              f"개설 계좌 {len(balances)}개")
+    if len(results) == 2:
+        print(f"결과 일치: {results[0] == results[1]}")
+
+# === 3. 시뮬레이션 실행 ===
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PAXOS 기반 은행 거래 시뮬레이션")
+    parser.add_argument("--classic", action="store_true", help="거래마다 Phase 1 을 실행하는 기본 Proposer 사용")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="거래 N개로 왕복 횟수 벤치마크")
+    parser.add_argument("--latency", type=int, default=None, metavar="N",
+                        help="거래 N개로 느린 Acceptor 가 섞인 지연 시간 벤치마크 (순차 vs 병렬 전송)")
+    parser.add_argument("--contention", action="store_true", help="N 개의 Proposer 가 경쟁할 때의 처리량 벤치마크")
+    parser.add_argument("--replay", type=int, default=None, metavar="N", help="거래 N개 원장 재생 벤치마크")
+    args = parser.parse_args()
+
+    if args.contention:
+        run_contention_benchmark()
+        raise SystemExit
+    if args.replay:
+        run_replay_benchmark(args.replay)
+        raise SystemExit
+    if args.bench:
+        run_round_trip_benchmark(args.bench)
+        raise SystemExit
+    if args.latency:
+        run_latency_benchmark(args.latency)
+        raise SystemExit
 
-# 3개의 은행 분산 스토리지 노드(Acceptor) 초기화
-acceptors = [Acceptor(1), Acceptor(2), Acceptor(3)]
-proposer = Proposer(proposer_id=10, acceptors=acceptors) # 루이스의 요청을 처리하는 하나의 Proposer
+    # 3개의 은행 분산 스토리지 노드(Acceptor) 초기화
+    acceptors = [Acceptor(1), Acceptor(2), Acceptor(3)]
+    # 루이스의 요청을 처리하는 하나의 Proposer (기본값: Phase 1 을 한 번만 실행하는 안정된 리더)
+    proposer_class = Proposer if args.classic else MultiPaxosLeader
+    proposer = proposer_class(proposer_id=10, acceptors=acceptors)
 
-# 시뮬레이션 트랜잭션 목록
-transactions = [
-    "OPEN Louis 100.0",   # 계좌 개설 (100달러로 초기 입금)
-    "DEPOSIT Louis 50.0",  # 50달러 입금
-    "WITHDRAW Louis 30.0", # 30달러 출금
-    "WITHDRAW Louis 20.0"  # 20달러 출금
-]
+    # 시뮬레이션 트랜잭션 목록
+    transactions = [
+        "OPEN Louis 100.0",   # 계좌 개설 (100달러로 초기 입금)
+        "DEPOSIT Louis 50.0",  # 50달러 입금
+        "WITHDRAW Louis 30.0", # 30달러 출금
+        "WITHDRAW Louis 20.0"  # 20달러 출금
+    ]
 
-print("--- PAXOS 기반 은행 거래 시뮬레이션 시작 (3개 노드) ---")
+    print("--- PAXOS 기반 은행 거래 시뮬레이션 시작 (3개 노드) ---")
 
-for tx in transactions:
-    success = proposer.propose(tx)
-    if not success:
-        print(f"🚨 거래 '{tx}' 합의 실패. 다음 거래로 진행하지 않고 종료하거나 재시도해야 함. (여기서는 다음 거래로 진행)")
+    for tx in transactions:
+        success = proposer.propose(tx)
+        if not success:
+            print(f"🚨 거래 '{tx}' 합의 실패. 다음 거래로 진행하지 않고 종료하거나 재시도해야 함. (여기서는 다음 거래로 진행)")
 
-print("\n--- 시뮬레이션 결과 ---")
-for acceptor in acceptors:
-    print(acceptor)
+    proposer.close()
+    print("\n--- 시뮬레이션 결과 ---")
+    for acceptor in acceptors:
+        print(acceptor)
+    print(f"거래 로그: {[acceptors[0].chosen[s] for s in sorted(acceptors[0].chosen)]}")
+    print(f"왕복 {proposer.round_trips}회, 메시지 {proposer.messages}개")
@@ -1,107 +1,1495 @@
+import argparse
 import collections
+import hashlib
+import heapq
+import hmac
 import random
 import time
 
 # --- 환경 설정 ---
-TOTAL_NODES = 4
-# 비잔틴 장애 허용 한계: t = (n-1) // 3. n=4일 때, t=1. (1개의 악의적 노드 허용)
-FAULTY_LIMIT = (TOTAL_NODES - 1) // 3 
-NODES = []
+TOTAL_NODES = 4  # 기본 클러스터 크기 (클러스터마다 create_cluster 로 바꿀 수 있다)
+# 비잔틴 장애 허용 한계 t 는 클러스터마다 정한다: 기본값 (n-1) // 3. n=4일 때, t=1. (1개의 악의적 노드 허용)
+
+# 배치/파이프라이닝 기본값
+BATCH_SIZE = 64  # pre-prepare 하나에 담는 최대 요청 수
+WATERMARK_WINDOW = 16  # 동시에 진행할 수 있는 시퀀스 번호 수 (high = low + window)
+CHECKPOINT_INTERVAL = 8  # 이 간격의 시퀀스마다 체크포인트 (window 는 interval 의 2배 이상)
+FUTURE_VIEWS = 2  # 현재 view 보다 이만큼까지 앞선 view 의 메시지만 보관한다
+VIEW_CHANGE_TIMEOUT = 0.05  # 백업이 요청 실행을 기다리는 가상 시간 (초), None 이면 view change 끔
+
+# 메시지 크기 계산용 (바이트)
+HEADER_SIZE = 32  # 메시지 종류, view, seq, 보낸 노드
+DIGEST_SIZE = 32  # SHA-256
+MAC_SIZE = 16  # 링크별 HMAC-SHA256 을 잘라 쓴 길이
+
+
+def batch_digest(batch):
+    """요청 배치의 digest. PREPARE/COMMIT 은 배치 대신 이 값만 싣는다."""
+    return hashlib.sha256("\n".join(batch).encode()).hexdigest()
+
+
+def checkpoint_digest(state_digest, executed_count, balances, client_table):
+    """체크포인트 상태 전체의 digest. 상태 전송으로 받은 상태가 안정 체크포인트와 같은지 이 값으로 확인한다."""
+    content = (state_digest, executed_count, sorted(balances.items()), sorted(client_table.items()))
+    return hashlib.sha256(repr(content).encode()).hexdigest()
+
+
+def link_key(a, b):
+    """
+    두 노드가 공유하는 HMAC 키. 공개된 노드 ID 만으로 만들므로 누구나 계산할 수 있다:
+    메시지 크기와 MAC 계산 비용을 재기 위한 시뮬레이션 전용 인증이며, 실제 배포라면
+    키 교환으로 얻은 비밀 키를 써야 한다.
+    """
+    low, high = min(a, b), max(a, b)
+    return hashlib.sha256(f"pbft-link-{low}-{high}".encode()).digest()
+
+
+# --- 클라이언트 요청과 계좌 상태 ---
+# 클라이언트 요청은 "연산 @클라이언트ID:타임스탬프" 문자열이다 (응답을 돌려보낼 곳과 중복 확인용).
+# 꼬리표가 없는 요청(벤치마크가 직접 넣는 요청)은 중복 확인 없이 제안될 때마다 실행하고 응답하지 않는다
+def make_request(operation, client_id, timestamp):
+    return f"{operation} @{client_id}:{timestamp}"
+
+
+def parse_request(request):
+    """요청 문자열 → (연산, 클라이언트 ID 또는 None, 타임스탬프 또는 None)"""
+    operation, sep, tag = request.rpartition(" @")
+    client_id, colon, timestamp = tag.partition(":")
+    if not (sep and colon and client_id.isdigit() and timestamp.isdigit()):
+        return request, None, None
+    return operation, int(client_id), int(timestamp)
+
+
+def is_read_only(operation):
+    return operation.startswith("Balance of ")
+
+
+def execute_operation(balances, operation, undo=None):
+    """
+    계좌 상태에 연산 하나를 적용하고 결과를 돌려준다. 알 수 없는 연산은 상태를 바꾸지 않는다.
+    undo 리스트를 주면 바꾸기 전 값 (계좌, 이전 값 또는 None) 을 기록한다 (잠정 실행 되돌리기용).
+    """
+    if operation.startswith("Transfer $"):
+        amount, sep, name = operation[len("Transfer $"):].partition(" to ")
+        if not (sep and amount.isdigit()):
+            return None
+        old = balances.get(name)
+        if undo is not None:
+            undo.append((name, old))
+        balances[name] = new = (old or 0) + int(amount)
+        return new
+    if operation.startswith("Balance of "):
+        return balances.get(operation[len("Balance of "):], 0)
+    return None
+
+
+def _batch_size(batch):
+    return sum(len(request) for request in batch)
+
+
+def message_size(msg_type, payload, authenticator):
+    if msg_type == 'PRE-PREPARE':
+        body = 8 + DIGEST_SIZE + _batch_size(payload[2])
+    elif msg_type == 'VIEW-CHANGE':
+        # 새 view, 안정 체크포인트, prepared 인증서마다 (seq, view, digest, 배치, PREPARE 보낸 노드)
+        body = 16 + DIGEST_SIZE + sum(24 + DIGEST_SIZE + _batch_size(p[3]) for p in payload[2])
+    elif msg_type == 'NEW-VIEW':
+        body = 16 + DIGEST_SIZE + sum(8 + DIGEST_SIZE + _batch_size(e[2]) for e in payload[2])
+    elif msg_type == 'STATE':
+        # 계좌마다 (이름, 잔액), 클라이언트마다 (ID, 타임스탬프, 결과)
+        body = DIGEST_SIZE + 8 + 16 * len(payload[2]) + 24 * len(payload[3])
+    elif msg_type == 'STATE-REQUEST':
+        body = 0
+    elif msg_type in ('PREPARE', 'COMMIT'):
+        body = 8 + DIGEST_SIZE
+    elif msg_type == 'REQUEST':
+        body = 1 + len(payload[0])
+    elif msg_type == 'REPLY':
+        body = 17 + len(payload[0]) + len(str(payload[1]))
+    else:
+        body = DIGEST_SIZE
+    return HEADER_SIZE + body + MAC_SIZE * len(authenticator or ())
+
+
+# --- 투표 기록 ---
+def add_vote(masks, digest, sender_id):
+    """
+    {digest: 보낸 노드 비트마스크} 에 투표를 기록하고, 새 투표면 그 digest 의 표 수를 돌려준다.
+    이미 기록된 투표(재전송)면 0.
+    """
+    bit = 1 << sender_id
+    mask = masks.get(digest, 0)
+    if mask & bit:
+        return 0
+    mask |= bit
+    masks[digest] = mask
+    return mask.bit_count()
+
+
+def mask_members(mask):
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+class SequenceVotes:
+    """
+    시퀀스 번호 하나의 PREPARE/COMMIT 투표. 보낸 노드 집합 대신 digest 별 비트마스크를 두고,
+    prepared/committed 는 정족수에 처음 도달할 때 한 번만 켠다 (이후 투표는 다시 세지 않는다).
+    """
+
+    __slots__ = ('prepares', 'commits', 'prepared', 'committed')
+
+    def __init__(self):
+        self.prepares = {}
+        self.commits = {}
+        self.prepared = False
+        self.committed = False
+
+
+# --- 메시지 전달기 (Dispatcher) ---
+class MessageDispatcher:
+    """
+    broadcast 가 상대 노드를 직접(재귀적으로) 호출하는 대신 메시지를 큐에 넣고,
+    run() 이 하나씩 꺼내 전달한다. 호출 깊이가 일정하므로 복제본 수백 개도 시뮬레이션할 수 있다.
+    min_delay/max_delay 로 링크별 가상 지연을 주고, reorder=False 면 링크별 FIFO 순서를 지킨다.
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=0.0, reorder=False, seed=None):
+        self.nodes = {}
+        self.clients = {}  # broadcast 대상이 아닌 클라이언트 (응답만 받는다)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.reorder = reorder
+        self.rng = random.Random(seed)
+        self.current_time = 0.0
+        self._queue = []  # (전달 시각, 순번, 콜백, 인자)
+        self._seq = 0
+        self._link_clock = {}
+        self.messages_delivered = 0
+        self.message_counts = collections.Counter()
+        self.bytes_sent = collections.Counter()  # 메시지 종류별 전송 바이트
+
+    def now(self):
+        return self.current_time
+
+    def add_node(self, node):
+        self.nodes[node.id] = node
+        node.network = self
+
+    def add_client(self, client):
+        self.clients[client.id] = client
+        client.network = self
+
+    def call_at(self, when, callback, *args):
+        heapq.heappush(self._queue, (when, self._seq, callback, args))
+        self._seq += 1
+
+    def call_later(self, delay, callback, *args):
+        self.call_at(self.current_time + delay, callback, *args)
+
+    def send(self, src_id, target_id, msg_type, seq_num, payload, authenticator=None, size=None):
+        deliver_at = self.current_time
+        if self.max_delay > 0:
+            deliver_at += self.rng.uniform(self.min_delay, self.max_delay)
+        if not self.reorder:
+            # 링크별 FIFO: 먼저 보낸 메시지보다 먼저 도착하지 않는다
+            link = (src_id, target_id)
+            deliver_at = max(deliver_at, self._link_clock.get(link, 0.0))
+            self._link_clock[link] = deliver_at
+        self.message_counts[msg_type] += 1
+        if size is None:
+            size = message_size(msg_type, payload, authenticator)
+        self.bytes_sent[msg_type] += size
+        self.call_at(
+            deliver_at, self._deliver, target_id, msg_type, seq_num, payload, src_id, authenticator
+        )
+
+    def broadcast(self, src_id, msg_type, seq_num, payload, authenticator=None):
+        # 모든 수신자가 같은 메시지(MAC 벡터 포함)를 받으므로 크기는 한 번만 계산한다
+        size = message_size(msg_type, payload, authenticator)
+        for node_id in self.nodes:
+            if node_id != src_id:
+                self.send(src_id, node_id, msg_type, seq_num, payload, authenticator, size)
+
+    def _deliver(self, target_id, msg_type, seq_num, payload, src_id, authenticator):
+        self.messages_delivered += 1
+        target = self.nodes.get(target_id) or self.clients[target_id]
+        target.receive_message(msg_type, seq_num, payload, src_id, authenticator)
+
+    def run(self, until=None):
+        """큐가 빌 때까지(또는 until 시각까지) 메시지를 하나씩 전달한다."""
+        queue = self._queue
+        while queue and (until is None or queue[0][0] <= until):
+            when, _, callback, args = heapq.heappop(queue)
+            self.current_time = when
+            callback(*args)
+        if until is not None:
+            self.current_time = max(self.current_time, until)
+
 
 # --- 노드 클래스 정의 (복제본, Replica) ---
 class PBFTNode:
-    def __init__(self, node_id, total_nodes):
+    def __init__(self, node_id, total_nodes, faulty_limit=None, batch_size=BATCH_SIZE,
+                 watermark_window=WATERMARK_WINDOW, checkpoint_interval=CHECKPOINT_INTERVAL,
+                 authenticate=True, view_change_timeout=VIEW_CHANGE_TIMEOUT,
+                 tentative_execution=True, verbose=True):
         self.id = node_id
         self.total_nodes = total_nodes
-        self.is_primary = (node_id == 0) # 초기 Primary 노드는 0번
+        # 클러스터별 장애 허용 한계 t (기본값 (n-1) // 3) 와 단계별 정족수
+        self.faulty_limit = (total_nodes - 1) // 3 if faulty_limit is None else faulty_limit
+        self.prepare_quorum = 2 * self.faulty_limit
+        self.commit_quorum = 2 * self.faulty_limit + 1
+        # Primary 는 view 번호로 정한다 (view mod n). 초기 view 0 의 Primary 는 0번
+        self.view = 0
         self.is_faulty = False
+        self.drop_rate = 0.5  # 악의적인 Primary 가 클라이언트 요청을 버리는 비율
+        self.verbose = verbose
+        self.network = None  # MessageDispatcher.add_node 가 설정
         self.state = {'last_seq': 0} # 현재 상태
-        # {seq_num: {msg_type: set_of_sender_ids}}
-        self.log = collections.defaultdict(lambda: collections.defaultdict(set)) 
-        
-        print(f"Node {self.id} initialized. Fault limit (t): {FAULTY_LIMIT}")
+        # {seq_num: SequenceVotes}
+        self.log = {}
+
+        # 배치: Primary 는 대기 중인 요청을 모아 시퀀스 번호 하나에 담는다
+        # 요청 본문은 digest 를 키로 한 번만 보관하고, 시퀀스에는 digest 만 기록한다
+        self.batch_size = batch_size
+        self.request_queue = collections.deque()
+        self.digests = {}  # {seq_num: pre-prepare 로 받은 배치 digest}
+        self.request_cache = {}  # {digest: 요청 튜플}
+        self._proposing = False  # 동기 전파 중 _propose_batches 재진입 방지
+
+        # 워터마크: low < seq <= low + window 인 시퀀스만 받아들인다
+        # low watermark 는 마지막 안정(stable) 체크포인트
+        self.watermark_window = watermark_window
+        self.low_watermark = 0
+        # high watermark 나 현재 view 보다 앞선 메시지 (창이 움직이거나 view 에 들어가면 다시 처리)
+        # 악의적인 복제본이 채우지 못하도록 _defer_message 가 범위와 보낸 노드별 개수를 제한한다
+        self.future_messages = []
+        self.future_counts = collections.Counter()  # {보낸 노드: 보관 중인 메시지 수}
+        self.committed = set()  # 확정되었지만 아직 실행 순서가 오지 않은 시퀀스
+        self.last_executed = 0
+        self.executed_count = 0
+        # 클라이언트별 마지막 응답 표 {클라이언트 ID: (타임스탬프, 결과)} (Castro-Liskov)
+        # 타임스탬프가 그 이하인 요청은 다시 실행하지 않으므로, view change 로 같은 요청이 두 번
+        # 제안돼도 한 번만 실행한다. 크기는 클라이언트 수에 비례하고 체크포인트 상태에 함께 담긴다
+        self.client_table = {}
+        # 계좌 상태. 잠정 실행(tentative)은 prepared 된 시퀀스를 확정 전에 balances 에 바로 적용하고
+        # 먼저 응답한다. 확정될 때까지 시퀀스별 되돌리기 기록을 남겨 view change 때 되돌린다
+        self.balances = {}
+        self.tentative_execution = tentative_execution
+        self.tentative_log = {}  # {seq: (실행한 요청 튜플, [(계좌, 이전 값)], [(클라이언트, 이전 항목)])}
+        self.last_tentative = 0
+        # 잠정 실행된 쓰기 위에서 실행한 읽기 전용 요청의 응답은 그 쓰기가 확정될 때까지 보류한다
+        # [[기다리는 seq, 클라이언트, 요청, 연산, 결과 (되돌려졌으면 None)]]
+        self.held_reads = []
+        # 실행 상태의 요약: 이전 digest 와 실행한 배치를 이어서 해시한다
+        self.state_digest = hashlib.sha256(b"genesis").hexdigest()
+        self.messages_sent = 0
+
+        # 체크포인트: {seq: {digest: 보낸 노드 비트마스크}},
+        # 자신의 체크포인트 상태 {seq: (체크포인트 digest, 실행 digest, 실행 수, 계좌, 클라이언트 표)}
+        # 체크포인트 digest 는 상태 전체를 덮으므로 상태 전송으로 받은 상태를 확인할 수 있다
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_votes = collections.defaultdict(dict)
+        # 보낸 노드마다 안정 체크포인트보다 앞선 체크포인트 주장 {보낸 노드: {seq: digest}}
+        # 노드마다 가장 최근 한 창 분량만 투표로 남겨, 악의적인 노드가 투표 기록을 키우지 못하게 한다
+        # (창보다 멀리 앞선 체크포인트도 받아야 뒤처진 복제본이 상태 전송으로 따라잡을 수 있다)
+        self.checkpoint_claims = collections.defaultdict(dict)
+        self.checkpoint_claim_limit = watermark_window // checkpoint_interval + 1
+        self.checkpoint_states = {}
+        self.stable_checkpoint = (0, checkpoint_digest(self.state_digest, 0, {}, {}))
+        self._fetching_state = None  # 상태 전송을 기다리는 체크포인트 seq
+
+        # 링크별 HMAC 인증: 보낼 때 수신자마다 MAC 을 붙이고(authenticator), 받을 때 자기 것만 확인
+        # (키는 link_key 참고: 시뮬레이션 전용)
+        self.authenticate = authenticate
+        self.link_keys = {i: link_key(node_id, i) for i in range(total_nodes) if i != node_id}
+        self.client_keys = {}  # 클라이언트와의 링크 키 (처음 볼 때 만든다)
+        self.macs_computed = 0
+        self.macs_verified = 0
+        self.auth_failures = 0
+        self.auth_time = 0.0
+        self.request_arrivals = {}  # Primary: {seq_num: 배치가 도착한 시각} (지연 측정용)
+        self.commit_latencies = []
+
+        # View change: 백업은 받은 요청이 view_change_timeout 안에 실행되지 않으면 다음 view 로 넘어간다
+        # prepared 는 view 가 바뀌어도 유지해 VIEW-CHANGE 의 prepared 인증서로 보낸다
+        self.view_change_timeout = view_change_timeout
+        self.view_changing = False
+        self.pending_view = 0  # 진행 중인 view change 의 목표 view
+        self.pending_requests = {}  # {요청: 받은 시각} 아직 실행되지 않은 요청 (삽입 순서 = 도착 순서)
+        self.prepared = {}  # {seq_num: (prepared 된 view, digest, PREPARE 보낸 노드 비트마스크)}
+        self.view_changes = collections.defaultdict(dict)  # {view: {보낸 노드: (체크포인트, prepared)}}
+        self.new_views_sent = set()
+        self._request_timer_armed = False
+        self.view_change_count = 0
+
+        self._log(f"Node {self.id} initialized. Fault limit (t): {self.faulty_limit}")
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
 
-    def set_faulty(self, status):
-        """노드를 악의적으로 설정"""
+    @property
+    def high_watermark(self):
+        return self.low_watermark + self.watermark_window
+
+    def in_window(self, seq_num):
+        return self.low_watermark < seq_num <= self.high_watermark
+
+    def _votes(self, seq_num):
+        votes = self.log.get(seq_num)
+        if votes is None:
+            votes = self.log[seq_num] = SequenceVotes()
+        return votes
+
+    @property
+    def primary_id(self):
+        return self.view % self.total_nodes
+
+    @property
+    def is_primary(self):
+        return self.id == self.primary_id and not self.view_changing
+
+    def set_faulty(self, status, drop_rate=0.5):
+        """노드를 악의적으로 설정 (Primary 일 때 drop_rate 비율의 요청을 버린다)"""
         self.is_faulty = status
-        print(f"[N{self.id}] ⚠️ Node set to MALICIOUS.")
+        self.drop_rate = drop_rate
+        self._log(f"[N{self.id}] ⚠️ Node set to MALICIOUS.")
 
     def receive_request(self, request, sender_id):
         """클라이언트 요청 처리 시작"""
-        if self.is_faulty and random.random() < 0.5:
+        self.receive_requests([request], sender_id)
+
+    def receive_requests(self, requests, sender_id):
+        """여러 클라이언트 요청을 한꺼번에 받는다 (같은 시점에 도착한 요청 묶음)"""
+        if self.is_faulty and random.random() < self.drop_rate:
             # 악의적인 Primary 노드는 요청을 무시하거나 지연시킬 수 있음
-            print(f"[N{self.id}] 😈 Malicious Primary ignoring client request...")
+            self._log(f"[N{self.id}] 😈 Malicious Primary ignoring client request...")
             return
 
+        # 실행될 때까지 기억해 둔다: 백업은 요청 타이머를, 새 Primary 는 재제안 대상을 여기서 얻는다
+        now = self.network.now()
+        for request in requests:
+            self.pending_requests.setdefault(request, now)
         if self.is_primary:
-            # 1. Pre-Prepare 단계 시작
-            self.state['last_seq'] += 1
-            seq_num = self.state['last_seq']
-            
-            print(f"\n--- [P{self.id}] Starting Round {seq_num}: Request '{request}' ---")
-            
-            # Primary가 악의적일 경우, 거짓 메시지를 보낼 수 있음
-            if self.is_faulty:
-                 malicious_request = "Transfer $100 to Bob" # Alice 대신 Bob에게 전송하도록 변조
-                 print(f"[P{self.id}] 😈 Sending malicious PRE-PREPARE: '{malicious_request}'")
-                 self.broadcast_message('PRE-PREPARE', seq_num, malicious_request)
-            else:
-                 self.broadcast_message('PRE-PREPARE', seq_num, request)
+            self.request_queue.extend(requests)
+            self._propose_batches()
+        else:
+            self._arm_request_timer()
+
+    def _receive_client_request(self, payload, client_id):
+        request, read_only = payload
+        if not read_only:
+            self.receive_requests([request], client_id)
+            return
+        # 읽기 전용 요청은 순서를 정하지 않고 현재 상태에서 바로 실행한다. 현재 상태에 아직 확정되지 않은
+        # 잠정 실행이 있으면, 응답은 그 시퀀스까지 모두 확정된 뒤에 보낸다 (Castro-Liskov)
+        # (복제본마다 실행 위치가 달라 결과가 어긋나면 클라이언트가 일반 요청으로 다시 보낸다)
+        operation, client_id, _ = parse_request(request)
+        result = execute_operation(self.balances, operation)
+        if self.last_tentative > self.last_executed:
+            self.held_reads.append([self.last_tentative, client_id, request, operation, result])
+        else:
+            self._reply(client_id, request, result, False)
+
+    def _release_reads(self):
+        """기다리던 잠정 실행이 모두 확정된 읽기 응답을 보낸다 (되돌려진 읽기는 확정 상태에서 다시 실행)"""
+        if not self.held_reads:
+            return
+        held, self.held_reads = self.held_reads, []
+        for entry in held:
+            seq_num, client_id, request, operation, result = entry
+            if seq_num > self.last_executed:
+                self.held_reads.append(entry)
+                continue
+            if result is None:
+                result = execute_operation(self.balances, operation)
+            self._reply(client_id, request, result, False)
+
+    def _reply(self, client_id, request, result, tentative):
+        # 5. 응답 (Reply) 단계: 요청을 보낸 클라이언트에게 결과를 직접 보낸다
+        if client_id is not None and client_id in self.network.clients:
+            self._send(client_id, 'REPLY', self.view, (request, result, tentative))
+
+    def _propose_batches(self):
+        """1. Pre-Prepare 단계: 워터마크 창이 허용하는 만큼 대기 요청을 배치로 묶어 시작"""
+        if self._proposing:
+            return
+        self._proposing = True
+        try:
+            while self.request_queue and self.state['last_seq'] < self.high_watermark:
+                batch = tuple(
+                    self.request_queue.popleft()
+                    for _ in range(min(self.batch_size, len(self.request_queue)))
+                )
+                self.state['last_seq'] += 1
+                seq_num = self.state['last_seq']
+
+                self._log(f"\n--- [P{self.id}] Starting Round {seq_num}: {len(batch)} request(s) {list(batch)} ---")
+
+                # Primary가 악의적일 경우, 거짓 메시지를 보낼 수 있음
+                if self.is_faulty:
+                    batch = tuple("Transfer $100 to Bob" for _ in batch) # Alice 대신 Bob에게 전송하도록 변조
+                    self._log(f"[P{self.id}] 😈 Sending malicious PRE-PREPARE: {list(batch)}")
+                digest = batch_digest(batch)
+                self.digests[seq_num] = digest
+                self.request_cache[digest] = batch
+                self.request_arrivals[seq_num] = self.network.now()
+                self.broadcast_message('PRE-PREPARE', seq_num, (self.view, digest, batch))
+        finally:
+            self._proposing = False
+
+    def receive_message(self, msg_type, seq_num, request, sender_id, authenticator=None):
+        """
+        노드 간 메시지 수신 및 처리.
+        request 는 PRE-PREPARE 면 (view, digest, 요청 튜플), PREPARE/COMMIT 이면 (view, digest),
+        CHECKPOINT 면 digest, 클라이언트의 REQUEST 면 (요청, 읽기 전용 여부).
+        """
+        if self.authenticate and not self._verify(msg_type, seq_num, request, sender_id, authenticator):
+            self.auth_failures += 1
+            self._log(f"[N{self.id}] 🔒 Rejected {msg_type} from N{sender_id}: bad MAC")
+            return
 
-    def receive_message(self, msg_type, seq_num, request, sender_id):
-        """노드 간 메시지 수신 및 처리"""
-        
         # 악의적인 노드는 Prepare/Commit 메시지를 가끔 무시하거나 변경한다고 가정
         if self.is_faulty and msg_type in ['PREPARE', 'COMMIT'] and random.random() < 0.3:
             # Prepare/Commit 메시지 수집을 방해
-            print(f"[N{self.id}] 😈 Maliciously ignoring or altering {msg_type} from N{sender_id}")
-            return
-        
-        # 메시지 로그 업데이트
-        self.log[seq_num][msg_type].add(sender_id)
-        
-        # 모든 노드는 Primary로부터의 Pre-Prepare 메시지를 기반으로 Prepare 시작
-        if msg_type == 'PRE-PREPARE' and sender_id == 0: # Primary 노드가 0번이라고 가정
-            # 2. Prepare 단계 시작
-            print(f"[N{self.id}] Rcvd PRE-PREPARE for seq {seq_num}. Starting Prepare.")
-            self.broadcast_message('PREPARE', seq_num, request)
-
-        elif msg_type == 'PREPARE':
-            # 3. Commit 단계 시작 조건 확인
-            prepare_count = len(self.log[seq_num]['PREPARE'])
-            # 2t 이상의 Prepare 메시지를 받으면 '준비됨(Prepared)'
-            if prepare_count >= 2 * FAULTY_LIMIT and 'COMMIT' not in self.log[seq_num]:
-                print(f"[N{self.id}] Prepared for seq {seq_num} (count: {prepare_count}). Starting Commit.")
-                self.broadcast_message('COMMIT', seq_num, request)
+            self._log(f"[N{self.id}] 😈 Maliciously ignoring or altering {msg_type} from N{sender_id}")
+            return
+        self._handle_message(msg_type, seq_num, request, sender_id)
 
+    def _handle_message(self, msg_type, seq_num, request, sender_id):
+        if msg_type == 'REQUEST':
+            self._receive_client_request(request, sender_id)
+            return
+        if msg_type == 'CHECKPOINT':
+            # 창보다 앞선 체크포인트도 받아야 뒤처진 것을 알아챌 수 있다
+            self._receive_checkpoint(seq_num, request, sender_id)
+            return
+        if msg_type == 'STATE-REQUEST':
+            self._send_state(seq_num, sender_id)
+            return
+        if msg_type == 'STATE':
+            self._receive_state(seq_num, request)
+            return
+        if msg_type == 'VIEW-CHANGE':
+            self._receive_view_change(request, sender_id)
+            return
+        if msg_type == 'NEW-VIEW':
+            self._receive_new_view(request, sender_id)
+            return
+
+        # 지난 view 의 메시지는 버리고, 아직 들어가지 않은 view 의 메시지는 NEW-VIEW 뒤에 다시 처리한다
+        # view change 중에는 현재 view 의 메시지도 받지 않는다
+        view = request[0]
+        if view > self.view:
+            self._defer_message(msg_type, seq_num, request, sender_id)
+            return
+        if view < self.view or self.view_changing:
+            return
+
+        # 이미 실행한 시퀀스는 버리고, 창보다 앞선 시퀀스는 창이 따라올 때까지 보관한다
+        if seq_num <= self.low_watermark:
+            return
+        if seq_num > self.high_watermark:
+            self._defer_message(msg_type, seq_num, request, sender_id)
+            return
+
+        # 모든 노드는 현재 view 의 Primary 로부터의 Pre-Prepare 메시지를 기반으로 Prepare 시작
+        if msg_type == 'PRE-PREPARE':
+            if sender_id != self.primary_id:
+                return
+            _, digest, batch = request
+            if seq_num in self.digests or batch_digest(batch) != digest:
+                return  # 같은 시퀀스의 두 번째 pre-prepare, 또는 digest 가 본문과 다름
+            self.digests[seq_num] = digest
+            self.request_cache[digest] = batch
+            # 2. Prepare 단계 시작 (이후 메시지는 digest 만 싣는다)
+            self._log(f"[N{self.id}] Rcvd PRE-PREPARE for seq {seq_num}. Starting Prepare.")
+            votes = self._votes(seq_num)
+            add_vote(votes.prepares, digest, self.id)
+            self.broadcast_message('PREPARE', seq_num, (self.view, digest))
+            self._check_prepared(seq_num, votes)
+            return
+
+        # 투표는 현재 view 안에서 digest 별로 센다. 재전송이나 pre-prepare 와 다른 digest 의 투표는
+        # 정족수 확인을 건너뛴다
+        digest = request[1]
+        votes = self._votes(seq_num)
+        if msg_type == 'PREPARE':
+            if add_vote(votes.prepares, digest, sender_id) and digest == self.digests.get(seq_num):
+                self._check_prepared(seq_num, votes)
         elif msg_type == 'COMMIT':
-            # 4. 확정 단계 조건 확인
-            commit_count = len(self.log[seq_num]['COMMIT'])
-            # 2t+1 이상의 Commit 메시지를 받으면 '확정됨(Committed)'
-            if commit_count >= 2 * FAULTY_LIMIT + 1:
-                # 합의가 도출된 경우, 더 이상 메시지를 보내지 않도록 방지
-                if 'EXECUTED' not in self.log[seq_num]:
-                    self.log[seq_num]['EXECUTED'] = set([self.id])
-                    print(f"[N{self.id}] ✅ Committed for seq {seq_num} (count: {commit_count}). Executing request: '{request}'")
-                    # 5. 응답 (Reply) 단계 시뮬레이션 (여기서는 간단히 출력)
-                
+            if add_vote(votes.commits, digest, sender_id) and digest == self.digests.get(seq_num):
+                self._check_committed(seq_num, votes)
+
+    def _check_prepared(self, seq_num, votes):
+        # 3. Commit 단계 시작 조건 확인
+        digest = self.digests.get(seq_num)
+        if digest is None or votes.prepared:
+            return
+        prepare_count = votes.prepares.get(digest, 0).bit_count()
+        # pre-prepare 와 2t 이상의 Prepare 메시지를 받으면 '준비됨(Prepared)'
+        if prepare_count >= self.prepare_quorum:
+            self._log(f"[N{self.id}] Prepared for seq {seq_num} (count: {prepare_count}). Starting Commit.")
+            votes.prepared = True
+            add_vote(votes.commits, digest, self.id)
+            self.prepared[seq_num] = (self.view, digest, votes.prepares[digest])
+            self.broadcast_message('COMMIT', seq_num, (self.view, digest))
+            self._execute_tentative()
+            self._check_committed(seq_num, votes)
+
+    def _check_committed(self, seq_num, votes):
+        # 4. 확정 단계 조건 확인 (자신이 prepared 된 뒤에만)
+        if votes.committed or not votes.prepared or seq_num <= self.last_executed:
+            return
+        commit_count = votes.commits.get(self.digests[seq_num], 0).bit_count()
+        # 2t+1 이상의 Commit 메시지를 받으면 '확정됨(Committed)'
+        if commit_count >= self.commit_quorum:
+            self._log(f"[N{self.id}] ✅ Committed for seq {seq_num} (count: {commit_count}).")
+            votes.committed = True
+            self.committed.add(seq_num)
+            self._execute_ready()
+
+    def _apply_batch(self, seq_num, tentative):
+        """
+        시퀀스의 배치를 계좌 상태에 적용하고 응답한다. (실행한 요청, 계좌 되돌리기 기록,
+        클라이언트 표 되돌리기 기록) 을 돌려준다. 클라이언트 표보다 오래된 요청은 건너뛰고,
+        마지막 요청과 같은 요청이면 기록해 둔 응답을 다시 보낸다.
+        """
+        executed = []
+        undo = [] if tentative else None
+        client_undo = []
+        balances = self.balances
+        client_table = self.client_table
+        for request in self.request_cache[self.digests[seq_num]]:
+            operation, client_id, timestamp = parse_request(request)
+            if client_id is None:
+                execute_operation(balances, operation, undo)
+                executed.append(request)
+                continue
+            last = client_table.get(client_id)
+            if last is not None and timestamp <= last[0]:
+                if timestamp == last[0]:
+                    self._reply(client_id, request, last[1], tentative)
+                continue
+            result = execute_operation(balances, operation, undo)
+            client_undo.append((client_id, last))
+            client_table[client_id] = (timestamp, result)
+            executed.append(request)
+            self._reply(client_id, request, result, tentative)
+        return tuple(executed), undo, client_undo
+
+    def _execute_tentative(self):
+        """prepared 된 시퀀스를 번호 순서대로 잠정 실행하고 바로 응답한다 (commit 단계를 기다리지 않음)"""
+        if not self.tentative_execution:
+            return
+        seq_num = max(self.last_tentative, self.last_executed) + 1
+        votes = self.log.get(seq_num)
+        while votes is not None and votes.prepared:
+            self.tentative_log[seq_num] = self._apply_batch(seq_num, True)
+            self.last_tentative = seq_num
+            seq_num += 1
+            votes = self.log.get(seq_num)
+
+    @staticmethod
+    def _undo(balances, undo):
+        for name, old in reversed(undo):
+            if old is None:
+                del balances[name]
+            else:
+                balances[name] = old
+
+    def _rollback_tentative(self):
+        """확정되지 않은 잠정 실행을 최근 것부터 되돌린다."""
+        for seq_num in sorted(self.tentative_log, reverse=True):
+            _, undo, client_undo = self.tentative_log.pop(seq_num)
+            self._undo(self.balances, undo)
+            self._undo(self.client_table, client_undo)
+        self.last_tentative = self.last_executed
+        # 보류 중인 읽기 결과는 되돌린 쓰기를 봤을 수 있으므로 다시 실행하게 한다
+        for entry in self.held_reads:
+            entry[0], entry[4] = 0, None
+
+    def _committed_state(self):
+        """확정된 실행까지만 반영한 (계좌 상태, 클라이언트 표) (체크포인트용 복사본)"""
+        balances = dict(self.balances)
+        client_table = dict(self.client_table)
+        for seq_num in sorted(self.tentative_log, reverse=True):
+            _, undo, client_undo = self.tentative_log[seq_num]
+            self._undo(balances, undo)
+            self._undo(client_table, client_undo)
+        return balances, client_table
+
+    def _execute_ready(self):
+        # 확정된 시퀀스를 번호 순서대로 실행한다 (빈 번호가 있으면 기다림)
+        while self.last_executed + 1 in self.committed:
+            seq_num = self.last_executed + 1
+            self.committed.discard(seq_num)
+            self.last_executed = seq_num
+            # 잠정 실행한 시퀀스는 이미 적용하고 응답했으므로 기록만 확정한다
+            entry = self.tentative_log.pop(seq_num, None)
+            batch = entry[0] if entry is not None else self._apply_batch(seq_num, False)[0]
+            self.executed_count += len(batch)
+            # 중복이라 건너뛴 요청도 순서가 정해졌으므로 대기 목록에서 뺀다
+            for request in self.request_cache[self.digests[seq_num]]:
+                self.pending_requests.pop(request, None)
+            self.state_digest = hashlib.sha256(
+                "\n".join((self.state_digest,) + batch).encode()
+            ).hexdigest()
+            self._log(f"[N{self.id}] Executing seq {seq_num}: {list(batch)}")
+            if seq_num in self.request_arrivals:
+                latency = self.network.now() - self.request_arrivals.pop(seq_num)
+                self.commit_latencies.extend([latency] * len(batch))
+
+            if seq_num % self.checkpoint_interval == 0:
+                self._take_checkpoint(seq_num)
+        self.last_tentative = max(self.last_tentative, self.last_executed)
+        self._release_reads()
+
+    # --- 체크포인트와 로그 정리 (Garbage Collection) ---
+    def _take_checkpoint(self, seq_num):
+        balances, client_table = self._committed_state()
+        digest = checkpoint_digest(self.state_digest, self.executed_count, balances, client_table)
+        self.checkpoint_states[seq_num] = (
+            digest, self.state_digest, self.executed_count, balances, client_table
+        )
+        self._log(f"[N{self.id}] 📌 Checkpoint at seq {seq_num}: {digest[:8]}")
+        self.broadcast_message('CHECKPOINT', seq_num, digest)
+        self._receive_checkpoint(seq_num, digest, self.id)
+
+    def _receive_checkpoint(self, seq_num, digest, sender_id):
+        if seq_num <= self.stable_checkpoint[0] or seq_num % self.checkpoint_interval:
+            return
+        claims = self.checkpoint_claims[sender_id]
+        if seq_num in claims:
+            return  # 재전송, 또는 같은 seq 에 다른 digest 를 보내는 노드
+        if len(claims) >= self.checkpoint_claim_limit:
+            # 가장 오래된 주장을 투표에서 빼고 자리를 만든다 (새 주장이 더 오래됐으면 버린다)
+            oldest = min(claims)
+            if seq_num < oldest:
+                return
+            masks = self.checkpoint_votes[oldest]
+            old_digest = claims.pop(oldest)
+            mask = masks[old_digest] & ~(1 << sender_id)
+            if mask:
+                masks[old_digest] = mask
+            else:
+                del masks[old_digest]
+                if not masks:
+                    del self.checkpoint_votes[oldest]
+        claims[seq_num] = digest
+        votes = self.checkpoint_votes[seq_num]
+        # 같은 digest 의 체크포인트 2t+1 개 → 안정 체크포인트
+        if add_vote(votes, digest, sender_id) < self.commit_quorum:
+            return
+        self.stable_checkpoint = (seq_num, digest)
+        self._log(f"[N{self.id}] Stable checkpoint at seq {seq_num}")
+        if seq_num > self.last_executed:
+            # 다른 복제본들이 이미 지나간 지점: 정리된 메시지는 다시 오지 않으므로 상태를 받아온다
+            # 같은 체크포인트를 보낸 노드 중 t+1 개에게 요청한다 (적어도 하나는 정상)
+            if self._fetching_state is None or self._fetching_state < seq_num:
+                self._fetching_state = seq_num
+                sources = [i for i in mask_members(votes[digest]) if i != self.id]
+                for source in sources[:self.faulty_limit + 1]:
+                    self._send(source, 'STATE-REQUEST', seq_num, None)
+            return
+        self._collect_garbage(seq_num)
+
+    def _defer_message(self, msg_type, seq_num, request, sender_id):
+        """
+        앞선 메시지를 보관한다. high watermark 에서 체크포인트 간격 하나 이상, 또는 FUTURE_VIEWS 보다
+        더 앞선 메시지는 버린다 (그만큼 뒤처졌으면 체크포인트/상태 전송이나 view change 로 따라잡는다).
+        보낸 노드마다 한 창 분량(시퀀스마다 세 단계)까지만 보관한다.
+        """
+        if (
+            seq_num > self.high_watermark + self.checkpoint_interval
+            or request[0] > self.view + FUTURE_VIEWS
+            or self.future_counts[sender_id] >= 3 * (self.watermark_window + self.checkpoint_interval)
+        ):
+            return
+        self.future_counts[sender_id] += 1
+        self.future_messages.append((msg_type, seq_num, request, sender_id))
+
+    def _replay_future_messages(self):
+        if self.future_messages:
+            pending, self.future_messages = self.future_messages, []
+            self.future_counts.clear()
+            for message in pending:
+                self._handle_message(*message)
+
+    def _collect_garbage(self, seq_num):
+        """안정 체크포인트 이하의 로그/배치/체크포인트 기록을 버리고 low watermark 를 올린다."""
+        tables = (self.log, self.digests, self.prepared, self.checkpoint_votes)
+        for table in tables + tuple(self.checkpoint_claims.values()):
+            for old in [s for s in table if s <= seq_num]:
+                del table[old]
+        # 남은 시퀀스(와 다음 VIEW-CHANGE 에 실을 prepared 인증서)가 가리키지 않는 요청 본문은 버린다
+        live = set(self.digests.values()) | {entry[1] for entry in self.prepared.values()}
+        for digest in [d for d in self.request_cache if d not in live]:
+            del self.request_cache[digest]
+        for old in [s for s in self.checkpoint_states if s < seq_num]:
+            del self.checkpoint_states[old]
+        self.committed = {s for s in self.committed if s > seq_num}
+
+        self.low_watermark = seq_num
+        self._replay_future_messages()
+        if self.is_primary:
+            self._propose_batches()
+
+    def _send_state(self, seq_num, requester_id):
+        if seq_num in self.checkpoint_states:
+            self._send(requester_id, 'STATE', seq_num, self.checkpoint_states[seq_num][1:])
+
+    def _receive_state(self, seq_num, state):
+        state_digest, executed_count, balances, client_table = state
+        # 안정 체크포인트의 digest 와 맞는 상태만 받아들인다 (digest 는 2t+1 이 보증)
+        stable_seq, digest = self.stable_checkpoint
+        if stable_seq != seq_num or seq_num <= self.last_executed:
+            return
+        if checkpoint_digest(state_digest, executed_count, balances, client_table) != digest:
+            self._log(f"[N{self.id}] 🔒 Rejected state for checkpoint {seq_num}: digest mismatch")
+            return
+        self._log(f"[N{self.id}] Fetched state for checkpoint {seq_num}")
+        self._fetching_state = None
+        self.state_digest, self.executed_count = state_digest, executed_count
+        self._rollback_tentative()
+        self.last_executed = self.last_tentative = seq_num
+        self.balances = dict(balances)
+        self.client_table = dict(client_table)
+        self.checkpoint_states[seq_num] = (
+            digest, state_digest, executed_count, dict(balances), dict(client_table)
+        )
+        # 클라이언트 표가 이미 실행했다고 하는 요청은 더 기다리지 않는다
+        for request in list(self.pending_requests):
+            _, client_id, timestamp = parse_request(request)
+            last = client_table.get(client_id)
+            if last is not None and timestamp <= last[0]:
+                del self.pending_requests[request]
+        self._collect_garbage(seq_num)
+        self._execute_ready()
+
+    # --- View change: Primary 가 요청을 처리하지 않으면 다음 view 의 Primary 로 넘긴다 ---
+    def _arm_request_timer(self):
+        if self.view_change_timeout is None or self._request_timer_armed or not self.pending_requests:
+            return
+        self._request_timer_armed = True
+        oldest = next(iter(self.pending_requests.values()))
+        self.network.call_at(oldest + self.view_change_timeout, self._on_request_timer)
+
+    def _on_request_timer(self):
+        self._request_timer_armed = False
+        if self.is_primary or self.view_changing or not self.pending_requests:
+            return  # view change 중이면 view change 타이머가 맡는다
+        oldest = next(iter(self.pending_requests.values()))
+        if self.network.now() >= oldest + self.view_change_timeout:
+            self._log(f"[N{self.id}] ⏰ Request timer expired in view {self.view}")
+            self.start_view_change(self.view + 1)
+        else:
+            self._arm_request_timer()
+
+    def start_view_change(self, new_view):
+        """VIEW-CHANGE 를 보낸다: 안정 체크포인트와, 그 뒤로 prepared 된 시퀀스의 인증서를 싣는다."""
+        if new_view <= self.view or (self.view_changing and new_view <= self.pending_view):
+            return
+        self.view_changing = True
+        self.pending_view = new_view
+        self.request_queue.clear()
+        low = self.stable_checkpoint[0]
+        prepared = tuple(
+            (seq, view, digest, self.request_cache[digest], mask)
+            for seq, (view, digest, mask) in sorted(self.prepared.items()) if seq > low
+        )
+        self._log(f"[N{self.id}] 🔁 VIEW-CHANGE to view {new_view} ({len(prepared)} prepared)")
+        self.view_changes[new_view][self.id] = (self.stable_checkpoint, prepared)
+        self.broadcast_message('VIEW-CHANGE', low, (new_view, self.stable_checkpoint, prepared))
+        # 새 Primary 도 응답하지 않으면 그 다음 view 로 (대기 시간은 시도마다 두 배)
+        attempts = new_view - self.view
+        self.network.call_later(
+            self.view_change_timeout * 2 ** attempts, self._on_view_change_timer, new_view
+        )
+        self._try_new_view(new_view)
+
+    def _on_view_change_timer(self, new_view):
+        if self.view_changing and self.pending_view == new_view:
+            self.start_view_change(new_view + 1)
+
+    def _receive_view_change(self, payload, sender_id):
+        new_view, checkpoint, prepared = payload
+        if new_view <= self.view:
+            return
+        self.view_changes[new_view][sender_id] = (checkpoint, prepared)
+        # t+1 개 복제본이 더 높은 view 로 가려 하면 (적어도 하나는 정상) 타이머를 기다리지 않고 따라간다
+        current = self.pending_view if self.view_changing else self.view
+        ahead = [v for v, votes in self.view_changes.items() if v > current and votes]
+        if ahead:
+            senders = set().union(*(self.view_changes[v] for v in ahead))
+            if len(senders) >= self.faulty_limit + 1:
+                self.start_view_change(min(ahead))
+        self._try_new_view(new_view)
+
+    def _try_new_view(self, new_view):
+        """새 view 의 Primary 가 VIEW-CHANGE 2t+1 개를 모으면 NEW-VIEW 로 prepared 요청을 재제안한다."""
+        reports = self.view_changes[new_view]
+        if (
+            new_view % self.total_nodes != self.id
+            or new_view in self.new_views_sent
+            or not (self.view_changing and self.pending_view == new_view)
+            or len(reports) < self.commit_quorum
+        ):
+            return
+        self.new_views_sent.add(new_view)
+        # 증명된 체크포인트 중 가장 높은 것에서 시작한다 (악의적인 노드 하나가 높은 체크포인트를 주장해도 무시)
+        checkpoint = max(
+            (cp for cp, _ in reports.values() if self._checkpoint_proven(cp, reports)),
+            default=self.stable_checkpoint,
+        )
+        # 시퀀스마다 가장 높은 view 에서 prepared 된 배치를 고르고, 빈 번호는 빈 배치(null 요청)로 채운다
+        # prepared 인증서가 온전하지 않은 항목은 버린다
+        chosen = {}
+        for _, prepared in reports.values():
+            for entry in prepared:
+                if not self._valid_prepared(entry, new_view, checkpoint[0]):
+                    continue
+                seq, view, digest, batch, _ = entry
+                if seq not in chosen or view > chosen[seq][0]:
+                    chosen[seq] = (view, digest, batch)
+        null = batch_digest(())
+        entries = tuple(
+            (seq, chosen[seq][1], chosen[seq][2]) if seq in chosen else (seq, null, ())
+            for seq in range(checkpoint[0] + 1, max(chosen, default=checkpoint[0]) + 1)
+        )
+        self._log(f"[P{self.id}] 📣 NEW-VIEW {new_view}: re-proposing {len(entries)} sequence(s)")
+        self.broadcast_message('NEW-VIEW', checkpoint[0], (new_view, checkpoint, entries))
+        self._enter_view(new_view, checkpoint, entries)
+
+    def _checkpoint_proven(self, checkpoint, reports):
+        """
+        VIEW-CHANGE 가 주장하는 안정 체크포인트를 믿을 수 있는지: 자신의 안정 체크포인트이거나,
+        같은 (seq, digest) 를 t+1 개 노드가 VIEW-CHANGE 또는 CHECKPOINT 로 보냈으면 (적어도 하나는 정상)
+        """
+        if checkpoint == self.stable_checkpoint:
+            return True
+        seq_num, digest = checkpoint
+        claims = sum(1 for cp, _ in reports.values() if cp == checkpoint)
+        votes = self.checkpoint_votes.get(seq_num, {}).get(digest, 0).bit_count()
+        return max(claims, votes) >= self.faulty_limit + 1
+
+    def _valid_prepared(self, entry, new_view, low):
+        """
+        VIEW-CHANGE 의 prepared 인증서 확인: 창 안의 시퀀스, 새 view 보다 앞선 view, 본문과 digest 일치,
+        그리고 그 view 의 Primary 가 아닌 2t 개 노드의 PREPARE.
+        """
+        seq, view, digest, batch, mask = entry
+        return (
+            low < seq <= low + self.watermark_window
+            and view < new_view
+            and mask >> self.total_nodes == 0
+            and (mask & ~(1 << view % self.total_nodes)).bit_count() >= self.prepare_quorum
+            and batch_digest(batch) == digest
+        )
+
+    def _receive_new_view(self, payload, sender_id):
+        new_view, checkpoint, entries = payload
+        if sender_id != new_view % self.total_nodes or new_view < self.view:
+            return
+        if new_view == self.view and not self.view_changing:
+            return
+        # 재제안 목록은 체크포인트 바로 뒤부터 빈틈없이 창 안에 있어야 하고, 본문이 digest 와 맞아야 한다
+        low = checkpoint[0]
+        if any(
+            seq != low + i + 1 or seq > low + self.watermark_window or batch_digest(batch) != digest
+            for i, (seq, digest, batch) in enumerate(entries)
+        ):
+            self._log(f"[N{self.id}] 🔒 Rejected NEW-VIEW {new_view} from N{sender_id}: bad entries")
+            return
+        self._enter_view(new_view, checkpoint, entries)
+
+    def _enter_view(self, new_view, checkpoint, entries):
+        # 새 Primary 가 고른 체크포인트는 직접 받은 VIEW-CHANGE/CHECKPOINT 로 확인된 경우에만 따라간다
+        proven = self._checkpoint_proven(checkpoint, self.view_changes.get(new_view, {}))
+        self.view = new_view
+        self.view_changing = False
+        self.pending_view = new_view
+        self.view_change_count += 1
+        for old in [v for v in self.view_changes if v <= new_view]:
+            del self.view_changes[old]
+        self._log(f"[N{self.id}] Entered view {new_view} (primary N{self.primary_id})")
+
+        # 지난 view 의 투표와, 아직 실행하지 않은 시퀀스의 배정은 버린다 (NEW-VIEW 가 다시 정한다)
+        for seq in [s for s in self.log if s > self.low_watermark]:
+            del self.log[seq]
+        for seq in [s for s in self.digests if s > self.last_executed]:
+            del self.digests[seq]
+        self.committed.clear()
+        self.request_arrivals.clear()
+        # 잠정 실행은 지난 view 의 prepared 에 기댄 것이므로 되돌린다
+        self._rollback_tentative()
+        self._release_reads()
+
+        # 다른 복제본들의 안정 체크포인트가 더 앞서 있으면 따라간다 (확인되지 않으면 이후 CHECKPOINT 로 따라잡는다)
+        if checkpoint[0] > self.stable_checkpoint[0] and proven:
+            self.stable_checkpoint = checkpoint
+            if checkpoint[0] > self.last_executed:
+                self._fetching_state = checkpoint[0]
+                self.broadcast_message('STATE-REQUEST', checkpoint[0], None)
+            else:
+                self._collect_garbage(checkpoint[0])
+
+        # 재제안된 시퀀스를 새 view 의 PRE-PREPARE 로 받아들인다
+        # 이미 실행한 시퀀스에도 투표해야 뒤처진 복제본이 정족수를 모을 수 있다
+        reproposed = set()
+        for seq, digest, batch in entries:
+            reproposed.update(batch)
+            if seq <= self.low_watermark:
+                continue
+            self.digests[seq] = digest
+            self.request_cache[digest] = batch
+            if not self.is_primary:
+                add_vote(self._votes(seq).prepares, digest, self.id)
+                self.broadcast_message('PREPARE', seq, (new_view, digest))
+
+        # 아직 실행되지 않은 요청은 새 Primary 에게 기회를 주도록 타이머를 다시 시작한다
+        now = self.network.now()
+        self.pending_requests = dict.fromkeys(self.pending_requests, now)
+        if self.is_primary:
+            last = entries[-1][0] if entries else checkpoint[0]
+            self.state['last_seq'] = max(last, self.low_watermark)
+            self.request_queue = collections.deque(
+                r for r in self.pending_requests if r not in reproposed
+            )
+
+        self._replay_future_messages()
+        for seq, _, _ in entries:
+            if seq > self.low_watermark:
+                self._check_prepared(seq, self._votes(seq))
+        if self.is_primary:
+            self._propose_batches()
+        else:
+            self._arm_request_timer()
+
+    def memory_footprint(self):
+        """보관 중인 항목 수 (체크포인트 간격과 클라이언트 수에 비례해야 하고, 처리한 요청 수와는 무관해야 한다)"""
+        return (
+            len(self.log) + len(self.digests) + len(self.request_cache) + len(self.client_table)
+            + len(self.checkpoint_votes) + len(self.checkpoint_states)
+            + len(self.future_messages) + sum(len(c) for c in self.checkpoint_claims.values())
+        )
+
     def broadcast_message(self, msg_type, seq_num, request):
-        """네트워크 전체에 메시지 전파 (시뮬레이션)"""
-        for node in NODES:
-            if node.id != self.id:
-                node.receive_message(msg_type, seq_num, request, self.id)
+        """네트워크 전체에 메시지 전파 (전달기 큐에 넣기만 하고 바로 돌아온다)"""
+        self.messages_sent += self.total_nodes - 1
+        authenticator = self._authenticator(msg_type, seq_num, request, self.link_keys)
+        self.network.broadcast(self.id, msg_type, seq_num, request, authenticator)
+
+    def _send(self, target_id, msg_type, seq_num, request):
+        self.messages_sent += 1
+        keys = {target_id: self.link_keys.get(target_id) or self._client_key(target_id)}
+        self.network.send(
+            self.id, target_id, msg_type, seq_num, request,
+            self._authenticator(msg_type, seq_num, request, keys),
+        )
+
+    # --- 메시지 인증 (링크별 HMAC) ---
+    def _client_key(self, client_id):
+        key = self.client_keys.get(client_id)
+        if key is None:
+            key = self.client_keys[client_id] = link_key(self.id, client_id)
+        return key
+
+    @staticmethod
+    def _mac_content(msg_type, seq_num, request):
+        # PRE-PREPARE 는 view 와 digest 만 인증한다 (본문은 수신 측에서 digest 와 대조)
+        if msg_type == 'PRE-PREPARE':
+            request = request[:2]
+        return f"{msg_type}|{seq_num}|{request}".encode()
+
+    def _authenticator(self, msg_type, seq_num, request, keys):
+        if not self.authenticate:
+            return None
+        started = time.perf_counter()
+        content = self._mac_content(msg_type, seq_num, request)
+        authenticator = {
+            target: hmac.digest(key, content, 'sha256')[:MAC_SIZE]
+            for target, key in keys.items()
+        }
+        self.macs_computed += len(keys)
+        self.auth_time += time.perf_counter() - started
+        return authenticator
+
+    def _verify(self, msg_type, seq_num, request, sender_id, authenticator):
+        # 클라이언트는 REQUEST 만 보낼 수 있다 (복제본 간 메시지는 복제본 링크 키로만 확인)
+        if msg_type == 'REQUEST':
+            link = self._client_key(sender_id) if sender_id not in self.link_keys else None
+        else:
+            link = self.link_keys.get(sender_id)
+        if not authenticator or self.id not in authenticator or link is None:
+            return False
+        started = time.perf_counter()
+        content = self._mac_content(msg_type, seq_num, request)
+        expected = hmac.digest(link, content, 'sha256')[:MAC_SIZE]
+        result = hmac.compare_digest(authenticator[self.id], expected)
+        self.macs_verified += 1
+        self.auth_time += time.perf_counter() - started
+        return result
+
+
+# --- 클라이언트 ---
+class PBFTClient:
+    """
+    요청을 모든 복제본에 보내고 응답을 모은다.
+    - 확정 실행 응답은 t+1 개, 잠정 실행/읽기 전용 응답은 2t+1 개가 같은 결과면 받아들인다.
+    - 읽기 전용 요청이 2t+1 개의 같은 결과를 모을 수 없게 되면 일반 요청으로 다시 보낸다.
+    """
+
+    def __init__(self, client_id, total_nodes, faulty_limit=None, read_only=True, verbose=True):
+        self.id = client_id  # 복제본 ID(0..n-1)와 겹치지 않아야 한다
+        self.total_nodes = total_nodes
+        self.faulty_limit = (total_nodes - 1) // 3 if faulty_limit is None else faulty_limit
+        self.read_only = read_only  # False 면 읽기도 일반 요청으로 보낸다 (비교용)
+        self.verbose = verbose
+        self.network = None  # MessageDispatcher.add_client 가 설정
+        self.link_keys = {i: link_key(client_id, i) for i in range(total_nodes)}
+        self.timestamp = 0
+        self.outstanding = {}  # {요청: [연산, 보낸 시각, 읽기 전용 여부, {(결과, 잠정 여부): 비트마스크}, 완료 콜백]}
+        self.latencies = collections.defaultdict(list)  # {'read'/'write': [지연]}
+        self.read_fallbacks = 0
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def submit(self, operation, on_done=None):
+        read_only = self.read_only and is_read_only(operation)
+        self._send_request(operation, read_only, self.network.now(), on_done)
+
+    def _send_request(self, operation, read_only, started, on_done):
+        self.timestamp += 1
+        request = make_request(operation, self.id, self.timestamp)
+        self.outstanding[request] = [operation, started, read_only, {}, on_done]
+        payload = (request, read_only)
+        content = PBFTNode._mac_content('REQUEST', 0, payload)
+        authenticator = {
+            i: hmac.digest(key, content, 'sha256')[:MAC_SIZE] for i, key in self.link_keys.items()
+        }
+        size = message_size('REQUEST', payload, authenticator)
+        for replica_id in range(self.total_nodes):
+            self.network.send(self.id, replica_id, 'REQUEST', 0, payload, authenticator, size)
+
+    def receive_message(self, msg_type, seq_num, payload, sender_id, authenticator=None):
+        if msg_type != 'REPLY' or sender_id not in self.link_keys:
+            return
+        content = PBFTNode._mac_content(msg_type, seq_num, payload)
+        expected = hmac.digest(self.link_keys[sender_id], content, 'sha256')[:MAC_SIZE]
+        if not authenticator or not hmac.compare_digest(authenticator.get(self.id, b""), expected):
+            return
+        request, result, tentative = payload
+        entry = self.outstanding.get(request)
+        if entry is None:
+            return  # 이미 받아들인 요청의 늦은 응답
+        operation, started, read_only, replies, on_done = entry
+        count = add_vote(replies, (result, tentative), sender_id)
+        needed = 2 * self.faulty_limit + 1 if (tentative or read_only) else self.faulty_limit + 1
+        if count >= needed:
+            del self.outstanding[request]
+            kind = 'read' if is_read_only(operation) else 'write'
+            self.latencies[kind].append(self.network.now() - started)
+            self._log(f"[C{self.id}] Accepted {operation!r} -> {result} ({count} replies)")
+            if on_done is not None:
+                on_done(result)
+            return
+        if read_only:
+            # 아직 응답하지 않은 복제본이 모두 최다 결과에 동의해도 2t+1 에 못 미치면 포기한다
+            received = 0
+            for mask in replies.values():
+                received += mask.bit_count()
+            best = max(mask.bit_count() for mask in replies.values())
+            if best + self.total_nodes - received < needed:
+                del self.outstanding[request]
+                self.read_fallbacks += 1
+                self._log(f"[C{self.id}] Read-only {operation!r} diverged; retrying as read-write")
+                self._send_request(operation, False, started, on_done)
+
+
+def create_cluster(total_nodes=TOTAL_NODES, dispatcher=None, **node_kwargs):
+    """복제본들을 만들어 전달기에 연결한다."""
+    dispatcher = dispatcher or MessageDispatcher()
+    nodes = [PBFTNode(i, total_nodes, **node_kwargs) for i in range(total_nodes)]
+    for node in nodes:
+        dispatcher.add_node(node)
+    return nodes, dispatcher
+
+
+# --- 벤치마크: 배치 크기에 따른 처리량과 요청당 메시지 수 ---
+def run_batch_benchmark(request_count=20000, batch_sizes=(1, 8, 64, 256),
+                        watermark_window=WATERMARK_WINDOW, total_nodes=TOTAL_NODES, faulty_limit=None):
+    print(f"--- PBFT batching benchmark (n={total_nodes}, {request_count} requests) ---")
+    results = {}
+    for batch_size in batch_sizes:
+        nodes, dispatcher = create_cluster(
+            total_nodes, batch_size=batch_size, watermark_window=watermark_window,
+            faulty_limit=faulty_limit, verbose=False,
+        )
+        requests = [f"Transfer ${i} to Alice" for i in range(request_count)]
+        started = time.perf_counter()
+        # 요청이 한꺼번에 몰려온 상황: Primary 큐에 쌓인 요청이 배치로 나간다
+        nodes[0].receive_requests(requests, 'Client')
+        dispatcher.run()
+        elapsed = time.perf_counter() - started
+        executed = min(node.executed_count for node in nodes)
+        messages = sum(node.messages_sent for node in nodes)
+        results[batch_size] = executed / elapsed
+        print(
+            f"batch {batch_size:>4} (f={nodes[0].faulty_limit}): {executed / elapsed:>10.0f} requests/s, "
+            f"{messages / request_count:.2f} messages/request, "
+            f"rounds {nodes[0].state['last_seq']}"
+        )
+    return results
+
+
+# --- 벤치마크: 복제본 수에 따른 메시지 수와 지연 (링크 지연 포함) ---
+def run_scale_benchmark(sizes=(4, 16, 64, 100), request_rate=2000, duration=0.1,
+                        min_delay=0.001, max_delay=0.005, reorder=False, faulty_limit=None, seed=0):
+    """
+    클라이언트가 초당 request_rate 개의 요청을 Primary 에 보내는 동안
+    가상 시간 duration 초를 시뮬레이션하고, 메시지 수/커밋 지연/실제 소요 시간을 잰다.
+    """
+    print(
+        f"--- PBFT scale benchmark ({request_rate} requests/s for {duration}s, "
+        f"link delay {min_delay * 1000:.0f}~{max_delay * 1000:.0f}ms, reorder={reorder}) ---"
+    )
+    rows = []
+    for n in sizes:
+        dispatcher = MessageDispatcher(min_delay, max_delay, reorder, seed)
+        nodes, _ = create_cluster(n, dispatcher, faulty_limit=faulty_limit, verbose=False)
+        interval = 1.0 / request_rate
+        for i in range(int(request_rate * duration)):
+            dispatcher.call_at(
+                i * interval, nodes[0].receive_request, f"Transfer ${i} to Alice", 'Client'
+            )
+        started = time.perf_counter()
+        dispatcher.run()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(nodes[0].commit_latencies)
+        executed = min(node.executed_count for node in nodes)
+        rows.append((n, dispatcher.messages_delivered, elapsed))
+        print(
+            f"n={n:>4} (f={nodes[0].faulty_limit:>2}): executed {executed}, "
+            f"rounds {nodes[0].state['last_seq']}, messages {dispatcher.messages_delivered} "
+            f"({dispatcher.messages_delivered / max(executed, 1):.1f}/request), "
+            f"latency p50 {latencies[len(latencies) // 2] * 1000:.1f}ms / "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms, wall {elapsed:.2f}s"
+        )
+    return rows
+
+
+# --- 벤치마크: 긴 실행에서 복제본 메모리가 체크포인트 간격에 묶이는지 확인 ---
+def run_checkpoint_benchmark(request_count=50000, request_rate=20000,
+                             checkpoint_intervals=(4, 8, 32), total_nodes=TOTAL_NODES, seed=0):
+    print(f"--- PBFT checkpoint benchmark (n={total_nodes}, {request_count} requests) ---")
+    for interval in checkpoint_intervals:
+        dispatcher = MessageDispatcher(0.001, 0.005, seed=seed)
+        nodes, _ = create_cluster(
+            total_nodes, dispatcher, batch_size=8, checkpoint_interval=interval,
+            watermark_window=2 * interval, verbose=False,
+        )
+        gap = 1.0 / request_rate
+        for i in range(request_count):
+            dispatcher.call_at(i * gap, nodes[0].receive_request, f"Transfer ${i} to Alice", 'Client')
+
+        peak = [0]
+
+        def sample():
+            peak[0] = max(peak[0], max(node.memory_footprint() for node in nodes))
+            if dispatcher._queue:
+                dispatcher.call_later(0.01, sample)
+
+        dispatcher.call_at(0.0, sample)
+        dispatcher.run()
+        print(
+            f"interval {interval:>3}: executed {min(n.executed_count for n in nodes)}, "
+            f"rounds {nodes[0].state['last_seq']}, stable checkpoint {nodes[0].stable_checkpoint[0]}, "
+            f"peak per-replica entries {peak[0]}, "
+            f"digests agree: {len({n.stable_checkpoint for n in nodes}) == 1}"
+        )
+
+
+# --- 벤치마크: digest 메시지의 대역폭과 HMAC 인증 비용 ---
+def run_digest_benchmark(request_sizes=(64, 1024, 16384), request_count=2000, batch_size=8,
+                         total_nodes=TOTAL_NODES):
+    print(
+        f"--- PBFT digest/MAC benchmark (n={total_nodes}, {request_count} requests, "
+        f"batch {batch_size}) ---"
+    )
+    for size in request_sizes:
+        for authenticate in (False, True):
+            nodes, dispatcher = create_cluster(
+                total_nodes, batch_size=batch_size, authenticate=authenticate, verbose=False
+            )
+            requests = [f"{i:08d}".ljust(size, "x") for i in range(request_count)]
+            started = time.perf_counter()
+            nodes[0].receive_requests(requests, 'Client')
+            dispatcher.run()
+            elapsed = time.perf_counter() - started
+
+            sent = sum(dispatcher.bytes_sent.values())
+            # PREPARE/COMMIT 이 배치 본문을 그대로 실었다면 (이전 방식) 추가됐을 바이트
+            rounds = nodes[0].state['last_seq']
+            payload_per_round = request_count * size / rounds
+            votes = dispatcher.message_counts['PREPARE'] + dispatcher.message_counts['COMMIT']
+            full = sent + votes * (payload_per_round - DIGEST_SIZE)
+            auth_time = sum(node.auth_time for node in nodes)
+            print(
+                f"request {size:>5}B, MAC {'on ' if authenticate else 'off'}: "
+                f"{sent / request_count:>9.0f} B/request "
+                f"(full-payload votes: {full / request_count:>9.0f} B/request), "
+                f"{request_count / elapsed:>8.0f} requests/s, "
+                f"MACs {sum(n.macs_computed for n in nodes)} computed / "
+                f"{sum(n.macs_verified for n in nodes)} verified, "
+                f"auth {auth_time / request_count * 1e6:.1f}us/request"
+            )
+
+
+# --- 벤치마크: 복제본 하나가 많은 시퀀스의 투표를 모을 때의 메모리와 메시지당 처리 시간 ---
+def run_vote_benchmark(total_nodes=100, in_flight=2048):
+    """
+    n=total_nodes 클러스터의 백업 하나(N1)에게 in_flight 개 시퀀스의 PRE-PREPARE 와
+    나머지 모든 복제본의 PREPARE/COMMIT 을 직접 넣는다. 전달기에는 N1 만 등록해
+    자기가 보내는 메시지는 어디에도 전달되지 않으므로, 투표 기록과 정족수 확인 비용만 잰다.
+    MAC 을 끈 경우와 켠 경우(받은 메시지 확인 + 보내는 메시지의 authenticator 계산)를 모두 잰다.
+    처리 시간과 메모리(tracemalloc)는 따로 한 번씩 돌려 잰다.
+    """
+    import tracemalloc
+
+    print(f"--- PBFT vote tracking benchmark (n={total_nodes}, {in_flight} sequences in flight) ---")
+    batches = [(f"Transfer ${seq} to Alice",) for seq in range(1, in_flight + 1)]
+    digests = [batch_digest(batch) for batch in batches]
+    # 보내는 쪽의 MAC 은 미리 만들어 둔다 (N1 이 확인하는 비용만 재도록)
+    messages = [('PRE-PREPARE', seq, (0, digest, batch), 0)
+                for seq, (batch, digest) in enumerate(zip(batches, digests), start=1)]
+    for phase in ('PREPARE', 'COMMIT'):
+        for sender in range(total_nodes):
+            if sender == 1 or (phase == 'PREPARE' and sender == 0):
+                continue
+            messages.extend(
+                (phase, seq, (0, digest), sender) for seq, digest in enumerate(digests, start=1)
+            )
+    prepares_done = sum(1 for m in messages if m[0] != 'COMMIT')
+    authenticators = [
+        {1: hmac.digest(link_key(sender, 1), PBFTNode._mac_content(msg_type, seq, payload),
+                        'sha256')[:MAC_SIZE]}
+        for msg_type, seq, payload, sender in messages
+    ]
+
+    def run(authenticate, on_prepares_done):
+        node = PBFTNode(
+            1, total_nodes, batch_size=1, watermark_window=in_flight,
+            checkpoint_interval=in_flight * 2, authenticate=authenticate, verbose=False,
+        )
+        MessageDispatcher().add_node(node)
+        for i in range(in_flight):
+            node.receive_message(*messages[i], authenticators[i])
+        started = time.perf_counter()
+        for i in range(in_flight, len(messages)):
+            node.receive_message(*messages[i], authenticators[i])
+            if i == prepares_done - 1:
+                on_prepares_done()
+        return node, len(messages) - in_flight, time.perf_counter() - started
+
+    results = {}
+    for authenticate in (False, True):
+        node, votes, elapsed = run(authenticate, lambda: None)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        retained = []
+        # 모든 PREPARE 를 받은 뒤(= 투표가 가장 많이 쌓인 시점)의 증가량
+        run(authenticate, lambda: retained.append(tracemalloc.get_traced_memory()[0] - before))
+        tracemalloc.stop()
+        results[authenticate] = (elapsed / votes, retained[0])
+        print(
+            f"MAC {'on ' if authenticate else 'off'}: {votes} votes: {elapsed / votes * 1e6:.2f}us/vote, "
+            f"vote log {retained[0] / 1024:.0f} KiB ({retained[0] / in_flight:.0f} B/sequence), "
+            f"MACs {node.macs_verified} verified / {node.macs_computed} computed, "
+            f"executed {node.executed_count}/{in_flight}"
+        )
+    return results
+
+
+# --- 벤치마크: Primary 가 악의적으로 바뀐 뒤 처리량이 회복되는 시간 ---
+def run_view_change_benchmark(request_rate=2000, duration=1.0, fault_at=0.3,
+                              timeouts=(None, 0.02, 0.05, 0.1), bucket=0.02,
+                              total_nodes=TOTAL_NODES, seed=0):
+    """
+    클라이언트는 요청을 모든 복제본에 보낸다 (백업의 요청 타이머가 Primary 를 감시할 수 있도록).
+    요청마다 다른 클라이언트 꼬리표를 달아, view change 로 다시 제안돼도 한 번만 실행되게 한다.
+    fault_at 시각에 Primary 가 모든 요청을 버리기 시작하면, bucket 단위로 정상 복제본의 실행 수를 재서
+    장애 전 처리량의 90% 를 다시 넘는 데 걸린 시간을 잰다. timeout=None 은 view change 없이.
+    """
+    print(
+        f"--- PBFT view change benchmark (n={total_nodes}, {request_rate} requests/s, "
+        f"primary turns faulty at {fault_at}s) ---"
+    )
+    results = {}
+    for timeout in timeouts:
+        random.seed(seed)
+        dispatcher = MessageDispatcher(0.001, 0.005, seed=seed)
+        nodes, _ = create_cluster(
+            total_nodes, dispatcher, batch_size=8, view_change_timeout=timeout, verbose=False
+        )
+        interval = 1.0 / request_rate
+        for i in range(int(request_rate * duration)):
+            request = make_request(f"Transfer ${i} to Alice", total_nodes + i, 1)
+            for node in nodes:
+                dispatcher.call_at(i * interval, node.receive_request, request, 'Client')
+        dispatcher.call_at(fault_at, nodes[0].set_faulty, True, 1.0)
+
+        observer = nodes[1]
+        samples = []
+
+        def sample():
+            samples.append(observer.executed_count)
+            if dispatcher.now() < duration + 1.0:
+                dispatcher.call_later(bucket, sample)
+
+        dispatcher.call_at(0.0, sample)
+        dispatcher.run(until=duration + 1.0)
+
+        rates = [(b - a) / bucket for a, b in zip(samples, samples[1:])]
+        fault_bucket = int(fault_at / bucket)
+        warmup = int(0.1 / bucket)
+        baseline = sum(rates[warmup:fault_bucket]) / max(fault_bucket - warmup, 1)
+        recovered = next(
+            (i for i in range(fault_bucket + 1, len(rates)) if rates[i] >= 0.9 * baseline), None
+        )
+        recovery = None if recovered is None else (recovered + 1) * bucket - fault_at
+        results[timeout] = recovery
+        print(
+            f"timeout {'off' if timeout is None else f'{timeout * 1000:.0f}ms':>5}: "
+            f"baseline {baseline:>6.0f} requests/s, "
+            f"recovery {'never' if recovery is None else f'{recovery * 1000:.0f}ms':>6}, "
+            f"final view {observer.view} (primary N{observer.primary_id}), "
+            f"executed {min(n.executed_count for n in nodes[1:])}/{int(request_rate * duration)}, "
+            f"replicas agree: {len({n.state_digest for n in nodes[1:]}) == 1}"
+        )
+    return results
+
+
+# --- 벤치마크: 읽기 전용/잠정 실행 경로의 클라이언트 지연 ---
+def run_fast_path_benchmark(request_rate=2000, duration=0.5, read_ratio=0.9, accounts=100,
+                            total_nodes=TOTAL_NODES, faulty_limit=None, seed=0):
+    """
+    클라이언트 하나가 초당 request_rate 개의 요청(read_ratio 만큼은 잔액 조회)을 보내는 동안
+    세 가지 설정에서 읽기/쓰기 지연을 잰다: 모든 요청이 세 단계를 거치는 경우,
+    잠정 실행만 켠 경우, 읽기 전용 요청까지 켠 경우.
+    """
+    print(
+        f"--- PBFT fast path benchmark (n={total_nodes}, {request_rate} requests/s, "
+        f"{read_ratio:.0%} reads over {accounts} accounts) ---"
+    )
+    configs = (
+        ("three-phase", False, False),
+        ("tentative", True, False),
+        ("tentative + read-only", True, True),
+    )
+    results = {}
+    for name, tentative, read_only in configs:
+        dispatcher = MessageDispatcher(0.001, 0.005, seed=seed)
+        nodes, _ = create_cluster(
+            total_nodes, dispatcher, batch_size=8, tentative_execution=tentative,
+            faulty_limit=faulty_limit, verbose=False,
+        )
+        client = PBFTClient(
+            total_nodes, total_nodes, faulty_limit=faulty_limit, read_only=read_only, verbose=False
+        )
+        dispatcher.add_client(client)
+        rng = random.Random(seed)
+        for i in range(int(request_rate * duration)):
+            account = f"A{rng.randrange(accounts)}"
+            if rng.random() < read_ratio:
+                operation = f"Balance of {account}"
+            else:
+                operation = f"Transfer $1 to {account}"
+            dispatcher.call_at(i / request_rate, client.submit, operation)
+        dispatcher.run()
+
+        row = {}
+        for kind in ('read', 'write'):
+            latencies = sorted(client.latencies[kind])
+            row[kind] = latencies[len(latencies) // 2]
+            row[kind + '_p99'] = latencies[int(len(latencies) * 0.99)]
+        results[name] = row
+        print(
+            f"{name:<22} (f={client.faulty_limit}): read p50 {row['read'] * 1000:>5.1f}ms / p99 {row['read_p99'] * 1000:>5.1f}ms, "
+            f"write p50 {row['write'] * 1000:>5.1f}ms / p99 {row['write_p99'] * 1000:>5.1f}ms, "
+            f"read fallbacks {client.read_fallbacks}, unanswered {len(client.outstanding)}, "
+            f"replicas agree: {len({tuple(sorted(n.balances.items())) for n in nodes}) == 1}"
+        )
+    return results
+
 
 # --- 시뮬레이션 실행 ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PBFT 시뮬레이션")
+    parser.add_argument("--bench", action="store_true", help="배치 크기별 처리량 벤치마크")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument(
+        "--scale", type=int, nargs="+", default=None, metavar="N",
+        help="복제본 수별 메시지 수/지연 벤치마크 (예: --scale 4 16 64 100)",
+    )
+    parser.add_argument("--reorder", action="store_true", help="링크 내 메시지 순서 뒤섞기")
+    parser.add_argument("--checkpoints", action="store_true", help="체크포인트 간격별 메모리 벤치마크")
+    parser.add_argument("--digests", action="store_true", help="요청 크기별 대역폭/인증 비용 벤치마크")
+    parser.add_argument("--view-change", action="store_true", help="Primary 장애 후 처리량 회복 시간 벤치마크")
+    parser.add_argument("--votes", action="store_true", help="투표 기록 메모리/처리 시간 벤치마크")
+    parser.add_argument("--fast-path", action="store_true", help="읽기 전용/잠정 실행 지연 벤치마크")
+    parser.add_argument("--nodes", type=int, default=None, help="복제본 수 (기본 4, --votes 는 100)")
+    parser.add_argument(
+        "--faulty", type=int, default=None,
+        help="장애 허용 한계 t (기본 (n-1)//3). 데모와 --bench, --scale, --fast-path 에 적용",
+    )
+    args = parser.parse_args()
+    total_nodes = args.nodes or TOTAL_NODES
+    if args.faulty is not None and 3 * args.faulty + 1 > min(args.scale or [total_nodes]):
+        parser.error("--faulty t 는 복제본 수 n >= 3t+1 을 만족해야 합니다")
+
+    if args.fast_path:
+        run_fast_path_benchmark(total_nodes=total_nodes, faulty_limit=args.faulty)
+        raise SystemExit
+    if args.votes:
+        run_vote_benchmark(args.nodes or 100)
+        raise SystemExit
+
+    if args.view_change:
+        run_view_change_benchmark(total_nodes=total_nodes)
+        raise SystemExit
+
+    if args.digests:
+        run_digest_benchmark(total_nodes=total_nodes)
+        raise SystemExit
+    if args.checkpoints:
+        run_checkpoint_benchmark(args.requests, total_nodes=total_nodes)
+        raise SystemExit
+    if args.bench:
+        run_batch_benchmark(args.requests, total_nodes=total_nodes, faulty_limit=args.faulty)
+        raise SystemExit
+    if args.scale:
+        run_scale_benchmark(args.scale, reorder=args.reorder, faulty_limit=args.faulty)
+        raise SystemExit
+
+    NODES, dispatcher = create_cluster(total_nodes, faulty_limit=args.faulty)
 
-NODES = [PBFTNode(i, TOTAL_NODES) for i in range(TOTAL_NODES)]
+    # N1을 악의적인 노드로 설정 (t=1 조건 내)
+    NODES[1].set_faulty(True)
 
-# N1을 악의적인 노드로 설정 (t=1 조건 내)
-NODES[1].set_faulty(True)
+    client_request = "Transfer $100 to Alice"
 
-client_request = "Transfer $100 to Alice"
+    # 클라이언트 요청 시뮬레이션 (요청은 Primary 노드인 N0으로 직접 보냄)
+    NODES[0].receive_request(client_request, 'Client')
 
-# 클라이언트 요청 시뮬레이션 (요청은 Primary 노드인 N0으로 직접 보냄)
-NODES[0].receive_request(client_request, 'Client')
+    # 큐에 쌓인 메시지를 모두 전달
+    dispatcher.run()
 
-# 시뮬레이션 종료 대기
-time.sleep(0.5)
+    # 읽기 전용 요청: 순서 정하기 없이 모든 복제본이 바로 응답하고, 클라이언트는 2t+1 개의 같은 결과를 받는다
+    client = PBFTClient(total_nodes, total_nodes, faulty_limit=args.faulty)
+    dispatcher.add_client(client)
+    client.submit("Balance of Alice")
+    dispatcher.run()
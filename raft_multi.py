@@ -0,0 +1,242 @@
+import argparse
+import math
+import random
+import time
+import zlib
+
+from finalexam import EventScheduler, NotLeaderError, RaftNode, State, parse_command
+
+
+# --- Multi-Raft: 같은 노드 집합 위에 여러 Raft 그룹을 올린다 ---
+def group_for_key(key, group_count):
+    """키를 그룹 번호로 매핑한다 (프로세스마다 달라지는 hash() 대신 crc32 사용)."""
+    return zlib.crc32(key.encode()) % group_count
+
+
+class GroupTransport:
+    """그룹 하나의 RaftNode 가 보는 전송 계층. 실제 전송은 호스트가 노드 쌍 단위로 묶어서 한다."""
+
+    def __init__(self, host, group_id):
+        self.host = host
+        self.group_id = group_id
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        self.host.enqueue(target_id, self.group_id, method, args, on_reply)
+
+
+class MultiRaftHost:
+    """
+    노드 ID 하나에 올라간 모든 그룹의 RaftNode 를 관리한다.
+    - 그룹들이 같은 시각에 보내는 RPC 는 대상 노드별로 모아 메시지 하나로 보낸다.
+    - 리더 그룹의 하트비트는 호스트 틱 경계에 맞춰, 모든 그룹의 하트비트가 한 메시지에 실린다.
+    따라서 노드 쌍 사이의 메시지 수는 그룹 수와 무관하게 틱당 요청/응답 한 쌍이다.
+    scheduler 에는 호스트가 노드 대신 등록되며, 그룹 노드에게는 호스트가 scheduler 역할을 한다.
+    """
+
+    def __init__(self, node_id, node_ids, group_count, scheduler, coalesce=True, **node_kwargs):
+        self.id = node_id
+        self.scheduler = scheduler
+        self.coalesce = coalesce
+        self.heartbeat_interval = node_kwargs.get("heartbeat_interval", 1.0)
+        node_kwargs.setdefault("rng", scheduler.rng)
+        self.groups = []
+        for group_id in range(group_count):
+            node = RaftNode(node_id, node_ids, clock=scheduler.now, **node_kwargs)
+            node.scheduler = self
+            node.transport = GroupTransport(self, group_id)
+            self.groups.append(node)
+
+        self._outbox = {}  # {대상 노드 ID: [(group_id, method, args, on_reply)]}
+        self._flush_scheduled = False
+        self._timer_gen = [0] * group_count
+        self.messages_sent = 0  # 노드 간 실제 메시지 수 (묶음 하나 = 1)
+        self.rpcs_sent = 0  # 그룹 단위 RPC 수
+
+        scheduler.nodes[node_id] = self
+        for node in self.groups:
+            self.arm_timer(node)
+
+    # --- 그룹 노드에게 제공하는 scheduler 인터페이스 ---
+    def now(self):
+        return self.scheduler.now()
+
+    def call_later(self, delay, callback, *args):
+        self.scheduler.call_later(delay, callback, *args)
+
+    def arm_timer(self, node):
+        group_id = node.transport.group_id
+        self._timer_gen[group_id] += 1
+        deadline = node.next_deadline()
+        if self.coalesce and node.state == State.LEADER:
+            # 하트비트만 호스트 틱 경계로 올려 맞춘다 → 같은 틱의 하트비트가 한 메시지로 묶인다
+            # CheckQuorum/리스 기한은 늦추면 안 되므로 그대로 둔다
+            heartbeat_at = node.last_heartbeat + node.heartbeat_interval
+            ticks = math.ceil(heartbeat_at / self.heartbeat_interval - 1e-9)
+            deadline = ticks * self.heartbeat_interval
+            if node.check_quorum:
+                deadline = min(deadline, node._quorum_deadline())
+        self.scheduler.call_at(deadline, self._fire_timer, node, group_id, self._timer_gen[group_id])
+
+    def _fire_timer(self, node, group_id, gen):
+        if self._timer_gen[group_id] != gen:
+            return
+        node.check_status()
+        self.arm_timer(node)
+
+    # --- 나가는 RPC 묶기 ---
+    def enqueue(self, target_id, group_id, method, args, on_reply):
+        self.rpcs_sent += 1
+        self._outbox.setdefault(target_id, []).append((group_id, method, args, on_reply))
+        if not self.coalesce:
+            self._flush()
+        elif not self._flush_scheduled:
+            # 현재 시각의 다른 이벤트(다른 그룹의 타이머/제안)가 끝난 뒤 한꺼번에 보낸다
+            self._flush_scheduled = True
+            self.scheduler.call_later(0.0, self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        outbox, self._outbox = self._outbox, {}
+        for target_id, items in outbox.items():
+            callbacks = [item[3] for item in items]
+            requests = [item[:3] for item in items]
+            self.messages_sent += 1
+            self.scheduler.send(
+                self.id, target_id, "handle_batch", (requests,),
+                lambda results, callbacks=callbacks: self._on_batch_reply(callbacks, results),
+            )
+
+    def _on_batch_reply(self, callbacks, results):
+        for on_reply, result in zip(callbacks, results):
+            on_reply(*result)
+
+    # --- 들어오는 묶음 처리 ---
+    def handle_batch(self, requests):
+        groups = self.groups
+        results = [getattr(groups[group_id], method)(*args) for group_id, method, args in requests]
+        return (results,)
+
+    def leader_count(self):
+        return sum(1 for node in self.groups if node.state == State.LEADER)
+
+
+class MultiRaftCluster:
+    """키 범위를 group_count 개의 Raft 그룹으로 나누고, 커맨드를 키에 따라 그룹으로 보낸다."""
+
+    def __init__(self, node_count, group_count, scheduler, coalesce=True, **node_kwargs):
+        node_ids = list(range(1, node_count + 1))
+        node_kwargs.setdefault("verbose", False)
+        self.scheduler = scheduler
+        self.group_count = group_count
+        self.hosts = [
+            MultiRaftHost(i, node_ids, group_count, scheduler, coalesce, **node_kwargs)
+            for i in node_ids
+        ]
+
+    def leader_of(self, group_id):
+        for host in self.hosts:
+            node = host.groups[group_id]
+            if node.state == State.LEADER:
+                return node
+        return None
+
+    def propose(self, command):
+        """키로 그룹을 고르고 그 그룹의 리더에게 제안한다. 리더가 없으면 NotLeaderError."""
+        _, key, _ = parse_command(command)
+        group_id = group_for_key(key or "", self.group_count)
+        leader = self.leader_of(group_id)
+        if leader is None:
+            raise NotLeaderError(None)
+        return leader.propose(command)
+
+    def all_groups_have_leader(self):
+        return all(self.leader_of(g) is not None for g in range(self.group_count))
+
+    def messages_sent(self):
+        return sum(host.messages_sent for host in self.hosts)
+
+    def rpcs_sent(self):
+        return sum(host.rpcs_sent for host in self.hosts)
+
+
+# --- 벤치마크: 그룹 수에 따른 쓰기 처리량과 노드 간 메시지 수 ---
+def run_multi_raft_benchmark(group_counts=(1, 4, 16, 64), node_count=5, rate=200000,
+                             duration=2.0, idle_duration=10.0, max_batch_entries=64,
+                             tick=0.001, seed=0):
+    """
+    리더 하나가 한 RTT 에 보낼 수 있는 양을 max_batch_entries × max_inflight 로 제한한 상태에서
+    그룹 수를 늘리며 커밋 처리량, 노드별 리더 분포, 유휴 시 하트비트 메시지 수를 잰다.
+    (단일 스레드 시뮬레이션이므로 처리량은 가상 시간 기준이다. 처리량이 늘어나는 것은 그룹 수에
+    따라 리더 배치 한도가 늘어나기 때문이지, 여러 코어를 써서가 아니다.)
+    """
+    print(
+        f"--- Multi-Raft 벤치마크 ({node_count}개 노드, 제안 {rate}/초, "
+        f"리더당 배치 {max_batch_entries}) ---"
+    )
+    rows = []
+    for group_count in group_counts:
+        row = {"groups": group_count}
+        for coalesce in (False, True):
+            scheduler = EventScheduler(seed=seed)
+            cluster = MultiRaftCluster(
+                node_count, group_count, scheduler, coalesce=coalesce,
+                max_batch_entries=max_batch_entries,
+            )
+            while not cluster.all_groups_have_leader():
+                scheduler.run_next()
+            scheduler.run_until(scheduler.now() + 1.0)
+
+            # 유휴 상태: 하트비트만 오갈 때 초당 노드 간 메시지 수
+            messages_before = cluster.messages_sent()
+            scheduler.run_until(scheduler.now() + idle_duration)
+            idle_messages = (cluster.messages_sent() - messages_before) / idle_duration
+            row["idle_messages" if coalesce else "idle_messages_uncoalesced"] = idle_messages
+            if not coalesce:
+                continue
+
+            # 부하 상태: 임의의 키로 쓰기
+            rng = random.Random(seed)
+            committed = []
+            per_tick = max(1, int(rate * tick))
+
+            def client_tick():
+                for _ in range(per_tick):
+                    key = f"k{rng.randrange(1_000_000)}"
+                    try:
+                        future = cluster.propose(f"SET {key} 1")
+                    except NotLeaderError:
+                        continue
+                    future.add_done_callback(
+                        lambda f: f.exception() is None and committed.append(1)
+                    )
+                scheduler.call_later(tick, client_tick)
+
+            scheduler.call_later(tick, client_tick)
+            started = time.time()
+            scheduler.run_until(scheduler.now() + duration)
+            row["commits_per_sec"] = len(committed) / duration
+            row["wall"] = time.time() - started
+            row["leaders"] = [host.leader_count() for host in cluster.hosts]
+        rows.append(row)
+        print(
+            f"그룹 {group_count:>3}: 커밋 {row['commits_per_sec']:>9.0f}/초 (가상 시간), "
+            f"노드별 리더 수 {row['leaders']}, "
+            f"유휴 메시지 {row['idle_messages']:.0f}/초 (묶지 않으면 "
+            f"{row['idle_messages_uncoalesced']:.0f}/초), 실제 {row['wall']:.2f}초"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-Raft 벤치마크")
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--rate", type=int, default=200000, help="초당 제안 수")
+    parser.add_argument("--duration", type=float, default=2.0, help="부하 구간 (가상 시간, 초)")
+    parser.add_argument("--batch", type=int, default=64, help="리더당 AppendEntries 배치 크기")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_multi_raft_benchmark(
+        tuple(args.groups), args.nodes, args.rate, args.duration,
+        max_batch_entries=args.batch, seed=args.seed,
+    )
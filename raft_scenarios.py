@@ -0,0 +1,311 @@
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from finalexam import (
+    NETWORK_STATUS,
+    ClientDriver,
+    EventScheduler,
+    RaftNode,
+    State,
+    set_network_partition,
+)
+
+
+# --- 장애 일정 ---
+# 분할 일정: [(시작, 끝, 그룹 목록)] — 그룹 목록의 각 그룹끼리는 통신이 끊긴다.
+#           그룹 목록이 "leader" 이면 그 시각의 리더를 나머지와 떼어낸다.
+# 중단 일정: [(시각, 노드 ID 또는 "leader", 중단 시간)]
+def _minority_split(rng, node_ids, duration):
+    minority = node_ids[: (len(node_ids) - 1) // 2]
+    majority = node_ids[len(minority):]
+    return [(duration / 3, duration * 2 / 3, [minority, majority])]
+
+
+def _leader_isolation(rng, node_ids, duration):
+    return [(duration / 3, duration * 2 / 3, "leader")]
+
+
+def _random_splits(rng, node_ids, duration):
+    schedule = []
+    t = rng.uniform(2.0, 8.0)
+    while t < duration - 5.0:
+        shuffled = node_ids[:]
+        rng.shuffle(shuffled)
+        cut = rng.randint(1, len(node_ids) - 1)
+        length = rng.uniform(1.0, 10.0)
+        schedule.append((t, min(t + length, duration), [shuffled[:cut], shuffled[cut:]]))
+        t += length + rng.uniform(2.0, 10.0)
+    return schedule
+
+
+def _leader_crash(rng, node_ids, duration):
+    return [(duration / 3, "leader", duration / 6)]
+
+
+def _random_crashes(rng, node_ids, duration):
+    schedule = []
+    t = rng.uniform(2.0, 8.0)
+    while t < duration - 5.0:
+        downtime = rng.uniform(1.0, 10.0)
+        schedule.append((t, rng.choice(node_ids + ["leader"]), downtime))
+        t += rng.uniform(3.0, 10.0)
+    return schedule
+
+
+PARTITION_SCHEDULES = {
+    "none": lambda rng, node_ids, duration: [],
+    "minority": _minority_split,
+    "leader": _leader_isolation,
+    "random": _random_splits,
+}
+CRASH_SCHEDULES = {
+    "none": lambda rng, node_ids, duration: [],
+    "leader": _leader_crash,
+    "random": _random_crashes,
+}
+
+
+def make_scenarios(seeds, cluster_sizes=(5,), partitions=("minority",), crashes=("none",),
+                   duration=30.0, **node_kwargs):
+    """seed × 클러스터 크기 × 분할 일정 × 중단 일정의 모든 조합을 시나리오 목록으로 만든다."""
+    return [
+        {
+            "seed": seed, "node_count": size, "partitions": partition, "crashes": crash,
+            "duration": duration, "node_kwargs": node_kwargs,
+        }
+        for seed, size, partition, crash in itertools.product(
+            seeds, cluster_sizes, partitions, crashes
+        )
+    ]
+
+
+# --- 시나리오 하나 실행 (작업 프로세스에서 호출) ---
+class _ScenarioRun:
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.scheduler = EventScheduler(seed=scenario["seed"])
+        self.rng = random.Random(scenario["seed"])
+        self.node_ids = list(range(1, scenario["node_count"] + 1))
+        self.node_kwargs = dict(scenario["node_kwargs"], verbose=False)
+        self.live = [self._new_node(i) for i in self.node_ids]
+        self.durable = {}  # 중단된 노드의 디스크 상태 (중단 시점에 확정된 것)
+        self.client = ClientDriver(self.live, clock=self.scheduler.now)
+
+        # 관찰 결과
+        self.election_latencies = []
+        self.leaderless_time = 0.0
+        self.leaderless_since = 0.0
+        self.multiple_leaders = 0  # check_single_leader 기준 (임기 무관)
+        self.same_term_leaders = 0  # 같은 임기에 리더 둘: 실제 안전성 위반
+        self.crashes = 0
+
+    def _new_node(self, node_id):
+        node = RaftNode(
+            node_id, self.node_ids, clock=self.scheduler.now, rng=self.scheduler.rng,
+            **self.node_kwargs,
+        )
+        self.scheduler.add_node(node)
+        return node
+
+    def _find(self, target):
+        if target == "leader":
+            return self._effective_leader()
+        return next((n for n in self.live if n.id == target), None)
+
+    # --- 분할 ---
+    def _apply_partition(self, groups, connected):
+        for a, b in itertools.combinations(range(len(groups)), 2):
+            for x in groups[a]:
+                for y in groups[b]:
+                    set_network_partition(x, y, connected)
+
+    def _start_partition(self, groups, end):
+        if groups == "leader":
+            leader = self._effective_leader()
+            if leader is None:
+                return
+            groups = [[leader.id], [i for i in self.node_ids if i != leader.id]]
+        self._apply_partition(groups, False)
+        self.scheduler.call_at(end, self._apply_partition, groups, True)
+
+    # --- 중단 / 재시작 ---
+    def _crash(self, target, downtime):
+        node = self._find(target)
+        if node is None:
+            return
+        self.crashes += 1
+        self.scheduler.remove_node(node.id)
+        self.live.remove(node)
+        # 응답 전에 항상 동기화하므로 메모리의 지속 상태 = 디스크 상태
+        self.durable[node.id] = (
+            node.current_term, node.voted_for, list(node.log),
+            node.snapshot_index, node.snapshot_term, node.snapshot_data,
+        )
+        self.scheduler.call_later(downtime, self._restart, node.id)
+
+    def _restart(self, node_id):
+        term, voted_for, log, snapshot_index, snapshot_term, snapshot_data = self.durable.pop(node_id)
+        node = self._new_node(node_id)
+        node.current_term, node.voted_for, node.log = term, voted_for, log
+        node.snapshot_index, node.snapshot_term, node.snapshot_data = (
+            snapshot_index, snapshot_term, snapshot_data,
+        )
+        if snapshot_data is not None:
+            node.state_machine.restore(snapshot_data)
+        node.commit_index = node.last_applied = snapshot_index
+        self.live.append(node)
+
+    # --- 관찰 ---
+    def _effective_leader(self):
+        # 살아 있고 과반수(자신 포함)와 연결된 리더만 실제로 커밋할 수 있는 리더로 본다
+        majority = len(self.node_ids) // 2 + 1
+        live_ids = {n.id for n in self.live}
+        for node in self.live:
+            if node.state != State.LEADER:
+                continue
+            reachable = 1 + sum(
+                1 for i in live_ids
+                if i != node.id and NETWORK_STATUS.get((node.id, i), True)
+            )
+            if reachable >= majority:
+                return node
+        return None
+
+    def _observe(self):
+        leaders = [n for n in self.live if n.state == State.LEADER]
+        if len(leaders) > 1:
+            self.multiple_leaders += 1
+            terms = [n.current_term for n in leaders]
+            if len(set(terms)) != len(terms):
+                self.same_term_leaders += 1
+
+        now = self.scheduler.now()
+        has_leader = self._effective_leader() is not None
+        if has_leader and self.leaderless_since is not None:
+            self.election_latencies.append(now - self.leaderless_since)
+            self.leaderless_time += now - self.leaderless_since
+            self.leaderless_since = None
+        elif not has_leader and self.leaderless_since is None:
+            self.leaderless_since = now
+
+    def run(self):
+        NETWORK_STATUS.clear()  # 작업 프로세스는 여러 시나리오를 이어서 실행한다
+        scenario = self.scenario
+        duration = scenario["duration"]
+        partitions = scenario["partitions"]
+        if isinstance(partitions, str):
+            partitions = PARTITION_SCHEDULES[partitions](self.rng, self.node_ids, duration)
+        crashes = scenario["crashes"]
+        if isinstance(crashes, str):
+            crashes = CRASH_SCHEDULES[crashes](self.rng, self.node_ids, duration)
+        for start, end, groups in partitions:
+            self.scheduler.call_at(start, self._start_partition, groups, end)
+        for at, target, downtime in crashes:
+            self.scheduler.call_at(at, self._crash, target, downtime)
+        self.client.attach(self.scheduler, 0.1)
+
+        while self.scheduler.run_next(duration):
+            self._observe()
+        if self.leaderless_since is not None:
+            self.leaderless_time += duration - self.leaderless_since
+        NETWORK_STATUS.clear()
+
+        return {
+            "seed": scenario["seed"],
+            "node_count": scenario["node_count"],
+            "partitions": scenario["partitions"] if isinstance(scenario["partitions"], str) else "custom",
+            "crashes": scenario["crashes"] if isinstance(scenario["crashes"], str) else "custom",
+            "election_latencies": self.election_latencies,
+            "leaderless_time": self.leaderless_time,
+            "commit_latencies": self.client.commit_latencies,
+            "committed": self.client.committed,
+            "multiple_leaders": self.multiple_leaders,
+            "same_term_leaders": self.same_term_leaders,
+            "crash_count": self.crashes,
+            "max_term": max(n.current_term for n in self.live) if self.live else 0,
+        }
+
+
+def run_scenario(scenario):
+    return _ScenarioRun(scenario).run()
+
+
+# --- 여러 시나리오를 병렬 실행하고 분포를 합친다 ---
+def _percentiles(values):
+    if not values:
+        return "없음"
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+    return (
+        f"p50 {pick(0.5):.3f}초, p90 {pick(0.9):.3f}초, p99 {pick(0.99):.3f}초, "
+        f"최대 {values[-1]:.3f}초 (n={len(values)})"
+    )
+
+
+def run_scenarios(scenarios, workers=None, chunksize=8):
+    """시나리오들을 ProcessPoolExecutor 로 실행하고 결과 목록을 돌려준다."""
+    if workers == 1:
+        return [run_scenario(s) for s in scenarios]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_scenario, scenarios, chunksize=chunksize))
+
+
+def report(results):
+    election = [x for r in results for x in r["election_latencies"]]
+    commit = [x for r in results for x in r["commit_latencies"]]
+    leaderless = [r["leaderless_time"] for r in results]
+    flagged = [r for r in results if r["multiple_leaders"]]
+    unsafe = [r for r in results if r["same_term_leaders"]]
+
+    print(f"--- 시나리오 {len(results)}개 결과 ---")
+    print(f"선출 지연 (리더 부재 → 새 리더): {_percentiles(election)}")
+    print(f"실행당 리더 부재 시간: {_percentiles(leaderless)}")
+    print(f"커밋 지연: {_percentiles(commit)}")
+    print(f"중단 {sum(r['crash_count'] for r in results)}회, 커밋 {sum(r['committed'] for r in results)}개")
+    print(f"리더 2명 이상 관측 (check_single_leader 기준): {len(flagged)}개 실행")
+    for r in flagged[:20]:
+        print(
+            f"  seed {r['seed']}, 노드 {r['node_count']}, 분할 {r['partitions']}, "
+            f"중단 {r['crashes']}: {r['multiple_leaders']}회 관측"
+            + (f", 같은 임기 리더 {r['same_term_leaders']}회 🚨" if r["same_term_leaders"] else "")
+        )
+    if len(flagged) > 20:
+        print(f"  ... 외 {len(flagged) - 20}개")
+    print(f"같은 임기에 리더 2명 (안전성 위반): {len(unsafe)}개 실행")
+    return flagged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raft 분할/장애 시나리오 몬테카를로 실행기")
+    parser.add_argument("--runs", type=int, default=100, help="조합마다 실행할 seed 수")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 7], help="클러스터 크기")
+    parser.add_argument(
+        "--partitions", nargs="+", default=["minority", "leader", "random"],
+        choices=sorted(PARTITION_SCHEDULES),
+    )
+    parser.add_argument(
+        "--crashes", nargs="+", default=["none", "random"], choices=sorted(CRASH_SCHEDULES),
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="시나리오 길이 (가상 시간, 초)")
+    parser.add_argument("--workers", type=int, default=None, help="작업 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--no-prevote", action="store_true", help="Pre-Vote 끄기")
+    parser.add_argument("--no-check-quorum", action="store_true", help="CheckQuorum 끄기")
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(
+        range(args.first_seed, args.first_seed + args.runs), args.sizes,
+        args.partitions, args.crashes, args.duration,
+        pre_vote=not args.no_prevote, check_quorum=not args.no_check_quorum,
+    )
+    started = time.time()
+    results = run_scenarios(scenarios, args.workers)
+    report(results)
+    print(
+        f"실제 {time.time() - started:.1f}초 "
+        f"(작업 프로세스 {args.workers or os.cpu_count()}개)"
+    )
@@ -0,0 +1,339 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+# --- 레코드 형식 ---
+# 헤더: (payload 길이, payload 의 crc32, 레코드 종류) + payload
+RECORD_HEADER = struct.Struct("<IIB")
+ENTRY_HEADER = struct.Struct("<QQ")  # (로그 인덱스, term) + command(utf-8)
+HARD_STATE = struct.Struct("<Qq")  # (current_term, voted_for, 없으면 -1)
+TRUNCATE = struct.Struct("<Q")  # 이 인덱스부터 뒤쪽 엔트리 삭제
+
+RECORD_ENTRY = 1
+RECORD_HARD_STATE = 2
+RECORD_TRUNCATE = 3
+
+SEGMENT_SUFFIX = ".wal"
+SNAPSHOT_FILE = "snapshot.json"
+
+
+class SegmentedLogStorage:
+    """
+    Raft 지속 상태(current_term, voted_for, log)를 위한 세그먼트 WAL(write-ahead log).
+
+    - 엔트리와 term/vote 변경을 현재 세그먼트 파일 끝에 이어 쓰고, 크기가
+      segment_size 를 넘으면 새 세그먼트로 넘어간다.
+    - sync() 는 group commit 으로 동작한다. 동시에 기다리는 여러 append 를
+      fsync 한 번으로 묶고, fsync_window 초 동안 더 모아서 기다릴 수도 있다.
+    - 시작 시 load() 가 세그먼트를 mmap 으로 읽어 재생하며, 크래시로 잘린
+      마지막 레코드는 CRC 검사로 걸러내고 그 위치에서 파일을 잘라낸다.
+    - 스냅샷을 저장하면 스냅샷에 모두 포함된 예전 세그먼트는 삭제한다.
+    """
+
+    def __init__(self, directory, segment_size=4 * 1024 * 1024, fsync_window=0.0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_window = fsync_window
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._written_lsn = 0  # 지금까지 쓴 바이트 수 (log sequence number)
+        self._durable_lsn = 0  # fsync 로 디스크에 확정된 위치
+        self._syncing = False
+        self.fsync_count = 0
+
+        self._segments = []  # [(세그먼트 번호, 세그먼트 안 최대 엔트리 인덱스)]
+        self._replay_start = None
+        self._fd = None
+        self._segment_bytes = 0
+
+        self.current_term = 0
+        self.voted_for = None
+
+    # --- 파일 경로 ---
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"{number:08d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        return sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _fsync_dir(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # --- 시작 시 재생 ---
+    def load(self):
+        """
+        디스크의 스냅샷과 세그먼트를 읽어 (term, voted_for, snapshot, entries) 를 돌려준다.
+        snapshot 은 (index, term, data) 또는 None, entries 는 스냅샷 이후의 (command, term) 리스트.
+        """
+        snapshot = None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            snapshot = (saved["index"], saved["term"], saved["data"])
+
+        self._replay_start = None  # entries[0] 의 로그 인덱스
+        entries = []
+        numbers = self._list_segments()
+        self._segments = []
+
+        for position, number in enumerate(numbers):
+            path = self._segment_path(number)
+            max_index, good_bytes, intact = self._replay_segment(path, entries)
+            self._segments.append((number, max_index))
+
+            if not intact:
+                # 잘린/손상된 레코드 이후는 버린다 (크래시 도중 쓰던 부분)
+                with open(path, "r+b") as f:
+                    f.truncate(good_bytes)
+                for later in numbers[position + 1:]:
+                    os.remove(self._segment_path(later))
+                break
+
+        start = self._replay_start
+        snapshot_index = snapshot[0] if snapshot else 0
+        if start is None or start > snapshot_index + 1:
+            # 스냅샷 바로 다음부터 이어지지 않으면 로그를 사용할 수 없다
+            entries = []
+        else:
+            entries = entries[snapshot_index + 1 - start:]
+
+        self._open_active_segment()
+        return self.current_term, self.voted_for, snapshot, entries
+
+    def _replay_segment(self, path, entries):
+        """세그먼트 하나를 mmap 으로 읽어 entries 에 반영한다."""
+        size = os.path.getsize(path)
+        if size == 0:
+            return 0, 0, True
+
+        max_index = 0
+        offset = 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            while offset + RECORD_HEADER.size <= size:
+                length, crc, kind = RECORD_HEADER.unpack_from(buf, offset)
+                body_start = offset + RECORD_HEADER.size
+                body_end = body_start + length
+                if body_end > size or zlib.crc32(buf[body_start:body_end]) != crc:
+                    return max_index, offset, False
+
+                if kind == RECORD_ENTRY:
+                    index, term = ENTRY_HEADER.unpack_from(buf, body_start)
+                    command = bytes(buf[body_start + ENTRY_HEADER.size:body_end]).decode()
+                    start = self._replay_start
+                    if start is not None and start <= index <= start + len(entries):
+                        # 같은 인덱스를 다시 쓴 경우 그 뒤쪽의 예전 엔트리는 대체된다
+                        del entries[index - start:]
+                    else:
+                        # 이어지지 않는 엔트리: 여기서부터 새로 쌓는다
+                        entries.clear()
+                        self._replay_start = index
+                    entries.append((command, term))
+                    max_index = index
+                elif kind == RECORD_HARD_STATE:
+                    term, voted_for = HARD_STATE.unpack_from(buf, body_start)
+                    self.current_term = term
+                    self.voted_for = None if voted_for < 0 else voted_for
+                elif kind == RECORD_TRUNCATE:
+                    (index,) = TRUNCATE.unpack_from(buf, body_start)
+                    start = self._replay_start
+                    if start is not None and index - start < len(entries):
+                        del entries[max(0, index - start):]
+                offset = body_end
+
+        return max_index, offset, offset == size
+
+    # --- 쓰기 ---
+    def _open_active_segment(self):
+        if self._segments:
+            number = self._segments[-1][0]
+        else:
+            number = 1
+            self._segments.append((number, 0))
+        self._fd = os.open(self._segment_path(number), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_bytes = os.fstat(self._fd).st_size
+        self._fsync_dir()
+
+    def _roll_segment(self):
+        # 이전 세그먼트를 확정하고 새 세그먼트를 연다 (호출자가 _cond 를 잡고 있어야 함)
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._segments.append((self._segments[-1][0] + 1, 0))
+        self._fd = None
+        self._open_active_segment()
+        # 예전 세그먼트를 지워도 되도록 현재 term/vote 를 새 세그먼트 앞에 다시 기록
+        self._write(RECORD_HARD_STATE, HARD_STATE.pack(self.current_term, self._vote_code()), 0)
+
+    def _vote_code(self):
+        return -1 if self.voted_for is None else self.voted_for
+
+    @staticmethod
+    def _encode(kind, payload):
+        return RECORD_HEADER.pack(len(payload), zlib.crc32(payload), kind) + payload
+
+    def _write(self, kind, payload, max_index):
+        self._write_raw(self._encode(kind, payload), max_index)
+
+    def _write_raw(self, data, max_index):
+        os.write(self._fd, data)
+        self._segment_bytes += len(data)
+        self._written_lsn += len(data)
+        if max_index:
+            number, current_max = self._segments[-1]
+            self._segments[-1] = (number, max(current_max, max_index))
+
+    def _append(self, kind, payload, max_index=0):
+        with self._cond:
+            if self._segment_bytes >= self.segment_size:
+                self._roll_segment()
+            self._write(kind, payload, max_index)
+            return self._written_lsn
+
+    def append_entries(self, first_index, entries):
+        """first_index 부터의 엔트리를 기록한다. 같은 인덱스 뒤쪽의 예전 엔트리는 재생 시 대체된다."""
+        if not entries:
+            return self._written_lsn
+        with self._cond:
+            if self._segment_bytes >= self.segment_size:
+                self._roll_segment()
+            # 배치 전체를 한 번의 write 로 기록
+            data = b"".join(
+                self._encode(RECORD_ENTRY, ENTRY_HEADER.pack(index, term) + command.encode())
+                for index, (command, term) in enumerate(entries, first_index)
+            )
+            self._write_raw(data, first_index + len(entries) - 1)
+            return self._written_lsn
+
+    def truncate(self, from_index):
+        return self._append(RECORD_TRUNCATE, TRUNCATE.pack(from_index))
+
+    def save_term_vote(self, term, voted_for):
+        if term == self.current_term and voted_for == self.voted_for:
+            return self._written_lsn
+        self.current_term = term
+        self.voted_for = voted_for
+        return self._append(RECORD_HARD_STATE, HARD_STATE.pack(term, self._vote_code()))
+
+    def save_snapshot(self, index, term, data):
+        """스냅샷을 원자적으로 저장하고, 스냅샷에 모두 포함된 예전 세그먼트를 삭제한다."""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"index": index, "term": term, "data": data}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_dir()
+
+        with self._cond:
+            if self._segment_bytes > 0 and self._segments[-1][1] <= index:
+                self._roll_segment()
+            while len(self._segments) > 1 and self._segments[0][1] <= index:
+                number, _ = self._segments.pop(0)
+                os.remove(self._segment_path(number))
+
+    # --- group commit ---
+    def sync(self, lsn=None):
+        """lsn 까지 디스크에 확정될 때까지 기다린다. 동시에 기다리는 쓰기는 fsync 한 번으로 묶는다."""
+        with self._cond:
+            if lsn is None:
+                lsn = self._written_lsn
+            while self._durable_lsn < lsn and self._syncing:
+                self._cond.wait()
+            if self._durable_lsn >= lsn:
+                return
+            self._syncing = True
+
+        # 이 스레드가 대표로 fsync 한다
+        target = lsn
+        try:
+            if self.fsync_window > 0:
+                time.sleep(self.fsync_window)  # 그 사이 들어온 쓰기까지 함께 확정
+            with self._cond:
+                target = self._written_lsn
+                fd = os.dup(self._fd)  # 세그먼트 교체로 닫혀도 안전하도록 복제
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        finally:
+            with self._cond:
+                self._durable_lsn = max(self._durable_lsn, target)
+                self._syncing = False
+                self.fsync_count += 1
+                self._cond.notify_all()
+
+    def close(self):
+        self.sync()
+        with self._cond:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+# --- 벤치마크: fsync 묶음 창(window) 별 초당 append 수 ---
+def benchmark(directory, threads=8, appends_per_thread=500, windows=(0.0, 0.0005, 0.001, 0.002)):
+    results = []
+    for window in windows:
+        path = os.path.join(directory, f"window-{window}")
+        storage = SegmentedLogStorage(path, fsync_window=window)
+        storage.load()
+        counter = iter(range(1, threads * appends_per_thread + 1))
+        counter_lock = threading.Lock()
+
+        def worker():
+            for _ in range(appends_per_thread):
+                with counter_lock:
+                    index = next(counter)
+                lsn = storage.append_entries(index, [(f"set_x={index}", 1)])
+                storage.sync(lsn)  # 응답 전에 반드시 디스크에 확정
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        storage.close()
+
+        total = threads * appends_per_thread
+        results.append((window, total / elapsed, storage.fsync_count))
+        print(
+            f"fsync window {window * 1000:5.2f} ms: {total / elapsed:10.0f} appends/sec, "
+            f"fsync {storage.fsync_count}회 (fsync 당 평균 {total / storage.fsync_count:.1f}개)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="세그먼트 WAL group commit 벤치마크")
+    parser.add_argument("--dir", default=None, help="WAL 디렉터리 (기본: 임시 디렉터리)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--appends", type=int, default=500, help="스레드당 append 수")
+    parser.add_argument(
+        "--windows", type=float, nargs="+", default=[0.0, 0.0005, 0.001, 0.002],
+        help="fsync 묶음 창 (초)",
+    )
+    args = parser.parse_args()
+
+    if args.dir:
+        benchmark(args.dir, args.threads, args.appends, args.windows)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            benchmark(tmp, args.threads, args.appends, args.windows)
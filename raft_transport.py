@@ -0,0 +1,407 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+
+from finalexam import NETWORK_STATUS, AsyncRuntime, RaftNode
+
+# --- 프레임 형식 ---
+# 헤더: (payload 길이, 메시지 종류, 요청 ID) + payload
+# 응답은 요청과 같은 요청 ID 에 REPLY_FLAG 를 더한 종류로 돌려준다.
+FRAME_HEADER = struct.Struct("<IBI")
+REPLY_FLAG = 0x80
+
+MSG_REQUEST_VOTE = 1
+MSG_APPEND_ENTRIES = 2
+MSG_INSTALL_SNAPSHOT = 3
+MSG_PROPOSE = 4
+MSG_PRE_VOTE = 5
+
+METHOD_TYPES = {
+    "_handle_request_vote": MSG_REQUEST_VOTE,
+    "handle_append_entries": MSG_APPEND_ENTRIES,
+    "handle_install_snapshot": MSG_INSTALL_SNAPSHOT,
+    "_handle_pre_vote": MSG_PRE_VOTE,
+}
+TYPE_METHODS = {code: method for method, code in METHOD_TYPES.items()}
+
+REQUEST_VOTE = struct.Struct("<QQQQ")  # term, candidate_id, last_log_index, last_log_term (Pre-Vote 도 동일)
+VOTE_REPLY = struct.Struct("<?Q")  # vote_granted, term
+APPEND_HEADER = struct.Struct("<QQQQQI")  # term, leader_id, prev_idx, prev_term, commit, 엔트리 수
+APPEND_REPLY = struct.Struct("<?Qqq")  # success, term, conflict_index, conflict_term (없으면 -1)
+SNAPSHOT_HEADER = struct.Struct("<QQQQ")  # term, leader_id, last_included_index, last_included_term
+SNAPSHOT_REPLY = struct.Struct("<?Q")
+PROPOSE_REPLY = struct.Struct("<?q")  # 커밋 성공 여부, 알려진 리더 ID (없으면 -1)
+
+
+# --- 인코딩 / 디코딩 ---
+def encode_request(msg_type, args):
+    if msg_type in (MSG_REQUEST_VOTE, MSG_PRE_VOTE):
+        return REQUEST_VOTE.pack(*args)
+    if msg_type == MSG_APPEND_ENTRIES:
+        term, leader_id, prev_idx, prev_term, entries, commit = args
+        # 엔트리는 term 배열 + 길이 배열 + 커맨드 바이트를 이어 붙인 형태
+        count = len(entries)
+        commands = [command.encode() for command, _ in entries]
+        return b"".join((
+            APPEND_HEADER.pack(term, leader_id, prev_idx, prev_term, commit, count),
+            struct.pack(f"<{count}Q", *(entry_term for _, entry_term in entries)),
+            struct.pack(f"<{count}I", *map(len, commands)),
+            *commands,
+        ))
+    if msg_type == MSG_INSTALL_SNAPSHOT:
+        term, leader_id, index, snapshot_term, data = args
+        return SNAPSHOT_HEADER.pack(term, leader_id, index, snapshot_term) + json.dumps(data).encode()
+    raise ValueError(f"알 수 없는 메시지 종류: {msg_type}")
+
+
+def decode_request(msg_type, payload):
+    if msg_type in (MSG_REQUEST_VOTE, MSG_PRE_VOTE):
+        return REQUEST_VOTE.unpack(payload)
+    if msg_type == MSG_APPEND_ENTRIES:
+        term, leader_id, prev_idx, prev_term, commit, count = APPEND_HEADER.unpack_from(payload)
+        offset = APPEND_HEADER.size
+        terms = struct.unpack_from(f"<{count}Q", payload, offset)
+        offset += 8 * count
+        lengths = struct.unpack_from(f"<{count}I", payload, offset)
+        offset += 4 * count
+        entries = []
+        for entry_term, length in zip(terms, lengths):
+            entries.append((payload[offset:offset + length].decode(), entry_term))
+            offset += length
+        return term, leader_id, prev_idx, prev_term, entries, commit
+    if msg_type == MSG_INSTALL_SNAPSHOT:
+        term, leader_id, index, snapshot_term = SNAPSHOT_HEADER.unpack_from(payload)
+        return term, leader_id, index, snapshot_term, json.loads(payload[SNAPSHOT_HEADER.size:])
+    raise ValueError(f"알 수 없는 메시지 종류: {msg_type}")
+
+
+def encode_reply(msg_type, result):
+    if msg_type == MSG_APPEND_ENTRIES:
+        success, term, conflict_index, conflict_term = result
+        return APPEND_REPLY.pack(
+            success, term,
+            -1 if conflict_index is None else conflict_index,
+            -1 if conflict_term is None else conflict_term,
+        )
+    return VOTE_REPLY.pack(*result)  # RequestVote / Pre-Vote / InstallSnapshot 은 (bool, term)
+
+
+def decode_reply(msg_type, payload):
+    if msg_type == MSG_APPEND_ENTRIES:
+        success, term, conflict_index, conflict_term = APPEND_REPLY.unpack(payload)
+        return (
+            success, term,
+            None if conflict_index < 0 else conflict_index,
+            None if conflict_term < 0 else conflict_term,
+        )
+    return VOTE_REPLY.unpack(payload)
+
+
+# --- 연결 ---
+class FrameWriter:
+    """같은 이벤트 루프 회차에 쓴 프레임을 모아 write 한 번으로 보낸다."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._buffer = []
+
+    def write(self, msg_type, request_id, payload):
+        if not self._buffer:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self._buffer.append(FRAME_HEADER.pack(len(payload), msg_type, request_id))
+        self._buffer.append(payload)
+
+    def flush(self):
+        if self._buffer and not self.writer.is_closing():
+            self.writer.write(b"".join(self._buffer))
+        self._buffer = []
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(FRAME_HEADER.size)
+    length, msg_type, request_id = FRAME_HEADER.unpack(header)
+    payload = await reader.readexactly(length)
+    return msg_type, request_id, payload
+
+
+class PeerConnection:
+    """
+    한 피어로의 지속 연결. 응답을 기다리지 않고 요청을 이어 보내며(pipelining),
+    응답은 요청 ID 로 짝을 맞춘다. 연결이 끊기면 진행 중인 요청은 유실로 처리하고
+    다음 요청 때 다시 연결한다.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._frames = None
+        self._pending = {}  # {요청 ID: 응답 콜백}
+        self._queued = []  # 연결되기 전에 보낸 요청
+        self._next_id = 0
+        self._connecting = None
+
+    def request(self, msg_type, payload, on_reply):
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        request_id = self._next_id
+        self._pending[request_id] = on_reply
+        if self._frames is not None:
+            self._frames.write(msg_type, request_id, payload)
+            return
+        self._queued.append((msg_type, request_id, payload))
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._connect())
+
+    async def _connect(self):
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError:
+            self._drop()
+            return
+        finally:
+            self._connecting = None
+        self._frames = FrameWriter(writer)
+        for frame in self._queued:
+            self._frames.write(*frame)
+        self._queued = []
+        asyncio.ensure_future(self._read_replies(reader, writer))
+
+    async def _read_replies(self, reader, writer):
+        try:
+            while True:
+                _, request_id, payload = await read_frame(reader)
+                on_reply = self._pending.pop(request_id, None)
+                if on_reply is not None:
+                    on_reply(payload)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            writer.close()
+            self._frames = None
+            self._drop()
+
+    def _drop(self):
+        # 응답을 받지 못한 요청은 유실된 메시지로 취급 (Raft 가 다시 보낸다)
+        self._pending.clear()
+        self._queued = []
+
+
+class ConnectionPool:
+    """피어별 지속 연결을 재사용한다. AppendEntries 순서를 지키기 위해 피어당 연결은 하나."""
+
+    def __init__(self, peers):
+        self.peers = peers  # {node_id: (host, port)}
+        self._connections = {}
+
+    def get(self, peer_id):
+        connection = self._connections.get(peer_id)
+        if connection is None:
+            host, port = self.peers[peer_id]
+            connection = self._connections[peer_id] = PeerConnection(host, port)
+        return connection
+
+
+# --- TCP 전송 계층 ---
+class TcpTransport:
+    """
+    localhost TCP 위의 RaftNode 전송 계층. InProcessTransport/EventScheduler 와 같은
+    send() 인터페이스를 제공하므로 노드를 별도 프로세스로 띄울 수 있다.
+    클라이언트의 PROPOSE 요청도 같은 포트로 받는다.
+    """
+
+    def __init__(self, node, peers):
+        self.node = node
+        self.peers = peers
+        self.pool = ConnectionPool(peers)
+        self.server = None
+        self.bytes_sent = 0
+
+    async def start(self):
+        host, port = self.peers[self.node.id]
+        self.server = await asyncio.start_server(self._serve, host, port)
+
+    def send(self, src_id, target_id, method, args, on_reply):
+        if not NETWORK_STATUS.get((src_id, target_id), True):
+            return
+        msg_type = METHOD_TYPES[method]
+        payload = encode_request(msg_type, args)
+        self.bytes_sent += len(payload) + FRAME_HEADER.size
+        self.pool.get(target_id).request(
+            msg_type, payload,
+            lambda reply: on_reply(*decode_reply(msg_type, reply)),
+        )
+
+    async def _serve(self, reader, writer):
+        frames = FrameWriter(writer)
+        try:
+            while True:
+                msg_type, request_id, payload = await read_frame(reader)
+                if msg_type == MSG_PROPOSE:
+                    self._handle_propose(frames, request_id, payload)
+                    continue
+                args = decode_request(msg_type, payload)
+                result = getattr(self.node, TYPE_METHODS[msg_type])(*args)
+                frames.write(msg_type | REPLY_FLAG, request_id, encode_reply(msg_type, result))
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    def _handle_propose(self, frames, request_id, payload):
+        def reply(future):
+            ok = future.exception() is None
+            leader_id = self.node.leader_id if self.node.leader_id is not None else -1
+            frames.write(MSG_PROPOSE | REPLY_FLAG, request_id, PROPOSE_REPLY.pack(ok, leader_id))
+
+        self.node.propose(payload.decode()).add_done_callback(reply)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+# --- 노드 프로세스 ---
+def parse_peers(text):
+    """'1=127.0.0.1:9001,2=127.0.0.1:9002' → {1: ('127.0.0.1', 9001), ...}"""
+    peers = {}
+    for item in text.split(","):
+        node_id, address = item.split("=")
+        host, port = address.rsplit(":", 1)
+        peers[int(node_id)] = (host, int(port))
+    return peers
+
+
+async def run_node(node_id, peers, election_timeout_range, heartbeat_interval, verbose):
+    runtime = AsyncRuntime()
+    node = RaftNode(
+        node_id, sorted(peers), clock=runtime.now, verbose=verbose,
+        election_timeout_range=election_timeout_range, heartbeat_interval=heartbeat_interval,
+    )
+    runtime.add_node(node)
+    transport = TcpTransport(node, peers)
+    node.transport = transport
+    await transport.start()
+    await asyncio.Event().wait()  # 종료될 때까지 실행
+
+
+# --- 벤치마크: 5개 프로세스 클러스터의 커밋 처리량 ---
+class ProposeClient:
+    """모든 노드에 연결해 두고 리더에게 PROPOSE 를 파이프라인으로 보낸다."""
+
+    def __init__(self, peers):
+        self.pool = ConnectionPool(peers)
+        self.peers = peers
+
+    def propose(self, node_id, command):
+        future = asyncio.get_running_loop().create_future()
+
+        def on_reply(payload):
+            if not future.done():
+                future.set_result(PROPOSE_REPLY.unpack(payload))
+
+        self.pool.get(node_id).request(MSG_PROPOSE, command.encode(), on_reply)
+        return future
+
+    async def find_leader(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for node_id in self.peers:
+                try:
+                    ok, leader_id = await asyncio.wait_for(
+                        self.propose(node_id, "NOOP"), 1.0
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                if ok:
+                    return node_id
+            await asyncio.sleep(0.1)
+        raise RuntimeError("리더를 찾지 못했습니다")
+
+
+async def run_benchmark(node_count=5, duration=5.0, window=2000, base_port=9100):
+    peers = {i: ("127.0.0.1", base_port + i) for i in range(1, node_count + 1)}
+    peer_text = ",".join(f"{i}={host}:{port}" for i, (host, port) in peers.items())
+    processes = [
+        subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "node",
+            "--id", str(i), "--peers", peer_text,
+        ])
+        for i in peers
+    ]
+    try:
+        await asyncio.sleep(0.5)
+        client = ProposeClient(peers)
+        leader_id = await client.find_leader()
+
+        committed = 0
+        latencies = []
+        deadline = time.monotonic() + duration
+        in_flight = set()
+        sequence = 0
+
+        def on_done(future, started):
+            nonlocal committed
+            in_flight.discard(future)
+            if not future.cancelled() and future.result()[0]:
+                committed += 1
+                latencies.append(time.monotonic() - started)
+
+        started_at = time.monotonic()
+        while time.monotonic() < deadline:
+            # window 개까지 응답을 기다리지 않고 요청을 흘려보낸다
+            while len(in_flight) < window:
+                sequence += 1
+                future = client.propose(leader_id, f"SET k{sequence % 1000} {sequence}")
+                future.add_done_callback(lambda f, t=time.monotonic(): on_done(f, t))
+                in_flight.add(future)
+            await asyncio.sleep(0.001)
+        elapsed = time.monotonic() - started_at
+
+        latencies.sort()
+        print(
+            f"--- TCP 전송 벤치마크 ({node_count}개 프로세스, {duration}초, 동시 요청 {window}) ---\n"
+            f"커밋 {committed}개, {committed / elapsed:.0f} commits/초, "
+            f"지연 p50 {latencies[len(latencies) // 2] * 1000:.1f}ms / "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms"
+        )
+        return committed / elapsed
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raft TCP 전송 계층")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    node_parser = sub.add_parser("node", help="노드 하나를 프로세스로 실행")
+    node_parser.add_argument("--id", type=int, required=True)
+    node_parser.add_argument("--peers", required=True, help="1=127.0.0.1:9001,2=...")
+    node_parser.add_argument("--election-timeout", type=float, nargs=2, default=(1.0, 2.0))
+    node_parser.add_argument("--heartbeat", type=float, default=0.1)
+    node_parser.add_argument("--verbose", action="store_true")
+
+    bench_parser = sub.add_parser("bench", help="localhost 에서 여러 프로세스 클러스터 벤치마크")
+    bench_parser.add_argument("--nodes", type=int, default=5)
+    bench_parser.add_argument("--duration", type=float, default=5.0)
+    bench_parser.add_argument("--window", type=int, default=2000, help="동시에 보내는 요청 수")
+    bench_parser.add_argument("--base-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    if args.command == "node":
+        try:
+            asyncio.run(run_node(
+                args.id, parse_peers(args.peers), tuple(args.election_timeout),
+                args.heartbeat, args.verbose,
+            ))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(run_benchmark(args.nodes, args.duration, args.window, args.base_port))